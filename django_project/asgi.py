@@ -1,3 +1,5 @@
+# Servidor ASGI (home_view es asíncrona), el que usan el Dockerfile y docker-compose.yml:
+#   uvicorn django_project.asgi:application --host 0.0.0.0 --port 8000 --workers 4
 import os
 
 from django.core.asgi import get_asgi_application
@@ -5,3 +7,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
 
 application = get_asgi_application()
+
+# Cada worker arranca aquí sus procesos de renderizado (si CHART_RENDER_PROCESSES > 0),
+# no en la primera petición del dashboard
+from pages.charts import iniciar_render_executor  # noqa: E402
+
+iniciar_render_executor()
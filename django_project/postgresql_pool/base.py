@@ -0,0 +1,150 @@
+"""Backend PostgreSQL (psycopg 3) con pool de conexiones.
+
+Adelanta el soporte de ``OPTIONS["pool"]`` que trae Django 5.1: con el pool
+activo cada petición toma una conexión ya abierta en lugar de abrir una nueva
+(TCP, autenticación y configuración de la sesión) y la devuelve al terminar.
+Al pasar a Django 5.1 basta con volver a ``django.db.backends.postgresql``
+manteniendo las mismas OPTIONS.
+
+``OPTIONS["pool"]`` acepta ``True`` o un dict con los argumentos de
+``psycopg_pool.ConnectionPool`` (min_size, max_size, max_lifetime, timeout...).
+Requiere ``CONN_MAX_AGE = 0``; ``CONN_HEALTH_CHECKS`` hace que el pool verifique
+cada conexión antes de entregarla.
+
+El pool se abre con la primera conexión del proceso, después de conectarse una
+vez directamente: con el servidor caído o inalcanzable falla enseguida con el
+error de psycopg en lugar de esperar ``timeout`` segundos un PoolTimeout.
+"""
+import threading
+from psycopg import sql
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+
+# connect_timeout (segundos) de la conexión de prueba antes de abrir el pool, si OPTIONS no trae uno
+CONNECT_TIMEOUT_APERTURA = 5
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+    # El pool guarda los parámetros de conexión: se cierra al cambiar a la base de pruebas y al volver
+    def create_test_db(self, *args, **kwargs):
+        self.connection.close_pool()
+        return super().create_test_db(*args, **kwargs)
+
+    def destroy_test_db(self, *args, **kwargs):
+        self.connection.close_pool()
+        try:
+            return super().destroy_test_db(*args, **kwargs)
+        finally:
+            self.connection.close_pool()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    # Un pool por alias en cada proceso, compartido por los hilos (cada hilo tiene su DatabaseWrapper)
+    _connection_pools = {}
+    _pools_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        opciones = self.settings_dict['OPTIONS'].get('pool')
+        if self.alias == NO_DB_ALIAS or not opciones:
+            return None
+        if self.alias not in self._connection_pools:
+            with self._pools_lock:
+                if self.alias not in self._connection_pools:
+                    self._connection_pools[self.alias] = self._crear_pool(opciones)
+        return self._connection_pools[self.alias]
+
+    def _crear_pool(self, opciones):
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('El pool de conexiones requiere CONN_MAX_AGE = 0.')
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as exc:
+            raise ImproperlyConfigured('Error al cargar psycopg_pool (pip install psycopg-pool).') from exc
+
+        opciones = {} if opciones is True else dict(opciones)
+        parametros = self.get_connection_params()
+        parametros['autocommit'] = True
+        if self.settings_dict['CONN_HEALTH_CHECKS']:
+            opciones.setdefault('check', ConnectionPool.check_connection)
+        opciones.setdefault('name', self.alias)
+        return ConnectionPool(
+            kwargs=parametros,
+            open=False,  # se abre con la primera conexión, no al importar los settings
+            configure=self._configurar_conexion,
+            **opciones,
+        )
+
+    def close_pool(self):
+        """Cierra el pool de este alias (se vuelve a crear con la próxima conexión)."""
+        if self.connection is not None and not self.in_atomic_block:
+            self.close()
+        pool = self._connection_pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
+
+    def get_connection_params(self):
+        parametros = super().get_connection_params()
+        parametros.pop('pool', None)
+        return parametros
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        if pool.closed:
+            self._abrir_pool(pool)
+        conexion = pool.getconn()
+        # Igual que el backend de Django: nivel de aislamiento de OPTIONS o READ COMMITTED
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = IsolationLevel(options.get('isolation_level', IsolationLevel.READ_COMMITTED))
+        except ValueError:
+            pool.putconn(conexion)
+            raise ImproperlyConfigured(f"Invalid transaction isolation level {options['isolation_level']} specified.")
+        if 'isolation_level' in options:
+            conexion.isolation_level = self.isolation_level
+        return conexion
+
+    def _abrir_pool(self, pool):
+        # Sin servidor, getconn esperaría el timeout del pool (30 s por defecto) mientras los hilos del
+        # pool reintentan en segundo plano; así cada comando de manage.py tardaría eso en fallar. Una
+        # conexión directa falla enseguida con el error real y el pool queda sin abrir para el próximo intento
+        with self._pools_lock:
+            if not pool.closed:
+                return
+            parametros = {'connect_timeout': CONNECT_TIMEOUT_APERTURA, **pool.kwargs}
+            pool.connection_class.connect(pool.conninfo, **parametros).close()
+            pool.open()
+
+    def _configurar_conexion(self, conexion):
+        # El pool la llama una vez por conexión física: zona horaria y rol quedan fijos para las
+        # siguientes entregas, así init_connection_state no ejecuta nada en cada petición
+        zona = self.timezone_name
+        rol = self.settings_dict['OPTIONS'].get('assume_role')
+        with conexion.cursor() as cursor:
+            if zona and conexion.info.parameter_status('TimeZone') != zona:
+                cursor.execute(self.ops.set_time_zone_sql(), [zona])
+            if rol:
+                cursor.execute(sql.SQL('SET ROLE {}').format(sql.Literal(rol)))
+
+    def ensure_role(self):
+        # Con el pool el rol ya quedó fijado al abrir la conexión
+        if self.pool is not None:
+            return False
+        return super().ensure_role()
+
+    def _close(self):
+        if self.connection is not None and self.pool is not None:
+            # Se devuelve al pool (que deshace una transacción abierta) en lugar de cerrarla
+            with self.wrap_database_errors:
+                self.connection._pool.putconn(self.connection)
+            self.connection = None
+            return
+        return super()._close()
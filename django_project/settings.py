@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
     "whitenoise.runserver_nostatic",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",
     # Third-party
     "allauth",
     "allauth.account",
@@ -49,6 +51,7 @@ INSTALLED_APPS = [
 
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "pages.instrumentation.InstrumentacionMiddleware",  # Server-Timing y peticiones lentas
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # WhiteNoise
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -70,7 +73,8 @@ WSGI_APPLICATION = "django_project.wsgi.application"
 # https://docs.djangoproject.com/en/dev/ref/settings/#templates
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates que además mide el tiempo de render (pages/instrumentation.py)
+        "BACKEND": "pages.instrumentation.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -97,16 +101,83 @@ TEMPLATES = [
 # Database configuration
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        # Backend de Django + pool de conexiones (django_project/postgresql_pool)
+        "ENGINE": "django_project.postgresql_pool",
         "NAME": "procesos",
         "USER": "jaime",
         "PASSWORD": "vanessa",
         "HOST": "db",  # set in docker-compose.yml
         "PORT": 5432,  # default postgres port
+        # El pool reemplaza a las conexiones persistentes: CONN_MAX_AGE debe quedar en 0
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_POOL_HEALTH_CHECKS", "1") == "1",
+        "OPTIONS": {},
     }
 }
 
-# Password validation
+# Pool de conexiones por proceso (gunicorn: uno por worker). DB_POOL=0 vuelve a abrir
+# una conexión por petición. Tiempos en segundos.
+if os.environ.get("DB_POOL", "1") == "1":
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+        "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+        "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 3600)),
+        "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 600)),
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    }
+
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# Caché compartida entre los workers (guarda la versión de los datos del dashboard)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache",
+    }
+}
+
+# Caché de resultados de proceso_list (alias "listas"). LIST_CACHE_BACKEND elige el backend:
+# locmem (por worker), file (compartida en disco), redis (Redis o un servidor compatible en
+# LIST_CACHE_URL; requiere el paquete redis) o none para desactivarla
+LIST_CACHE_BACKEND = os.environ.get("LIST_CACHE_BACKEND", "locmem")
+LIST_CACHE_TIMEOUT = 300
+# Los reportes (pages.duraciones) usan el mismo alias; su clave incluye la versión de los datos
+REPORT_CACHE_TIMEOUT = 3600
+CACHES["listas"] = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "proceso-list",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "listas",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("LIST_CACHE_URL", "redis://127.0.0.1:6379/1"),
+    },
+    "none": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    },
+}[LIST_CACHE_BACKEND]
+
+# Número máximo de gráficos renderizados que guarda cada worker (LRU)
+CHART_CACHE_MAX_ENTRIES = 32
+
+# Renders de matplotlib simultáneos por worker (el resto espera turno)
+CHART_MAX_CONCURRENT_RENDERS = 2
+
+# Procesos por worker con los que home_view renderiza a la vez los dos gráficos del dashboard
+# (0: en hilos del worker, que por el GIL se turnan). Cada proceso carga su propio Django al
+# arrancar el worker (unos segundos) y abre su propia conexión a la base: con WEB_CONCURRENCY
+# workers son WEB_CONCURRENCY × CHART_RENDER_PROCESSES procesos y conexiones, además de las
+# DB_POOL_MAX_SIZE de cada worker. Por defecto 0: prerender_charts deja los gráficos en
+# CHART_STORE_DIR y los hilos solo renderizan lo que todavía no está ahí
+CHART_RENDER_PROCESSES = int(os.environ.get("CHART_RENDER_PROCESSES", 0))
+
+# Directorio donde el comando prerender_charts deja los gráficos ya renderizados
+CHART_STORE_DIR = BASE_DIR / ".cache" / "charts"
 
 # Password validation
 # https://docs.djangoproject.com/en/dev/ref/settings/#auth-password-validators
@@ -213,3 +284,35 @@ ACCOUNT_USERNAME_REQUIRED = False
 ACCOUNT_AUTHENTICATION_METHOD = "email"
 ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_UNIQUE_EMAIL = True
+
+# Instrumentación por petición (pages/instrumentation.py)
+# Cabecera Server-Timing con consultas SQL, templates y gráficos de cada respuesta
+SERVER_TIMING = True
+# Peticiones más lentas que este umbral (ms) se registran como JSON en el logger pages.slow_requests
+SLOW_REQUEST_MS = 500
+
+# https://docs.djangoproject.com/en/dev/topics/logging/
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "%(levelname)s %(name)s %(message)s"},
+        # Una línea JSON por petición lenta, lista para procesar
+        "json": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+        "slow_requests": {"class": "logging.StreamHandler", "formatter": "json"},
+    },
+    "loggers": {
+        "pages": {
+            "handlers": ["console"],
+            "level": "INFO",  # DEBUG para ver el detalle de proceso_list y de los gráficos
+        },
+        "pages.slow_requests": {
+            "handlers": ["slow_requests"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
@@ -2,8 +2,8 @@ from django.contrib import admin
 from .models import Proceso, Evento, Parametro, Formula
 
 class ProcesoAdmin(admin.ModelAdmin):
-    list_display = ('nomenclatura', 'nombre', 'estimado', 'periodo')
-    list_filter = ('moneda', 'periodo', 'convocatoria')
+    list_display = ('nomenclatura', 'nombre', 'estimado', 'periodo', 'estado', 'fecha_ultimo_evento')
+    list_filter = ('moneda', 'periodo', 'convocatoria', 'estado')
     search_fields = ('nomenclatura', 'nombre', 'descripcion')
 
 admin.site.register(Proceso, ProcesoAdmin)
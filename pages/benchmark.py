@@ -0,0 +1,264 @@
+import platform
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+import django
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from .charts import render_timeline, render_mercados
+from .instrumentation import registrar_peticion, estadisticas_pool
+from .models import Proceso
+from . import views
+
+# Usuario con el que se llaman las vistas (se crea si no existe)
+USUARIO = 'benchmark'
+
+
+def _vista(vista, ruta, argumentos=None):
+    # Se llama a la vista directamente (sin middleware) con un usuario autenticado
+    if iscoroutinefunction(vista):
+        vista = async_to_sync(vista)
+
+    def ejecutar(contexto):
+        request = RequestFactory().get(ruta)
+        request.user = contexto['usuario']
+        request.auser = sync_to_async(lambda: contexto['usuario'])
+        response = vista(request, **(argumentos(contexto) if argumentos else {}))
+        if response.status_code != 200:
+            raise RuntimeError(f'{vista.__name__} respondió {response.status_code}')
+    return ejecutar
+
+
+ESCENARIOS = {
+    'home_view': _vista(views.home_view, '/'),
+    'proceso_list': _vista(views.proceso_list, '/procesos/'),
+    'evento_list': _vista(
+        views.evento_list, '/procesos/eventos/', lambda contexto: {'proceso_id': contexto['proceso_id']},
+    ),
+    # Los gráficos se renderizan completos, sin pasar por la caché ni por el almacén pre-renderizado
+    'generate_graphic': lambda contexto: render_timeline('Nacional', None),
+    'generate_pie_chart': lambda contexto: render_mercados(),
+}
+
+
+def contexto_benchmark():
+    """Usuario de las vistas y el proceso con más eventos (para evento_list)."""
+    usuario, _ = get_user_model().objects.get_or_create(
+        username=USUARIO, defaults={'email': f'{USUARIO}@localhost'},
+    )
+    proceso = Proceso.objects.annotate(total=Count('eventos')).order_by('-total', 'id').first()
+    return {'usuario': usuario, 'proceso_id': proceso.pk if proceso else 0}
+
+
+def medir(funcion, contexto):
+    """Una ejecución: tiempo total, consultas SQL y su tiempo."""
+    inicio = time.perf_counter()
+    with registrar_peticion() as metricas:
+        funcion(contexto)
+    return {
+        'wall_ms': (time.perf_counter() - inicio) * 1000,
+        'queries': metricas.consultas,
+        'db_ms': metricas.tiempos['db'],
+    }
+
+
+def pico_memoria(funcion, contexto):
+    """Pico de memoria (KB) de una ejecución según tracemalloc.
+
+    Mide la memoria reservada por Python y numpy, no el RSS del proceso. Va en
+    una ejecución aparte porque tracemalloc hace más lento todo lo demás.
+    """
+    tracemalloc.start()
+    try:
+        funcion(contexto)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico / 1024
+
+
+def ejecutar(escenarios=None, repeticiones=3):
+    """Mide cada escenario ``repeticiones`` veces (después de una ejecución de calentamiento).
+
+    Devuelve, por escenario, la mediana y el mínimo del tiempo, las consultas
+    y el pico de memoria.
+    """
+    contexto = contexto_benchmark()
+    resultados = {}
+    for nombre in escenarios or ESCENARIOS:
+        funcion = ESCENARIOS[nombre]
+        funcion(contexto)  # calentamiento: catálogo, templates y figuras ya cargados
+        mediciones = [medir(funcion, contexto) for _ in range(repeticiones)]
+        tiempos = [m['wall_ms'] for m in mediciones]
+        resultados[nombre] = {
+            'wall_ms': round(statistics.median(tiempos), 2),
+            'wall_ms_min': round(min(tiempos), 2),
+            'queries': max(m['queries'] for m in mediciones),
+            'db_ms': round(statistics.median(m['db_ms'] for m in mediciones), 2),
+            'peak_kb': round(pico_memoria(funcion, contexto), 1),
+        }
+    return resultados
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+@contextmanager
+def _modo_pool(activo):
+    """Ejecuta el bloque con o sin el pool de conexiones, empezando con un pool vacío.
+
+    Los DatabaseWrapper de cada hilo comparten el dict de settings, así que
+    quitar ``OPTIONS['pool']`` vuelve a abrir una conexión por petición en todos.
+    """
+    opciones = connection.settings_dict['OPTIONS']
+    configurado = opciones.get('pool')
+    cerrar_pool = getattr(connection, 'close_pool', lambda: None)
+    cerrar_pool()
+    if not activo:
+        opciones.pop('pool', None)
+    try:
+        yield
+    finally:
+        cerrar_pool()
+        if configurado is not None:
+            opciones['pool'] = configurado
+
+
+def _host():
+    # RequestFactory usa "testserver", que ALLOWED_HOSTS rechaza fuera de los tests (400)
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _hilo_peticiones(handler, ruta, cookie, cantidad, tiempos, errores):
+    # Cada petición pasa por el handler WSGI completo: al terminar, request_finished cierra la
+    # conexión (o la devuelve al pool), como en gunicorn
+    factory = RequestFactory()
+    host = _host()
+    try:
+        for _ in range(cantidad):
+            environ = factory.get(ruta, HTTP_COOKIE=cookie, HTTP_HOST=host, SERVER_NAME=host).environ
+            inicio = time.perf_counter()
+            response = handler(environ, lambda status, headers, exc_info=None: None)
+            b''.join(response)
+            response.close()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if response.status_code != 200:
+                errores.append(response.status_code)
+    finally:
+        connections.close_all()
+
+
+def concurrencia(hilos, peticiones, ruta=None):
+    """Peticiones simultáneas a ``ruta`` (por defecto proceso_list), sin pool y con pool.
+
+    ``hilos`` hilos hacen ``peticiones`` peticiones cada uno. Por modo devuelve
+    peticiones por segundo, latencia mediana y p95 y las conexiones físicas
+    abiertas; con el pool, además, sus esperas y timeouts. La diferencia de
+    latencia entre los dos modos es el costo de abrir la conexión en cada petición.
+    Si alguna petición no responde 200 lanza RuntimeError: la latencia de una
+    página de error no sirve para comparar.
+    """
+    usuario = contexto_benchmark()['usuario']
+    cliente = Client()
+    cliente.force_login(usuario)
+    cookie = f"{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}"
+    ruta = ruta or reverse('proceso_list')
+    handler = WSGIHandler()
+
+    modos = [('sin_pool', False)]
+    if connection.settings_dict['OPTIONS'].get('pool'):
+        modos.append(('pool', True))
+
+    resultados = {}
+    for nombre, activo in modos:
+        with _modo_pool(activo):
+            # Calentamiento (templates, catálogo) con una petición por hilo
+            _hilo_peticiones(handler, ruta, cookie, 1, [], [])
+            conexiones = []
+            contar = lambda sender, connection, **kwargs: conexiones.append(connection.alias)
+            connection_created.connect(contar, weak=False)
+            tiempos, errores = [], []
+            trabajadores = [
+                threading.Thread(target=_hilo_peticiones, args=(handler, ruta, cookie, peticiones, tiempos, errores))
+                for _ in range(hilos)
+            ]
+            inicio = time.perf_counter()
+            try:
+                for trabajador in trabajadores:
+                    trabajador.start()
+                for trabajador in trabajadores:
+                    trabajador.join()
+            finally:
+                connection_created.disconnect(contar)
+            segundos = time.perf_counter() - inicio
+            if errores:
+                raise RuntimeError(
+                    f"{len(errores)} de {len(tiempos)} peticiones a {ruta} ({nombre}) no respondieron 200: "
+                    f"{sorted(set(errores))}"
+                )
+
+            resultado = {
+                'peticiones': len(tiempos),
+                'errores': len(errores),
+                'peticiones_por_segundo': round(len(tiempos) / segundos, 1),
+                'latencia_ms': round(statistics.median(tiempos), 2),
+                'latencia_ms_p95': round(_percentil(tiempos, 0.95), 2),
+                'conexiones_fisicas': len(conexiones),
+            }
+            pool = estadisticas_pool().get(connection.alias)
+            if activo and pool:
+                resultado.update({
+                    'conexiones_fisicas': pool.get('connections_num', 0),
+                    'conexion_ms': pool.get('connections_ms', 0),
+                    'esperas': pool.get('requests_queued', 0),
+                    'espera_ms': pool.get('requests_wait_ms', 0),
+                    'timeouts': pool.get('requests_errors', 0),
+                })
+            resultados[nombre] = resultado
+    return {'hilos': hilos, 'peticiones_por_hilo': peticiones, 'ruta': ruta, 'modos': resultados}
+
+
+def entorno():
+    """Datos del entorno para saber qué se está comparando."""
+    return {
+        'fecha': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base_de_datos': connection.vendor,
+        'pool': connection.settings_dict['OPTIONS'].get('pool') or None,
+    }
+
+
+def comparar(anterior, actual):
+    """Filas (escala, escenario, métrica, antes, ahora, cambio) entre dos resultados de ``benchmark``.
+
+    Las escalas se emparejan por (procesos, eventos_por_proceso).
+    """
+    previas = {(e['procesos'], e['eventos_por_proceso']): e['resultados'] for e in anterior.get('escalas', [])}
+    filas = []
+    for escala in actual.get('escalas', []):
+        clave = (escala['procesos'], escala['eventos_por_proceso'])
+        for escenario, metricas in escala['resultados'].items():
+            previo = previas.get(clave, {}).get(escenario)
+            if not previo:
+                continue
+            for metrica in ('wall_ms', 'queries', 'peak_kb'):
+                antes, ahora = previo[metrica], metricas[metrica]
+                cambio = (ahora - antes) / antes if antes else 0.0
+                filas.append((clave, escenario, metrica, antes, ahora, cambio))
+    return filas
@@ -0,0 +1,30 @@
+from django.db import transaction
+from .cache import bump_data_version
+from .catalog import catalogo, ACTIVIDADES
+from .models import Proceso, Evento
+
+# Procesos por registro masivo: un solo INSERT y un solo UPDATE de estados
+MAXIMO_PROCESOS = 1000
+
+
+def registrar_eventos(proceso_ids, acti, fecha, documento, actividad=None, situacion=None, importe=0):
+    """Crea el mismo evento en cada proceso de ``proceso_ids`` y devuelve los eventos creados.
+
+    Todo va en una transacción: los eventos se insertan con un bulk_create y
+    el estado de los procesos se recalcula con un solo UPDATE, en lugar de un
+    guardado (y sus señales) por evento. Como bulk_create no envía señales,
+    la versión de los datos se avanza aquí al confirmar. ``acti`` ya debe
+    estar validado contra el catálogo (ver EventoMasivoForm).
+    """
+    actividad = actividad or catalogo(ACTIVIDADES).nombre(acti, defecto=None)
+    with transaction.atomic():
+        eventos = Evento.objects.bulk_create([
+            Evento(
+                proceso_id=proceso_id, acti=acti, fecha=fecha, documento=documento,
+                actividad=actividad, situacion=situacion or None, importe=importe,
+            )
+            for proceso_id in proceso_ids
+        ])
+        Proceso.objects.filter(pk__in=proceso_ids).actualizar_estados()
+        transaction.on_commit(bump_data_version)
+    return eventos
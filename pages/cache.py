@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.utils import timezone
+
+DATA_VERSION_KEY = 'pages:data_version'
+DATA_MODIFIED_KEY = 'pages:data_modified'
+CATALOG_VERSION_KEY = 'pages:catalog_version'
+
+
+def _nueva_version():
+    # Un valor distinto en cada cambio en lugar de un contador: con FileBasedCache, incr lee y
+    # escribe sin bloqueo y dos workers que avanzan a la vez pueden dejar el mismo número
+    return uuid.uuid4().hex
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = _nueva_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_version(key):
+    # Solo se compara por igualdad: la última escritura gana y siempre es distinta de cualquier
+    # versión anterior, incluso si dos workers avanzan en el mismo segundo o la caché estaba vacía
+    version = _nueva_version()
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def get_data_version():
+    """Versión actual de los datos de Proceso/Evento/Formula.
+
+    Se guarda en la caché por defecto para que todos los workers la compartan.
+    Es un identificador opaco (no un contador): solo sirve compararla por igualdad.
+    """
+    return _get_version(DATA_VERSION_KEY)
+
+
+def get_data_modified():
+    """Fecha y hora (sin microsegundos) del último cambio registrado en los datos."""
+    modified = cache.get(DATA_MODIFIED_KEY)
+    if modified is None:
+        cache.add(DATA_MODIFIED_KEY, timezone.now().replace(microsecond=0), timeout=None)
+        modified = cache.get(DATA_MODIFIED_KEY)
+    return modified
+
+
+def bump_data_version():
+    """Avanza la versión de los datos; invalida todo lo cacheado con la versión anterior."""
+    cache.set(DATA_MODIFIED_KEY, timezone.now().replace(microsecond=0), timeout=None)
+    return _bump_version(DATA_VERSION_KEY)
+
+
+def get_catalog_version():
+    """Versión del catálogo de Parametro/Formula compartida entre workers."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Avisa a todos los workers que deben recargar el catálogo en memoria."""
+    return _bump_version(CATALOG_VERSION_KEY)
+
+
+class ChartCache:
+    """Caché LRU en memoria para los gráficos renderizados del dashboard.
+
+    Las claves incluyen la versión de los datos, así que una entrada nunca se
+    sirve después de un cambio; las entradas viejas salen por LRU.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, key, render):
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+chart_cache = ChartCache(getattr(settings, 'CHART_CACHE_MAX_ENTRIES', 32))
+
+
+class ResultCache:
+    """Caché de resultados de consultas en un backend de ``CACHES`` (locmem, archivos o Redis).
+
+    La clave se arma con las partes que recibe ``get_or_set`` (filtros ya
+    normalizados, orden, cursor) más la versión de los datos, que las señales
+    de Proceso/Evento/Formula avanzan: después de un cambio nada se sirve de la
+    versión anterior y esas entradas vencen solas. Cuenta aciertos y fallos del
+    worker (ver ``stats()``).
+    """
+
+    def __init__(self, alias, prefijo, timeout=None):
+        self.alias = alias
+        self.prefijo = prefijo
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    @property
+    def backend(self):
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            # Sin el alias en CACHES se usa la caché por defecto
+            return cache
+
+    def clave(self, partes):
+        resumen = hashlib.sha1(repr((partes, get_data_version())).encode()).hexdigest()
+        return f'{self.prefijo}:{resumen}'
+
+    def get_or_set(self, partes, calcular):
+        clave = self.clave(partes)
+        valor = self.backend.get(clave)
+        acierto = valor is not None
+        with self._lock:
+            self._stats['hits' if acierto else 'misses'] += 1
+        if not acierto:
+            valor = calcular()
+            self.backend.set(clave, valor, self.timeout)
+        return valor
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / total, 3) if total else None
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+# Páginas de proceso_list: (id, nombre, descripción, estimado, estado) de cada fila y los cursores
+list_cache = ResultCache(
+    getattr(settings, 'LIST_CACHE_ALIAS', 'listas'), 'pages:proceso_list',
+    getattr(settings, 'LIST_CACHE_TIMEOUT', 300),
+)
+
+# Reportes agregados (duración de las etapas): se recalculan solo cuando cambia la versión de los datos
+report_cache = ResultCache(
+    getattr(settings, 'LIST_CACHE_ALIAS', 'listas'), 'pages:reportes',
+    getattr(settings, 'REPORT_CACHE_TIMEOUT', 3600),
+)
@@ -0,0 +1,124 @@
+import threading
+import time
+from django.conf import settings
+from .cache import get_catalog_version, bump_catalog_version
+
+# Parametros que el código consulta por número
+PERIODOS = 11        # años / convocatorias
+ACTIVIDADES = 12     # actividades de los eventos
+ESTADOS = 29         # estados válidos de un proceso
+ESTADOS_GRAFICO = 50  # estados de la línea de tiempo
+
+PARAMETROS = (PERIODOS, ACTIVIDADES, ESTADOS, ESTADOS_GRAFICO)
+
+# Cada cuántos segundos, como máximo, se consulta la versión compartida del catálogo
+CHECK_INTERVAL = getattr(settings, 'CATALOG_CHECK_INTERVAL', 2)
+
+
+class Catalogo:
+    """Fórmulas de un parametro con índices en memoria.
+
+    Si varias fórmulas comparten cantidad, orden, nombre o descripción, el
+    índice devuelve la de menor id (lo mismo que hacía ``.first()``).
+    """
+
+    def __init__(self, parametro_id, formulas):
+        self.parametro_id = parametro_id
+        self.formulas = sorted(formulas, key=lambda f: f.pk)
+        self.ordenadas = sorted(self.formulas, key=lambda f: f.orden)
+        self.por_pk = {formula.pk: formula for formula in self.formulas}
+        self.por_cantidad = self._indice('cantidad')
+        self.por_orden = self._indice('orden')
+        self.por_nombre = self._indice('nombre')
+        self.por_descripcion = self._indice('descripcion')
+
+    def _indice(self, campo):
+        indice = {}
+        for formula in self.formulas:
+            indice.setdefault(getattr(formula, campo), formula)
+        return indice
+
+    def buscar(self, campo, valor):
+        """Fórmula cuyo ``campo`` (pk u orden) es ``valor``; acepta el valor como texto."""
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            return None
+        indice = self.por_pk if campo == 'pk' else self.por_orden
+        return indice.get(valor)
+
+    def nombre(self, valor, campo='orden', defecto=None):
+        formula = getattr(self, f'por_{campo}').get(valor)
+        return formula.nombre if formula else defecto
+
+    def nombres(self):
+        """Nombres distintos en orden de aparición."""
+        return list(dict.fromkeys(formula.nombre for formula in self.formulas))
+
+    def __iter__(self):
+        return iter(self.formulas)
+
+    def __len__(self):
+        return len(self.formulas)
+
+
+class CatalogRegistry:
+    """Catálogo de Formula de los parametros conocidos, cargado en una sola consulta.
+
+    Se invalida localmente con las señales de Formula/Parametro y, para el
+    resto de los workers, mediante la versión compartida en la caché.
+    """
+
+    def __init__(self, parametros=PARAMETROS):
+        self.parametros = tuple(parametros)
+        self._catalogos = None
+        self._version = None
+        self._verificado = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, parametro_id):
+        self._verificar()
+        catalogos = self._catalogos
+        if catalogos is None:
+            catalogos = self._cargar()
+        return catalogos[parametro_id]
+
+    def _verificar(self):
+        ahora = time.monotonic()
+        if self._catalogos is None or ahora - self._verificado < CHECK_INTERVAL:
+            return
+        self._verificado = ahora
+        if get_catalog_version() != self._version:
+            self._catalogos = None
+
+    def _cargar(self):
+        from .models import Formula
+
+        with self._lock:
+            if self._catalogos is not None:
+                return self._catalogos
+            # La versión se lee antes de la consulta para no perder un cambio concurrente
+            version = get_catalog_version()
+            agrupadas = {parametro_id: [] for parametro_id in self.parametros}
+            formulas = Formula.objects.filter(parametro_id__in=self.parametros).select_related('parametro')
+            for formula in formulas:
+                agrupadas[formula.parametro_id].append(formula)
+            self._catalogos = {
+                parametro_id: Catalogo(parametro_id, lista) for parametro_id, lista in agrupadas.items()
+            }
+            self._version = version
+            self._verificado = time.monotonic()
+            return self._catalogos
+
+    def invalidar(self, compartir=True):
+        """Descarta el catálogo de este worker y, si ``compartir``, el de todos los demás."""
+        if compartir:
+            bump_catalog_version()
+        self._catalogos = None
+
+
+registry = CatalogRegistry()
+
+
+def catalogo(parametro_id):
+    return registry.get(parametro_id)
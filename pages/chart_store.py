@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from django.conf import settings
+
+
+def _store_dir():
+    return Path(getattr(settings, 'CHART_STORE_DIR', settings.BASE_DIR / '.cache' / 'charts'))
+
+
+def store_path(key):
+    nombre = hashlib.sha1(repr(key).encode()).hexdigest()
+    # El segundo elemento de la clave es el formato (png, webp, svg) y el último la versión de los
+    # datos: cada versión va en su directorio para que prune sepa cuáles son viejas
+    return _store_dir() / str(key[-1]) / f'{nombre}.{key[1]}'
+
+
+def read(key):
+    """Devuelve la imagen pre-renderizada para la clave o None si todavía no existe."""
+    try:
+        return store_path(key).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def write(key, image):
+    # Escritura atómica: los lectores nunca ven un archivo a medio escribir
+    path = store_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(image)
+    os.replace(tmp, path)
+    return path
+
+
+def prune(versiones):
+    """Borra las imágenes de las versiones de los datos que no están en ``versiones``.
+
+    Las de una versión vigente se conservan aunque no sean de prerender_charts
+    (p. ej. las que renderizó un worker al pedirlas). Los temporales de una
+    escritura en curso no se tocan.
+    """
+    vigentes = {str(version) for version in versiones}
+    borradas = 0
+    if not _store_dir().is_dir():
+        return borradas
+    for directorio in _store_dir().iterdir():
+        if directorio.is_dir():
+            if directorio.name in vigentes:
+                continue
+            archivos = [path for path in directorio.iterdir() if path.suffix != '.tmp']
+        elif directorio.suffix != '.tmp':
+            archivos = [directorio]  # imágenes sueltas, de antes de separar por versión
+        else:
+            continue
+        for path in archivos:
+            path.unlink(missing_ok=True)
+            borradas += 1
+        if directorio.is_dir():
+            try:
+                directorio.rmdir()
+            except OSError:
+                pass  # queda un temporal: se borra en el próximo prune
+    return borradas
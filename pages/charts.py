@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.utils import timezone
+from .models import Proceso
+from .graphic import generate_graphic, get_market_buttons
+from .graphic2 import generate_pie_chart
+from .timeline import linea_tiempo_json
+from .cache import chart_cache, get_data_version
+from .instrumentation import metricas_actuales
+from .pagination import KeysetPaginator
+from .renderer import MAX_RENDERS
+from . import chart_store, prerender
+
+logger = logging.getLogger(__name__)
+
+# Procesos que renderizan los gráficos del dashboard asíncrono en paralelo (0: hilos del worker).
+# Con hilos los renders se turnan por el GIL; con procesos cada gráfico usa su propio núcleo,
+# a costa de un Django y una conexión más por proceso en cada worker (ver settings.py)
+RENDER_PROCESSES = getattr(settings, 'CHART_RENDER_PROCESSES', 0)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Procesos por página en el dashboard
+PROCESOS_POR_PAGINA = 15
+
+def procesos_por_mercado(mercado_seleccionado):
+    # El mercado es una columna indexada (ver Proceso.mercado); cualquier otro valor cuenta como Nacional
+    mercado = 'Extranjero' if mercado_seleccionado == 'Extranjero' else 'Nacional'
+    procesos = Proceso.objects.filter(mercado=mercado)
+
+    # Ordenar los procesos por el campo 'nombre'
+    return procesos.order_by('nombre')
+
+def paginar_procesos_mercado(procesos, cursor):
+    # Paginación por clave (nombre, id): cada página es una sola consulta, sin COUNT ni OFFSET
+    paginator = KeysetPaginator(procesos, ('nombre', 'id'), PROCESOS_POR_PAGINA)
+    return paginator.get_page(cursor)  # Obtener los procesos para la página actual
+
+async def apaginar_procesos_mercado(procesos, cursor):
+    paginator = KeysetPaginator(procesos, ('nombre', 'id'), PROCESOS_POR_PAGINA)
+    return await paginator.aget_page(cursor)
+
+# Perfiles (formato, tamaño) que usa el dashboard: miniatura en la tarjeta y png completo bajo demanda
+PERFILES_DASHBOARD = [('webp', 'thumb'), ('png', 'full')]
+
+# Las claves terminan con la versión de los datos: chart_store guarda cada versión en su directorio
+def timeline_key(mercado_seleccionado, cursor, formato='png', tamano='full'):
+    # La fecha forma parte de la clave porque el gráfico dibuja la línea de "Hoy"
+    return (
+        'timeline',
+        formato,
+        tamano,
+        mercado_seleccionado,
+        cursor or '',
+        timezone.localdate().isoformat(),
+        get_data_version(),
+    )
+
+def mercados_key(formato='png', tamano='full'):
+    return ('mercados', formato, tamano, get_data_version())
+
+def render_timeline(mercado_seleccionado, cursor, formato='png', tamano='full'):
+    procesos = procesos_por_mercado(mercado_seleccionado)
+    page_obj = paginar_procesos_mercado(procesos, cursor)
+
+    # Definir una longitud máxima para las etiquetas (ajusta según tus necesidades)
+    max_label_length = 20
+
+    # Generar el gráfico solo con los procesos de la página actual
+    return generate_graphic(page_obj, mercado_seleccionado, max_label_length, formato, tamano)
+
+def render_mercados(formato='png', tamano='full'):
+    # Procesos y montos por mercado para el gráfico de pastel (los procesos sin nombre no cuentan)
+    procesos_con_nombre = Proceso.objects.exclude(nombre__isnull=True).exclude(nombre='')
+    return generate_pie_chart(procesos_con_nombre.por_mercado(), formato, tamano)
+
+def timeline_data(mercado_seleccionado, cursor):
+    procesos = procesos_por_mercado(mercado_seleccionado)
+    page_obj = paginar_procesos_mercado(procesos, cursor)
+    data = linea_tiempo_json(page_obj, max_label_length=20)
+    data.update({
+        'mercado': mercado_seleccionado,
+        'cursor': cursor or '',
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+        'hoy': timezone.localdate().isoformat(),
+    })
+    return data
+
+def get_chart(key, render):
+    """Busca el gráfico en la caché del worker, luego en el almacén pre-renderizado
+    (ver el comando prerender_charts) y solo si no existe lo renderiza aquí y lo guarda
+    en el almacén, que comparten todos los workers."""
+    def cargar():
+        image = chart_store.read(key)
+        if image is None:
+            image = render()
+            chart_store.write(key, image)
+        return image
+    return chart_cache.get_or_render(key, cargar)
+
+def chart_cursores(mercado):
+    """Todos los cursores con los que el dashboard puede pedir una página del mercado.
+
+    Las páginas se recorren con los cursores "siguiente"; el enlace "anterior"
+    de cada página lleva otro cursor (la misma página, otra clave), así que
+    también se incluyen.
+    """
+    cursores = [None]
+    cursor = None
+    while True:
+        page_obj = paginar_procesos_mercado(procesos_por_mercado(mercado), cursor)
+        if page_obj.previous_cursor is not None:
+            cursores.append(page_obj.previous_cursor)
+        cursor = page_obj.next_cursor
+        if cursor is None:
+            return cursores
+        cursores.append(cursor)
+
+def chart_jobs():
+    """Todas las combinaciones (mercado, cursor) del dashboard más el gráfico de mercados,
+    en cada uno de los perfiles que usa el dashboard."""
+    jobs = [mercados_key(*perfil) for perfil in PERFILES_DASHBOARD]
+    for mercado in get_market_buttons():
+        for cursor in chart_cursores(mercado):
+            jobs.extend(timeline_key(mercado, cursor, *perfil) for perfil in PERFILES_DASHBOARD)
+    return jobs
+
+def render_key(key):
+    chart, formato, tamano = key[:3]
+    if chart == 'timeline':
+        return render_timeline(key[3], key[4], formato, tamano)
+    return render_mercados(formato, tamano)
+
+def render_executor():
+    """Executor compartido del worker para los renders del dashboard asíncrono.
+
+    Lo crea ``iniciar_render_executor`` al arrancar el worker ASGI; si no, el
+    primer uso.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if RENDER_PROCESSES:
+                # Igual que prerender_charts: procesos 'spawn' con su propio Django y sus conexiones
+                _executor = ProcessPoolExecutor(
+                    max_workers=RENDER_PROCESSES,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=prerender.init_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'django_project.settings'),),
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=MAX_RENDERS, thread_name_prefix='chart-render')
+        return _executor
+
+
+def iniciar_render_executor():
+    """Crea el executor de renderizado al arrancar el worker (django_project/asgi.py).
+
+    Con procesos también los arranca: cada uno carga Django mientras el worker
+    ya atiende peticiones, en lugar de hacerlo durante el primer dashboard.
+    """
+    executor = render_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        # Los procesos 'spawn' se crean de a uno por tarea pendiente
+        for _ in range(RENDER_PROCESSES):
+            executor.submit(prerender.precargar)
+    return executor
+
+
+def _descartar_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+async def aget_chart(key):
+    """Versión asíncrona de ``get_chart``: el render corre en ``render_executor()``.
+
+    No bloquea el event loop, así que varios gráficos se renderizan a la vez
+    y las demás peticiones del worker siguen atendiéndose. Si el pool de
+    procesos se rompe (un hijo murió) se descarta y se renderiza en un hilo.
+    """
+    image = chart_cache.get(key)
+    if image is not None:
+        return image
+    loop = asyncio.get_running_loop()
+    executor = render_executor()
+    try:
+        image, metricas = await loop.run_in_executor(executor, prerender.cargar_o_renderizar_medido, key)
+    except BrokenProcessPool:
+        logger.warning('Pool de renderizado roto; se vuelve a crear en el próximo render')
+        _descartar_executor(executor)
+        image, metricas = await loop.run_in_executor(None, prerender.cargar_o_renderizar_medido, key)
+    # El render corrió en otro hilo o proceso: sus consultas y su tiempo van a Server-Timing desde aquí
+    actuales = metricas_actuales()
+    if actuales is not None:
+        actuales.agregar(metricas)
+    chart_cache.set(key, image)
+    return image
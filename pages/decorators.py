@@ -0,0 +1,27 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.decorators import login_required as django_login_required
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import resolve_url
+
+
+def login_required(view):
+    """``login_required`` de Django que además acepta vistas ``async def``.
+
+    Django 5.0 solo decora vistas síncronas (el soporte async llega en 5.1).
+    En las asíncronas el usuario se carga con ``request.auser()`` y queda en
+    ``request.user``, así el template no vuelve a consultar la sesión de forma
+    síncrona dentro del event loop.
+    """
+    if not iscoroutinefunction(view):
+        return django_login_required(view)
+
+    @wraps(view)
+    async def envoltura(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), resolve_url(settings.LOGIN_URL))
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return envoltura
@@ -0,0 +1,133 @@
+from django.db import connection
+from .cache import report_cache
+from .catalog import catalogo, PERIODOS
+from .models import Proceso, IntervaloEstado
+from .timeline import cargar_estados
+
+# Columna de Proceso por la que se agrupa el reporte
+AGRUPACIONES = {'mercado': 'p.mercado', 'periodo': 'COALESCE(p.periodo_id, 0)'}
+
+# Tramos atípicos (los más largos) que se listan
+ATIPICOS_VISIBLES = 20
+
+# Duración de los tramos cerrados de cada estado por grupo. Los tramos salen de IntervaloEstado,
+# que ya los calcula con LAG/LEAD sobre los eventos ordenados por (proceso, fecha, id); el tramo
+# actual de cada proceso queda fuera porque todavía no terminó. Un tramo es atípico si dura más
+# que Q3 + 1,5 * (Q3 - Q1) de su grupo y estado (criterio de Tukey)
+DURACIONES_SQL = """
+WITH tramos AS (
+    SELECT {grupo} AS grupo, i.estado, i.duracion, i.proceso_id, i.inicio
+    FROM {intervalos} i
+    JOIN {procesos} p ON p.id = i.proceso_id
+    WHERE NOT i.actual
+),
+estadisticas AS (
+    SELECT grupo, estado, COUNT(*) AS tramos, AVG(duracion) AS promedio, MAX(duracion) AS maximo,
+           percentile_cont(ARRAY[0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY duracion) AS cuantiles
+    FROM tramos
+    GROUP BY grupo, estado
+),
+limites AS (
+    SELECT *, cuantiles[3] + 1.5 * (cuantiles[3] - cuantiles[1]) AS limite FROM estadisticas
+)
+"""
+
+ETAPAS_SQL = DURACIONES_SQL + """
+SELECT l.grupo, l.estado, l.tramos, l.promedio, l.cuantiles[2], l.cuantiles[4], l.maximo, l.limite,
+       COUNT(*) FILTER (WHERE t.duracion > l.limite)
+FROM limites l
+JOIN tramos t ON t.grupo = l.grupo AND t.estado = l.estado
+GROUP BY l.grupo, l.estado, l.tramos, l.promedio, l.cuantiles, l.maximo, l.limite
+"""
+
+ATIPICOS_SQL = DURACIONES_SQL + """
+SELECT t.grupo, t.estado, t.proceso_id, p.nombre, t.inicio, t.duracion, l.limite
+FROM tramos t
+JOIN limites l ON l.grupo = t.grupo AND l.estado = t.estado
+JOIN {procesos} p ON p.id = t.proceso_id
+WHERE t.duracion > l.limite
+ORDER BY t.duracion DESC, t.proceso_id, t.inicio
+LIMIT %s
+"""
+
+
+def _consultar(sql, agrupar, params=()):
+    sql = sql.format(
+        grupo=AGRUPACIONES[agrupar],
+        intervalos=IntervaloEstado._meta.db_table,
+        procesos=Proceso._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _nombre_grupo(agrupar, grupo):
+    if agrupar == 'periodo':
+        # periodo_id guarda el orden de la fórmula del parametro 11
+        return catalogo(PERIODOS).nombre(grupo, defecto='Sin periodo')
+    return grupo
+
+
+def _redondear(valor):
+    return None if valor is None else round(float(valor), 1)
+
+
+def calcular_duraciones(agrupar='mercado'):
+    """Duración en días de cada etapa (estado del parametro 50) por mercado o por periodo.
+
+    Por grupo y estado devuelve la cantidad de tramos cerrados, el promedio, la
+    mediana, el p90, el máximo, el límite a partir del cual un tramo es atípico
+    y cuántos lo superan; además, los tramos atípicos más largos. Todo se
+    agrega en PostgreSQL en dos consultas.
+    """
+    formulas, _, _ = cargar_estados()
+    orden_estados = {}
+    for i, formula in enumerate(formulas):
+        orden_estados.setdefault(formula.nombre, i)
+
+    grupos = {}
+    for grupo, estado, tramos, promedio, mediana, p90, maximo, limite, atipicos in _consultar(ETAPAS_SQL, agrupar):
+        grupos.setdefault(grupo, []).append({
+            'estado': estado,
+            'tramos': tramos,
+            'promedio': _redondear(promedio),
+            'mediana': _redondear(mediana),
+            'p90': _redondear(p90),
+            'maximo': maximo,
+            'limite_atipico': _redondear(limite),
+            'atipicos': atipicos,
+        })
+
+    atipicos = [
+        {
+            'grupo': _nombre_grupo(agrupar, grupo),
+            'estado': estado,
+            'proceso_id': proceso_id,
+            'nombre': nombre,
+            'inicio': inicio.isoformat(),
+            'duracion': duracion,
+            'limite_atipico': _redondear(limite),
+        }
+        for grupo, estado, proceso_id, nombre, inicio, duracion, limite
+        in _consultar(ATIPICOS_SQL, agrupar, [ATIPICOS_VISIBLES])
+    ]
+
+    return {
+        'agrupar': agrupar,
+        'grupos': [
+            {
+                'grupo': _nombre_grupo(agrupar, grupo),
+                'etapas': sorted(etapas, key=lambda etapa: (orden_estados.get(etapa['estado'], len(formulas)), etapa['estado'])),
+            }
+            for grupo, etapas in sorted(grupos.items(), key=lambda item: item[0])
+        ],
+        'atipicos': atipicos,
+    }
+
+
+def reporte_duraciones(agrupar='mercado'):
+    """calcular_duraciones desde la caché de reportes (la clave incluye la versión de los datos)."""
+    if agrupar not in AGRUPACIONES:
+        agrupar = 'mercado'
+    return report_cache.get_or_set(('duraciones', agrupar), lambda: calcular_duraciones(agrupar))
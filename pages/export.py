@@ -0,0 +1,137 @@
+import csv
+import tempfile
+from collections import defaultdict
+from itertools import islice
+from asgiref.sync import sync_to_async
+from .catalog import catalogo, PERIODOS
+from .models import Evento
+
+# Filas que trae cada viaje del cursor del servidor (y cada prefetch de eventos)
+CHUNK_SIZE = 2000
+
+# Bloques de FileResponse (4 KB cada uno) que se leen juntos al enviar el xlsx por ASGI
+BLOQUES_ARCHIVO = 16
+
+FORMATOS_EXPORTACION = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+COLUMNAS_PROCESO = [
+    ('id', 'Id'), ('nomenclatura', 'Nomenclatura'), ('nombre', 'Nombre'), ('descripcion', 'Descripción'),
+    ('mercado', 'Mercado'), ('moneda', 'Moneda'), ('cambio', 'Cambio'), ('estimado', 'Estimado'),
+    ('expediente', 'Expediente'), ('periodo', 'Periodo'), ('convocatoria', 'Convocatoria'),
+    ('convocado', 'Convocado'), ('derivado', 'Derivado'), ('estado', 'Estado'),
+    ('ultimo_acti', 'Último acti'), ('fecha_ultimo_evento', 'Fecha último evento'),
+]
+COLUMNAS_EVENTO = [
+    ('fecha', 'Fecha evento'), ('acti', 'Acti'), ('acti_nombre', 'Actividad (fórmula)'),
+    ('actividad', 'Actividad'), ('documento', 'Documento'), ('situacion', 'Situación'), ('importe', 'Importe'),
+]
+
+
+def cabecera(con_eventos=False):
+    columnas = COLUMNAS_PROCESO + (COLUMNAS_EVENTO if con_eventos else [])
+    return [titulo for _, titulo in columnas]
+
+
+def _campo_consulta(campo):
+    # periodo y convocado se leen como id y se traducen con el catálogo en memoria (sin JOIN)
+    return f'{campo}_id' if campo in ('periodo', 'convocado') else campo
+
+
+def _bloques(iterable, tamano):
+    iterador = iter(iterable)
+    while True:
+        bloque = list(islice(iterador, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+def filas(procesos, con_eventos=False):
+    """Genera las filas de la exportación en el orden del queryset.
+
+    Recorre los procesos con un cursor del servidor (``iterator``) en bloques
+    de CHUNK_SIZE, como tuplas y no como instancias, así que la memoria no
+    crece con el total. Con ``con_eventos`` hay una fila por evento (los datos
+    del proceso se repiten) y los eventos de cada bloque llegan en una sola
+    consulta extra.
+    """
+    periodos = catalogo(PERIODOS)
+    campos = [_campo_consulta(campo) for campo, _ in COLUMNAS_PROCESO]
+    indices_periodo = [i for i, campo in enumerate(campos) if campo in ('periodo_id', 'convocado_id')]
+    filas_procesos = procesos.values_list(*campos).iterator(chunk_size=CHUNK_SIZE)
+    sin_eventos = [None] * len(COLUMNAS_EVENTO)
+
+    for bloque in _bloques(filas_procesos, CHUNK_SIZE):
+        eventos = defaultdict(list)
+        if con_eventos:
+            consulta = Evento.objects.filter(proceso_id__in=[fila[0] for fila in bloque]).con_acti_nombre()
+            for proceso_id, *evento in consulta.order_by('proceso_id', 'fecha', 'id').values_list(
+                'proceso_id', *[campo for campo, _ in COLUMNAS_EVENTO]
+            ):
+                eventos[proceso_id].append(evento)
+
+        for fila in bloque:
+            fila = list(fila)
+            for i in indices_periodo:
+                fila[i] = periodos.nombre(fila[i], defecto='')
+            if not con_eventos:
+                yield fila
+                continue
+            for evento in eventos.get(fila[0]) or [sin_eventos]:
+                yield fila + evento
+
+
+class _Eco:
+    # Objeto tipo archivo que devuelve lo escrito: csv.writer arma la línea y se envía tal cual
+    def write(self, valor):
+        return valor
+
+
+def csv_stream(procesos, con_eventos=False):
+    """Líneas CSV para un StreamingHttpResponse (con BOM para que Excel detecte UTF-8)."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow(cabecera(con_eventos))
+    for fila in filas(procesos, con_eventos):
+        yield escritor.writerow(['' if valor is None else valor for valor in fila])
+
+
+async def aiterar(iterable, tamano=CHUNK_SIZE):
+    """Recorre un iterador síncrono desde ASGI, ``tamano`` partes por vez.
+
+    Con un iterador síncrono, StreamingHttpResponse bajo ASGI lo consume entero
+    (``sync_to_async(list)``) antes de enviar el primer byte. Aquí cada bloque
+    se pide con sync_to_async, siempre en el mismo hilo (el cursor del
+    servidor sigue en la misma conexión), y se envía unido en una sola parte.
+    """
+    iterador = iter(iterable)
+    siguiente = sync_to_async(lambda: list(islice(iterador, tamano)))
+    try:
+        while bloque := await siguiente():
+            yield bloque[0][:0].join(bloque)
+    finally:
+        cerrar = getattr(iterador, 'close', None)
+        if cerrar is not None:
+            await sync_to_async(cerrar)()
+
+
+def xlsx_archivo(procesos, con_eventos=False):
+    """Escribe el libro en un archivo temporal y lo devuelve abierto al inicio.
+
+    openpyxl en modo write_only escribe cada fila a disco en lugar de
+    guardarla, así que la memoria no crece con el total; el archivo ZIP solo
+    se puede enviar cuando está completo. Excel admite hasta 1.048.576 filas.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Procesos')
+    hoja.append(cabecera(con_eventos))
+    for fila in filas(procesos, con_eventos):
+        hoja.append(fila)
+    archivo = tempfile.TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
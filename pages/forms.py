@@ -1,11 +1,60 @@
+import re
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 from .models import Proceso, Evento, Parametro, Formula
+from .catalog import catalogo, PERIODOS, ACTIVIDADES, ESTADOS
+from .importer import EXTENSIONES
+from .bulk import MAXIMO_PROCESOS
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+class CatalogoChoiceIterator(ModelChoiceIterator):
+    # Recorre las fórmulas del catálogo en memoria en lugar del queryset
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for formula in self.field.catalogo():
+            yield self.choice(formula)
+
+    def __len__(self):
+        return len(self.field.catalogo()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or len(self.field.catalogo()) > 0
+
+class CatalogoChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField de las fórmulas de un parametro que no consulta la base de datos.
+
+    Las opciones y la validación salen del catálogo en memoria (ver catalog.py).
+    """
+    iterator = CatalogoChoiceIterator
+
+    def __init__(self, parametro_id, **kwargs):
+        self.parametro_id = parametro_id
+        super().__init__(queryset=Formula.objects.filter(parametro_id=parametro_id), **kwargs)
+
+    def catalogo(self):
+        return catalogo(self.parametro_id)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        campo = self.to_field_name or 'pk'
+        if isinstance(value, Formula):
+            value = getattr(value, campo)
+        formula = self.catalogo().buscar(campo, value)
+        if formula is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return formula
+
 class ProcesoForm(forms.ModelForm):
-    periodo = forms.ModelChoiceField(queryset=Formula.objects.filter(parametro_id=11), required=False, to_field_name='orden')
-    convocado = forms.ModelChoiceField(queryset=Formula.objects.filter(parametro_id=11), required=False, to_field_name='orden')
+    periodo = CatalogoChoiceField(PERIODOS, required=False, to_field_name='orden')
+    convocado = CatalogoChoiceField(PERIODOS, required=False, to_field_name='orden')
 
     class Meta:
         model = Proceso
@@ -35,7 +84,7 @@ class EventoForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        formulas = Formula.objects.filter(parametro_id=12).order_by('orden')
+        formulas = catalogo(ACTIVIDADES).ordenadas
         self.fields['acti'].choices = [(f.orden, f.nombre) for f in formulas]
 
     def clean_importe(self):
@@ -45,6 +94,50 @@ class EventoForm(forms.ModelForm):
             return 0
         return importe
 
+class EventoMasivoForm(forms.Form):
+    """El mismo evento (actividad, fecha y documento) para varios procesos a la vez."""
+    procesos = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 3}),
+        help_text="Ids de los procesos, separados por comas, espacios o saltos de línea.",
+    )
+    acti = forms.ChoiceField(label="Actividad (Fórmula)")
+    fecha = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    documento = forms.CharField(max_length=100)
+    actividad = forms.CharField(
+        max_length=100, required=False, help_text="Si se deja vacío, el nombre de la actividad del catálogo.",
+    )
+    situacion = forms.CharField(widget=forms.Textarea(attrs={'rows': 2}), required=False)
+    importe = forms.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Las actividades válidas (parametro 12) se leen una vez del catálogo en memoria
+        self.fields['acti'].choices = [(f.orden, f.nombre) for f in catalogo(ACTIVIDADES).ordenadas]
+
+    def clean_procesos(self):
+        partes = [parte for parte in re.split(r'[\s,;]+', self.cleaned_data['procesos']) if parte]
+        invalidos = [parte for parte in partes if not parte.isdigit()]
+        if invalidos:
+            raise ValidationError(f"Ids no válidos: {', '.join(invalidos[:10])}.")
+        ids = sorted({int(parte) for parte in partes})
+        if not ids:
+            raise ValidationError("Indique al menos un proceso.")
+        if len(ids) > MAXIMO_PROCESOS:
+            raise ValidationError(f"Como máximo {MAXIMO_PROCESOS} procesos por vez.")
+        # Una sola consulta para comprobar que existen todos
+        existentes = set(Proceso.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        faltantes = [str(pk) for pk in ids if pk not in existentes]
+        if faltantes:
+            raise ValidationError(f"No existen los procesos: {', '.join(faltantes[:20])}.")
+        return ids
+
+    def clean_acti(self):
+        return int(self.cleaned_data['acti'])
+
+    def clean_importe(self):
+        importe = self.cleaned_data.get('importe')
+        return 0 if importe is None else importe
+
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
 
@@ -52,27 +145,38 @@ class CustomUserCreationForm(UserCreationForm):
         model = User
         fields = ('username', 'email', 'password1', 'password2')
 
+class ImportarForm(forms.Form):
+    tipo = forms.ChoiceField(choices=[('procesos', 'Procesos'), ('eventos', 'Eventos')])
+    archivo = forms.FileField(help_text="Archivo .csv o .xlsx con una fila de cabecera.")
+    simular = forms.BooleanField(required=False, label="Solo validar (no guardar)")
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(EXTENSIONES):
+            raise ValidationError(f"Formato no soportado; use {' o '.join(EXTENSIONES)}.")
+        return archivo
+
 class ProcesoFilterForm(forms.Form):
     nombre = forms.CharField(required=False)
     descripcion = forms.CharField(required=False)
     estimado = forms.DecimalField(required=False)
     estimado_condition = forms.ChoiceField(choices=[('gt', 'Mayor que'), ('lt', 'Menor que'), ('eq', 'Igual a')], required=False)
     estado = forms.ChoiceField(required=False)  # Descomentamos esta línea
-    convoca = forms.ModelChoiceField(queryset=Formula.objects.filter(parametro_id=11), required=False)
+    dias_estado = forms.IntegerField(required=False, min_value=1, label="Más de N días en el estado")
+    convoca = CatalogoChoiceField(PERIODOS, required=False)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Obtener las opciones de estado desde la base de datos
-        estados = Formula.objects.filter(parametro_id=29).values_list('nombre', 'nombre').distinct()
-        self.fields['estado'].choices = [('', 'Todos')] + list(estados)
+        # Obtener las opciones de estado desde el catálogo en memoria
+        estados = catalogo(ESTADOS).nombres()
+        self.fields['estado'].choices = [('', 'Todos')] + [(nombre, nombre) for nombre in estados]
 
         # Establecer el valor por defecto para el campo 'convoca'
-        default_convoca = Formula.objects.filter(parametro_id=11, cantidad=2).first()
+        default_convoca = catalogo(PERIODOS).por_cantidad.get(2)
         if default_convoca:
             self.fields['convoca'].initial = default_convoca.id
 
         # Modificar las opciones de convoca para incluir el orden
-        self.fields['convoca'].queryset = Formula.objects.filter(parametro_id=11)
         self.fields['convoca'].label_from_instance = lambda obj: f"{obj.nombre} (Orden: {obj.orden})"
 
         # Añadir clases de Bootstrap a los campos
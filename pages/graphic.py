@@ -1,93 +1,68 @@
-import matplotlib.pyplot as plt
+import logging
 import matplotlib.dates as mdates
-import io
-import base64
+from matplotlib.patches import Rectangle
 from datetime import datetime, date
-from django.db.models import OuterRef, Subquery
-from .models import Formula, Evento
+from .timeline import construir_linea_tiempo, etiqueta_proceso
+from .renderer import figura, exportar
+from .instrumentation import medir
 
-def generate_graphic(procesos, eventos, mercado_seleccionado, activities, max_label_length):
-    # Tamaño del gráfico ajustado para maximizar la altura
-    fig, ax = plt.subplots(figsize=(32, 18))  # Aumentado la altura de 16 a 18
+logger = logging.getLogger(__name__)
 
+# Resolución de cada tamaño: 32 pulgadas a 40 dpi son 1280 px, suficiente para la tarjeta del dashboard
+DPI = {'thumb': 40, 'full': 100}
+
+def configurar_timeline(fig):
+    # Parte fija del gráfico: ejes de fechas por mes y líneas de referencia del año
+    ax = fig.subplots()
+
+    ax.xaxis.set_major_locator(mdates.MonthLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%b'))
+
+    # Ajustar los márgenes para que las etiquetas del eje y sean visibles
+    ax.tick_params(axis='y', labelsize=30)  # Tamaño de la fuente (30)
+    ax.tick_params(axis='x', labelrotation=45, labelsize=24)  # Tamaño de las etiquetas de fecha
+
+    # Ajustar los márgenes para maximizar el espacio del gráfico y dar espacio a todas las leyendas
+    fig.subplots_adjust(left=0.35, right=0.95, top=0.95, bottom=0.40)
+
+    # Mantener las líneas de referencia para los meses
+    for month in range(1, 13):
+        ax.axvline(x=date(datetime.now().year, month, 1), color='grey', linestyle='--', linewidth=0.5)
+    return ax
+
+def generate_graphic(procesos, mercado_seleccionado, max_label_length, formato='png', tamano='full'):
+    # Tamaño del gráfico ajustado para maximizar la altura (32x18)
+    with medir('chart'), figura('timeline', (32, 18), configurar_timeline) as (fig, ax):
+        return _dibujar_timeline(fig, ax, procesos, mercado_seleccionado, max_label_length, formato, tamano)
+
+def _dibujar_timeline(fig, ax, procesos, mercado_seleccionado, max_label_length, formato, tamano):
     today_date = date.today()
 
-    # Obtener los estados (leyendas) de la tabla Formula, ordenados por el campo 'orden'
-    formulas = list(Formula.objects.filter(parametro_id=50).order_by('orden'))
-    
-    # Definir una lista de colores distintivos (asegúrate de que haya al menos 13)
-    colores_distintivos = [
-        '#FF4500', '#FFD700', '#32CD32', '#1E90FF', '#FFD700', 
-        '#9400D3', '#FF8C00', '#FF0000', '#00FF00', '#8B4513', 
-        '#4169E1', '#FF69B4', '#20B2AA'
-    ]
-
-    # Crear el mapa de colores
-    color_map = {formula.cantidad: colores_distintivos[i] for i, formula in enumerate(formulas)}
-
-    # Obtener los acti válidos de la tabla Formula
-    acti_validos = set(formula.cantidad for formula in formulas)
-
-    # Separar procesos por mercado y ordenar por nombre
-    procesos_por_mercado = {"Nacional": [], "Extranjero": []}
-    for proceso in procesos:
-        mercado = "Extranjero" if proceso.nombre.startswith("RE") else "Nacional"
-        procesos_por_mercado[mercado].append(proceso)
-    
-    # Ordenar los procesos del mercado seleccionado por nombre
-    procesos_ordenados = sorted(procesos_por_mercado[mercado_seleccionado], key=lambda p: p.nombre)
+    # Ordenar los procesos del mercado seleccionado por nombre (el mercado viene guardado en cada proceso)
+    procesos_ordenados = sorted(
+        (proceso for proceso in procesos if proceso.mercado == mercado_seleccionado),
+        key=lambda p: p.nombre or '',
+    )
+
+    # Estados (leyendas), colores y segmentos de todos los procesos (tabla IntervaloEstado) en una consulta
+    formulas, color_map, segmentos = construir_linea_tiempo(procesos_ordenados)
+    segmentos_por_proceso = dict(tuple(segmentos.groupby('proceso_id', sort=False)))
 
     # Lista para almacenar las etiquetas de los procesos
     proceso_labels = []
 
     # Procesar solo el mercado seleccionado
     for proceso in procesos_ordenados:
-        # Filtrar eventos válidos para este proceso específico
-        evento_proceso = eventos.filter(proceso=proceso, acti__in=acti_validos).order_by('fecha')
-        if evento_proceso.exists():
-            # Crear una paleta de colores específica para este proceso
-            acti_proceso = evento_proceso.values_list('acti', flat=True).distinct()
-            color_map_proceso = {acti: color_map.get(acti, 'grey') for acti in acti_proceso}
-
-            estado_dates = []
-            estado_durations = []
-            estado_colors = []
-            current_estado = None
-            current_color = 'grey'  # Color inicial
-
-            for i, evento in enumerate(evento_proceso):
-                formula = Formula.objects.filter(parametro_id=50, cantidad=evento.acti).first()
-                if formula:
-                    estado = formula.nombre
-                    if estado != current_estado:
-                        if current_estado is not None:
-                            estado_durations.append((evento.fecha - estado_dates[-1]).days)
-                            estado_colors.append(current_color)
-                        estado_dates.append(evento.fecha)
-                        current_estado = estado
-                    
-                    # Actualizar el color con el del próximo evento (si existe)
-                    if i + 1 < len(evento_proceso):
-                        next_evento = evento_proceso[i + 1]
-                        current_color = color_map_proceso.get(next_evento.acti, 'grey')
-                    else:
-                        # Para el último evento, usar su propio color
-                        current_color = color_map_proceso.get(evento.acti, 'grey')
-
-            # Añadir la duración y color del último estado hasta el último evento
-            if estado_dates:
-                ultimo_evento = evento_proceso.last()
-                estado_durations.append((ultimo_evento.fecha - estado_dates[-1]).days)
-                estado_colors.append(current_color)
-
-            proceso_label = f"{proceso.nombre} - {proceso.descripcion[:max_label_length]}{'...' if len(proceso.descripcion) > max_label_length else ''}"
+        segmentos_proceso = segmentos_por_proceso.get(proceso.pk)
+        if segmentos_proceso is not None:
+            proceso_label = etiqueta_proceso(proceso, max_label_length)
             proceso_labels.append(proceso_label)
 
             ax.barh(
                 proceso_label, 
-                estado_durations, 
-                left=mdates.date2num(estado_dates),
-                color=estado_colors
+                segmentos_proceso['duracion'].tolist(), 
+                left=mdates.date2num(segmentos_proceso['inicio'].dt.date.tolist()),
+                color=segmentos_proceso['color'].tolist()
             )
 
     # Configurar el eje y con las etiquetas ordenadas
@@ -95,19 +70,6 @@ def generate_graphic(procesos, eventos, mercado_seleccionado, activities, max_la
     ax.set_yticklabels(proceso_labels)
     ax.invert_yaxis()  # Para que el orden sea de arriba a abajo
 
-    ax.xaxis.set_major_locator(mdates.MonthLocator())
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%b'))
-
-    # Ajustar los márgenes para que las etiquetas del eje y sean visibles
-    ax.tick_params(axis='y', labelsize=30)  # Tamaño de la fuente (30)
-
-    # Ajustar el espaciado de los márgenes
-    plt.subplots_adjust(left=0.35, right=0.95, top=0.95, bottom=0.25)
-
-    # Mantener las líneas de referencia para los meses
-    for month in range(1, 13):
-        ax.axvline(x=date(datetime.now().year, month, 1), color='grey', linestyle='--', linewidth=0.5)
-
     # Asegurar que la línea vertical roja de "Hoy" sea visible
     linea_hoy = ax.axvline(x=today_date, color='red', linestyle='-', linewidth=2, label='Fecha Actual')
 
@@ -121,7 +83,7 @@ def generate_graphic(procesos, eventos, mercado_seleccionado, activities, max_la
               handleheight=1.5)
 
     # Crear la leyenda con todos los estados de Formula, ordenados por el campo 'orden', excluyendo el primero
-    handles = [plt.Rectangle((0,0),1,1, color=color_map[formula.cantidad]) for formula in formulas[1:]]
+    handles = [Rectangle((0,0),1,1, color=color_map[formula.cantidad]) for formula in formulas[1:]]
     etiquetas_leyenda = [formula.nombre for formula in formulas[1:]]
     
     # Dividir los handles y etiquetas en dos filas
@@ -152,45 +114,24 @@ def generate_graphic(procesos, eventos, mercado_seleccionado, activities, max_la
               handlelength=1.5, 
               handleheight=1.5)
 
-    # Ajustar los márgenes para maximizar el espacio del gráfico y dar espacio a todas las leyendas
-    plt.subplots_adjust(left=0.35, right=0.95, top=0.95, bottom=0.40)  # Ajustamos el margen inferior
-
     # Asegurarse de que la etiqueta del eje x esté visible
     #  ax.set_xlabel('Fecha', fontsize=32, labelpad=90)  # Ajustamos el labelpad para subir la etiqueta del eje x
 
-    plt.xticks(rotation=45, fontsize=24)  # Tamaño de las etiquetas de fecha
     ax.set_xlabel('Fecha', fontsize=32)  # Tamaño del texto del eje x (32)
 
     # Guardar el gráfico en un buffer
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
+    image_png = exportar(fig, formato, dpi=DPI[tamano])
 
     # Añadir una comprobación de colores utilizados
-    colores_utilizados = set()
-    for proceso in procesos_ordenados:
-        evento_proceso = eventos.filter(proceso=proceso, acti__in=acti_validos)
-        for evento in evento_proceso:
-            color = color_map.get(evento.acti)
-            if color:
-                colores_utilizados.add(color)
-    
-    print("Colores utilizados en el gráfico:")
-    for color in colores_utilizados:
-        print(color)
+    colores_utilizados = set(segmentos['color'])
+    logger.debug("Colores utilizados en el gráfico: %s", sorted(colores_utilizados))
 
     # Identificar colores que no deberían estar
     colores_no_esperados = colores_utilizados - set(color_map.values())
     if colores_no_esperados:
-        print("Colores no esperados encontrados:")
-        for color in colores_no_esperados:
-            print(color)
-    else:
-        print("No se encontraron colores inesperados.")
+        logger.warning("Colores no esperados encontrados: %s", sorted(colores_no_esperados))
 
-    return base64.b64encode(image_png).decode('utf-8')
+    return image_png
 
 # Función para obtener los botones de mercado
 def get_market_buttons():
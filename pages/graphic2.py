@@ -1,30 +1,26 @@
-import matplotlib.pyplot as plt
-import io
-import base64
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
+from .renderer import figura, exportar
+from .instrumentation import medir
+
+# La versión completa se guarda a 300 dpi (6000x4800 px); la tarjeta del dashboard solo necesita ~800 px
+DPI = {'thumb': 40, 'full': 300}
 
 def format_currency(value):
     return f"{value:,.2f} PEN"
 
-def generate_pie_chart(procesos):
-    fig2, ax2 = plt.subplots(figsize=(20, 16))
+def generate_pie_chart(mercados_rows, formato='png', tamano='full'):
+    with medir('chart'), figura('mercados', (20, 16)) as (fig2, ax2):
+        return _dibujar_pie_chart(fig2, ax2, mercados_rows, formato, tamano)
+
+def _dibujar_pie_chart(fig2, ax2, mercados_rows, formato, tamano):
 
     mercados = {"Extranjero": 0, "Nacional": 0}
     montos = {"Extranjero": Decimal('0'), "Nacional": Decimal('0')}
 
-    for proceso in procesos:
-        nombre = proceso.get('nombre', '')
-        estimado = proceso.get('total_estimado')
-        
-        if nombre:
-            mercado = "Extranjero" if nombre.startswith("RE") else "Nacional"
-            mercados[mercado] += proceso.get('total_procesos', 1)
-            if estimado is not None:
-                try:
-                    monto_decimal = Decimal(str(estimado))
-                    montos[mercado] += monto_decimal
-                except (InvalidOperation, ValueError, TypeError) as e:
-                    print(f"Error al convertir estimado: {e}")
+    # Una fila por mercado (ver ProcesoQuerySet.por_mercado)
+    for fila in mercados_rows:
+        mercados[fila['mercado']] = fila['total_procesos']
+        montos[fila['mercado']] = fila['total_estimado'] or Decimal('0')
 
     etiquetas = []
     for mercado, cantidad in mercados.items():
@@ -35,12 +31,8 @@ def generate_pie_chart(procesos):
     ax2.pie(list(mercados.values()), labels=etiquetas, autopct='%1.1f%%', startangle=140, textprops={'fontsize': 45})
     ax2.axis('equal')
 
-    plt.tight_layout()  # Ajusta automáticamente el diseño
+    fig2.tight_layout()  # Ajusta automáticamente el diseño
 
-    buffer2 = io.BytesIO()
-    plt.savefig(buffer2, format='png', dpi=300, bbox_inches='tight')
-    buffer2.seek(0)
-    image_png2 = buffer2.getvalue()
-    buffer2.close()
+    image_png2 = exportar(fig2, formato, dpi=DPI[tamano], bbox_inches='tight')
 
-    return base64.b64encode(image_png2).decode('utf-8')
+    return image_png2
@@ -0,0 +1,330 @@
+import csv
+import io
+import os
+import time
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from .cache import bump_data_version
+from .catalog import catalogo, PERIODOS, ACTIVIDADES
+from .models import Proceso, Evento
+
+# Filas que se validan e insertan juntas: una consulta de duplicados y un bulk_create por lote
+TAMANO_LOTE = 2000
+
+EXTENSIONES = ('.csv', '.xlsx')
+
+# Columnas de cada archivo; las que no vienen toman el valor por defecto del modelo
+COLUMNAS_PROCESOS = [
+    'id', 'nomenclatura', 'nombre', 'descripcion', 'moneda', 'cambio', 'estimado', 'expediente',
+    'periodo', 'convocatoria', 'convocado', 'derivado',
+]
+# El proceso del evento se indica con 'proceso' (id) o con 'nomenclatura'
+COLUMNAS_EVENTOS = ['proceso', 'nomenclatura', 'actividad', 'documento', 'fecha', 'situacion', 'importe', 'acti']
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede leer (formato, cabecera); las filas inválidas no levantan esto."""
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.leidas = 0
+        self.insertadas = 0
+        self.rechazadas = []  # (línea, {columna: [errores]}, fila original)
+        self.segundos = 0.0
+
+    def rechazar(self, linea, errores, fila):
+        self.rechazadas.append((linea, errores, fila))
+
+
+# Lectura en streaming --------------------------------------------------------
+
+def _normalizar(cabecera):
+    return [str(columna or '').strip().lower() for columna in cabecera]
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.reader(texto, dialecto)
+    cabecera = _normalizar(next(lector, []))
+    for linea, valores in enumerate(lector, start=2):
+        if any(valores):
+            yield linea, dict(zip(cabecera, valores))
+    texto.detach()
+
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorImportacion("Para importar archivos .xlsx se necesita openpyxl.")
+    # read_only recorre la hoja sin cargarla entera en memoria
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        cabecera = _normalizar(next(filas, []))
+        for linea, valores in enumerate(filas, start=2):
+            if any(valor not in (None, '') for valor in valores):
+                yield linea, dict(zip(cabecera, valores))
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    """Genera (número de línea, {columna: valor}) de un archivo CSV o XLSX abierto en modo binario."""
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == '.csv':
+        return _filas_csv(archivo)
+    if extension == '.xlsx':
+        return _filas_xlsx(archivo)
+    raise ErrorImportacion(f"Formato no soportado: {extension or nombre}; use {' o '.join(EXTENSIONES)}.")
+
+
+def lotes(filas, tamano):
+    while True:
+        lote = list(islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+# Validación ------------------------------------------------------------------
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _limpiar(model, campo, valor, errores):
+    # Conversión y validadores del campo del modelo (max_length, decimales, fechas...)
+    field = model._meta.get_field(campo)
+    if _vacio(valor):
+        if field.has_default():
+            return field.get_default()
+        if not field.null:
+            errores.setdefault(campo, []).append('Este campo es obligatorio.')
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip()
+    try:
+        return field.clean(valor, None)
+    except ValidationError as e:
+        errores.setdefault(campo, []).extend(e.messages)
+        return None
+
+
+def _periodo(valor, errores, campo):
+    # Se acepta el orden (p. ej. 2024) o el nombre del periodo; vacío = año en curso (como Proceso.save)
+    periodos = catalogo(PERIODOS)
+    if _vacio(valor):
+        return periodos.por_nombre.get(str(timezone.now().year))
+    texto = str(valor).strip()
+    formula = periodos.buscar('orden', texto) or periodos.por_nombre.get(texto)
+    if formula is None:
+        errores.setdefault(campo, []).append(f'Periodo desconocido: {texto}.')
+    return formula
+
+
+class ImportadorProcesos:
+    """Inserta procesos nuevos; los que ya existen (id, nomenclatura o nombre) se rechazan."""
+
+    columnas = COLUMNAS_PROCESOS
+
+    def __init__(self):
+        # Ids asignados a las filas sin id: a continuación del mayor id existente
+        self.siguiente_id = (Proceso.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+        self.vistos = {'id': set(), 'nomenclatura': set(), 'nombre': set()}
+
+    def validar(self, linea, fila):
+        errores = {}
+        datos = {
+            campo: _limpiar(Proceso, campo, fila.get(campo), errores)
+            for campo in self.columnas if campo not in ('id', 'periodo', 'convocado')
+        }
+        # Sin id, se asigna uno nuevo al insertar
+        datos['id'] = None if _vacio(fila.get('id')) else _limpiar(Proceso, 'id', fila['id'], errores)
+        # periodo_id y convocado_id guardan el orden de la fórmula, como ProcesoForm
+        for campo in ('periodo', 'convocado'):
+            formula = _periodo(fila.get(campo), errores, campo)
+            datos[f'{campo}_id'] = formula.orden if formula else None
+        return datos, errores
+
+    def existentes(self, validas):
+        """Valores de id, nomenclatura y nombre del lote que ya están en la base (una consulta)."""
+        valores = {campo: {datos[campo] for datos in validas if datos[campo] is not None} for campo in self.vistos}
+        filtro = Q()
+        for campo, conjunto in valores.items():
+            if conjunto:
+                filtro |= Q(**{f'{campo}__in': conjunto})
+        existentes = {campo: set() for campo in self.vistos}
+        if filtro:
+            for fila in Proceso.objects.filter(filtro).values_list(*self.vistos):
+                for campo, valor in zip(self.vistos, fila):
+                    existentes[campo].add(valor)
+        return existentes
+
+    def construir(self, lote, resultado):
+        objetos = []
+        existentes = self.existentes([datos for _, datos, _ in lote])
+        for linea, datos, fila in lote:
+            errores = {}
+            for campo, vistos in self.vistos.items():
+                valor = datos[campo]
+                if valor is None:
+                    continue
+                if valor in existentes[campo]:
+                    errores[campo] = [f'Ya existe un proceso con {campo} {valor}.']
+                elif valor in vistos:
+                    errores[campo] = [f'{campo} {valor} repetido en el archivo.']
+            if errores:
+                resultado.rechazar(linea, errores, fila)
+                continue
+            if datos['id'] is None:
+                while self.siguiente_id in self.vistos['id'] or self.siguiente_id in existentes['id']:
+                    self.siguiente_id += 1
+                datos['id'] = self.siguiente_id
+            for campo, vistos in self.vistos.items():
+                if datos[campo] is not None:
+                    vistos.add(datos[campo])
+            objetos.append(Proceso(**datos))
+        return objetos
+
+    def insertar(self, objetos):
+        # bulk_create no llama a Proceso.save: periodo y convocado ya vienen resueltos
+        Proceso.objects.bulk_create(objetos)
+
+
+# Columnas que se cargan con COPY (el id y el vector de búsqueda los pone PostgreSQL)
+CAMPOS_COPY_EVENTOS = ['proceso_id', 'actividad', 'documento', 'fecha', 'situacion', 'importe', 'acti']
+
+
+def copiar(model, campos, objetos):
+    """Inserta los objetos con COPY ... FROM STDIN de PostgreSQL.
+
+    Evita el armado del INSERT que hace bulk_create fila por fila y carga
+    varias veces más rápido; los valores deben estar ya validados.
+    """
+    quote = connection.ops.quote_name
+    columnas = ', '.join(quote(model._meta.get_field(campo).column) for campo in campos)
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(f'COPY {quote(model._meta.db_table)} ({columnas}) FROM STDIN') as copia:
+            for objeto in objetos:
+                copia.write_row([getattr(objeto, campo) for campo in campos])
+
+
+class ImportadorEventos:
+    """Inserta eventos de procesos existentes y recalcula el estado de esos procesos."""
+
+    columnas = COLUMNAS_EVENTOS
+
+    def validar(self, linea, fila):
+        errores = {}
+        datos = {
+            campo: _limpiar(Evento, campo, fila.get(campo), errores)
+            for campo in ('actividad', 'documento', 'fecha', 'situacion', 'importe', 'acti')
+        }
+        # Evento.fecha tiene la fecha actual por defecto; en una importación debe venir en el archivo
+        if _vacio(fila.get('fecha')):
+            errores['fecha'] = ['Este campo es obligatorio.']
+        if datos['acti'] is None and 'acti' not in errores:
+            errores['acti'] = ['Este campo es obligatorio.']
+        elif datos['acti'] is not None and catalogo(ACTIVIDADES).por_orden.get(datos['acti']) is None:
+            errores['acti'] = [f"Actividad desconocida: {datos['acti']}."]
+
+        datos['proceso_id'] = None if _vacio(fila.get('proceso')) else _limpiar(Proceso, 'id', fila['proceso'], errores)
+        datos['nomenclatura'] = None if _vacio(fila.get('nomenclatura')) else str(fila['nomenclatura']).strip()
+        if datos['proceso_id'] is None and datos['nomenclatura'] is None:
+            errores['proceso'] = ['Indique el id del proceso o su nomenclatura.']
+        return datos, errores
+
+    def construir(self, lote, resultado):
+        # Los procesos del lote se resuelven con una sola consulta
+        ids = {datos['proceso_id'] for _, datos, _ in lote if datos['proceso_id'] is not None}
+        nomenclaturas = {datos['nomenclatura'] for _, datos, _ in lote if datos['proceso_id'] is None}
+        por_id, por_nomenclatura = set(), {}
+        for pk, nomenclatura in Proceso.objects.filter(
+            Q(id__in=ids) | Q(nomenclatura__in=nomenclaturas)
+        ).values_list('id', 'nomenclatura'):
+            por_id.add(pk)
+            por_nomenclatura[nomenclatura] = pk
+
+        objetos = []
+        for linea, datos, fila in lote:
+            proceso_id = datos.pop('proceso_id')
+            nomenclatura = datos.pop('nomenclatura')
+            if proceso_id is None:
+                proceso_id = por_nomenclatura.get(nomenclatura)
+            if proceso_id is None or proceso_id not in por_id:
+                resultado.rechazar(linea, {'proceso': [f'No existe el proceso {proceso_id or nomenclatura}.']}, fila)
+                continue
+            objetos.append(Evento(proceso_id=proceso_id, **datos))
+        return objetos
+
+    def insertar(self, objetos):
+        if connection.vendor == 'postgresql':
+            copiar(Evento, CAMPOS_COPY_EVENTOS, objetos)
+        else:
+            Evento.objects.bulk_create(objetos)
+        # bulk_create no envía las señales que mantienen el estado: un UPDATE por lote
+        Proceso.objects.filter(id__in={evento.proceso_id for evento in objetos}).actualizar_estados()
+
+
+IMPORTADORES = {
+    'procesos': ImportadorProcesos,
+    'eventos': ImportadorEventos,
+}
+
+
+def importar(tipo, archivo, nombre, tamano_lote=TAMANO_LOTE, simular=False):
+    """Importa procesos o eventos de un archivo CSV/XLSX abierto en modo binario.
+
+    El archivo se recorre por lotes: cada lote se valida con el catálogo en
+    memoria y una consulta de duplicados, y las filas válidas se insertan con
+    bulk_create. Todo ocurre en una transacción; las filas inválidas no la
+    detienen y quedan en ``resultado.rechazadas``. Con ``simular`` se valida
+    e inserta, pero se deshace al final.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoImportacion()
+    filas = leer_filas(archivo, nombre)
+
+    with transaction.atomic():
+        importador = IMPORTADORES[tipo]()
+        for lote in lotes(filas, tamano_lote):
+            validas = []
+            for linea, fila in lote:
+                resultado.leidas += 1
+                datos, errores = importador.validar(linea, fila)
+                if errores:
+                    resultado.rechazar(linea, errores, fila)
+                else:
+                    validas.append((linea, datos, fila))
+            objetos = importador.construir(validas, resultado)
+            if objetos:
+                importador.insertar(objetos)
+                resultado.insertadas += len(objetos)
+        if simular:
+            transaction.set_rollback(True)
+        elif resultado.insertadas:
+            transaction.on_commit(bump_data_version)
+
+    resultado.rechazadas.sort(key=lambda rechazo: rechazo[0])
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def escribir_rechazos(resultado, salida, columnas):
+    """Escribe las filas rechazadas como CSV: línea, errores y las columnas originales."""
+    escritor = csv.writer(salida)
+    escritor.writerow(['linea', 'errores'] + columnas)
+    for linea, errores, fila in resultado.rechazadas:
+        mensaje = '; '.join(f"{campo}: {' '.join(mensajes)}" for campo, mensajes in errores.items())
+        escritor.writerow([linea, mensaje] + [fila.get(columna, '') for columna in columnas])
@@ -0,0 +1,195 @@
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from django.utils import timezone
+
+logger = logging.getLogger('pages.slow_requests')
+
+# Umbral (ms) a partir del cual una petición se registra como lenta; None para no registrar ninguna
+SLOW_REQUEST_MS = getattr(settings, 'SLOW_REQUEST_MS', 500)
+SERVER_TIMING = getattr(settings, 'SERVER_TIMING', True)
+
+# Métricas de la petición en curso (una por hilo / tarea asíncrona)
+_metricas = ContextVar('pages_metricas', default=None)
+
+
+class Metricas:
+    """Tiempos acumulados (en ms) y cantidad de consultas de una petición."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tiempos = {'db': 0.0, 'tpl': 0.0, 'chart': 0.0}
+        self.consultas = 0
+
+    def sumar(self, nombre, ms):
+        self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + ms
+
+    def agregar(self, otras):
+        # Las métricas de un trabajo que corrió fuera de la petición (ver medido)
+        for nombre, ms in otras.tiempos.items():
+            self.sumar(nombre, ms)
+        self.consultas += otras.consultas
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def server_timing(self, total_ms):
+        descripciones = {'db': f'{self.consultas} consultas', 'tpl': 'templates', 'chart': 'graficos'}
+        partes = [
+            f'{nombre};dur={ms:.1f};desc="{descripciones.get(nombre, nombre)}"'
+            for nombre, ms in self.tiempos.items()
+        ]
+        partes.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(partes)
+
+
+def metricas_actuales():
+    return _metricas.get()
+
+
+@contextmanager
+def medir(nombre):
+    """Suma el tiempo del bloque a la métrica ``nombre`` de la petición en curso.
+
+    Fuera de una petición (comandos, prerender) no registra nada.
+    """
+    metricas = _metricas.get()
+    if metricas is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas.sumar(nombre, (time.perf_counter() - inicio) * 1000)
+
+
+@contextmanager
+def registrar_peticion():
+    """Activa las métricas para el bloque (una petición) y las entrega al terminar."""
+    metricas = Metricas()
+    token = _metricas.set(metricas)
+
+    def medir_consulta(execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metricas.consultas += 1
+            metricas.sumar('db', (time.perf_counter() - inicio) * 1000)
+
+    try:
+        with ExitStack() as stack:
+            # execute_wrapper funciona con DEBUG=False, a diferencia de connection.queries
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(medir_consulta))
+            yield metricas
+    finally:
+        _metricas.reset(token)
+
+
+def medido(funcion, *args):
+    """Ejecuta ``funcion(*args)`` con sus propias métricas y devuelve ``(resultado, metricas)``.
+
+    Para los trabajos que la petición manda a un executor: un hilo del pool no
+    hereda el contexto de la petición (ni sus conexiones medidas) y un proceso
+    tampoco. La petición las suma a las suyas con ``Metricas.agregar``.
+    """
+    with registrar_peticion() as metricas:
+        resultado = funcion(*args)
+    return resultado, metricas
+
+
+class InstrumentacionMiddleware:
+    """Mide cada petición: consultas SQL y su tiempo, templates y gráficos.
+
+    Agrega la cabecera ``Server-Timing`` (visible en las herramientas de
+    desarrollo del navegador) y registra en JSON las peticiones que superan
+    ``SLOW_REQUEST_MS``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Con ASGI y el resto de la cadena asíncrona, la petición no pasa por un hilo
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with registrar_peticion() as metricas:
+            response = self.get_response(request)
+        return self.completar(request, response, metricas)
+
+    async def __acall__(self, request):
+        with registrar_peticion() as metricas:
+            response = await self.get_response(request)
+        return self.completar(request, response, metricas)
+
+    def completar(self, request, response, metricas):
+        total_ms = metricas.total_ms
+
+        if SERVER_TIMING:
+            response['Server-Timing'] = metricas.server_timing(total_ms)
+        if SLOW_REQUEST_MS is not None and total_ms >= SLOW_REQUEST_MS:
+            registro = {
+                'ts': timezone.now().isoformat(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user': getattr(getattr(request, 'user', None), 'pk', None),
+                'total_ms': round(total_ms, 1),
+                'db_queries': metricas.consultas,
+                **{f'{nombre}_ms': round(ms, 1) for nombre, ms in metricas.tiempos.items()},
+            }
+            logger.warning(json.dumps(registro))
+        return response
+
+
+class TemplateMedido(django_backend.Template):
+    def render(self, context=None, request=None):
+        with medir('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Backend de templates de Django que suma el tiempo de render a la métrica 'tpl'."""
+
+    def from_string(self, template_code):
+        return TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateMedido(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def estadisticas_pool():
+    """Estadísticas del pool de conexiones de cada base de datos, en este proceso.
+
+    Cada worker tiene su propio pool, así que los números son del worker que
+    responde. Los contadores de psycopg_pool son acumulados desde que se abrió:
+    ``requests_num`` (entregas), ``requests_queued`` y ``requests_wait_ms``
+    (esperas por una conexión libre), ``requests_errors`` (esperas que
+    vencieron por ``timeout``), ``connections_num`` y ``connections_ms``
+    (conexiones físicas abiertas y su costo). Sin pool, la base no aparece.
+    """
+    resultado = {}
+    for connection in connections.all():
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            resultado[connection.alias] = {'nombre': pool.name, **pool.get_stats()}
+    return resultado
@@ -0,0 +1,109 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from pages import benchmark, synthetic
+from pages.catalog import registry
+from pages.models import Proceso, Evento
+
+
+def escala(texto):
+    # "1000x10" -> (1000 procesos, 10 eventos por proceso)
+    try:
+        procesos, eventos = (int(parte) for parte in texto.lower().split('x'))
+    except ValueError:
+        raise CommandError(f"Escala no válida: {texto!r}; se espera PROCESOSxEVENTOS, p. ej. 1000x10.")
+    return procesos, eventos
+
+
+class Command(BaseCommand):
+    help = ("Mide tiempo, consultas SQL y pico de memoria de home_view, proceso_list, evento_list, "
+            "generate_graphic y generate_pie_chart, y escribe el resultado en JSON. Con --escalas "
+            "genera datos sintéticos de cada tamaño en la base de datos de pruebas; con --concurrencia "
+            "compara peticiones simultáneas con y sin pool de conexiones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas', nargs='+', type=escala, metavar='PROCESOSxEVENTOS',
+            help=('Tamaños a medir, p. ej. 100x10 1000x10 10000x10. Se usa la base de datos de pruebas '
+                  '(test_...), nunca la real. Sin esta opción se miden los datos actuales.'),
+        )
+        parser.add_argument('--escenarios', nargs='+', choices=list(benchmark.ESCENARIOS), help='Escenarios a medir.')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Mediciones por escenario.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sintéticos.')
+        parser.add_argument('--keepdb', action='store_true', help='Conserva la base de datos de pruebas.')
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, la salida estándar).')
+        parser.add_argument(
+            '--concurrencia', type=escala, metavar='HILOSxPETICIONES',
+            help=('Además, peticiones simultáneas por el handler WSGI completo, sin pool y con pool de '
+                  'conexiones, p. ej. 8x50 (8 hilos de 50 peticiones).'),
+        )
+        parser.add_argument('--ruta', help='Ruta de las peticiones de --concurrencia (por defecto, proceso_list).')
+        parser.add_argument('--comparar', help='JSON de una ejecución anterior para mostrar las diferencias.')
+
+    def handle(self, *args, **options):
+        if options['escalas']:
+            escalas = self.medir_escalas(options)
+        else:
+            escalas = [self.medir_actual(options)]
+
+        resultado = {'entorno': benchmark.entorno(), 'escalas': escalas}
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                archivo.write(texto + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+        else:
+            self.stdout.write(texto)
+
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                self.mostrar_diferencias(json.load(archivo), resultado)
+
+    def medir_actual(self, options):
+        procesos = Proceso.objects.count()
+        return {
+            'procesos': procesos,
+            'eventos_por_proceso': round(Evento.objects.count() / procesos) if procesos else 0,
+            'resultados': benchmark.ejecutar(options['escenarios'], options['repeticiones']),
+            **self.medir_concurrencia(options),
+        }
+
+    def medir_concurrencia(self, options):
+        if not options['concurrencia']:
+            return {}
+        hilos, peticiones = options['concurrencia']
+        return {'concurrencia': benchmark.concurrencia(hilos, peticiones, options['ruta'])}
+
+    def medir_escalas(self, options):
+        verbosity = options['verbosity']
+        config = setup_databases(verbosity, interactive=False, keepdb=options['keepdb'])
+        try:
+            escalas = []
+            for procesos, eventos in options['escalas']:
+                # El catálogo en memoria puede venir de la base real o de la escala anterior
+                registry.invalidar(compartir=False)
+                synthetic.borrar()
+                synthetic.generar(procesos, eventos, seed=options['seed'])
+                if verbosity > 1:
+                    self.stderr.write(f"Midiendo {procesos}x{eventos}...")
+                escalas.append({
+                    'procesos': procesos,
+                    'eventos_por_proceso': eventos,
+                    'resultados': benchmark.ejecutar(options['escenarios'], options['repeticiones']),
+                    **self.medir_concurrencia(options),
+                })
+            if options['keepdb']:
+                synthetic.borrar()
+            return escalas
+        finally:
+            teardown_databases(config, verbosity, keepdb=options['keepdb'])
+            registry.invalidar(compartir=False)
+
+    def mostrar_diferencias(self, anterior, actual):
+        for clave, escenario, metrica, antes, ahora, cambio in benchmark.comparar(anterior, actual):
+            linea = f"{clave[0]}x{clave[1]} {escenario:<20} {metrica:<8} {antes:>12} -> {ahora:>12} ({cambio:+.0%})"
+            # Más de un 20% peor se marca como regresión
+            if cambio > 0.2:
+                self.stderr.write(self.style.ERROR(linea))
+            else:
+                self.stderr.write(linea)
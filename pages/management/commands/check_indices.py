@@ -0,0 +1,151 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import setup_databases, teardown_databases
+from pages import synthetic
+from pages.catalog import registry, PERIODOS, ACTIVIDADES, ESTADOS
+from pages.charts import procesos_por_mercado, PROCESOS_POR_PAGINA
+from pages.models import Proceso, Evento, Formula
+from pages.pagination import KeysetPaginator
+from pages.views import ORDENES_EVENTOS, ORDENES_PROCESOS, EVENTOS_POR_PAGINA
+
+
+def _pagina(queryset, ordering, por_pagina):
+    # La consulta de una página de KeysetPaginator: orden de la paginación + LIMIT
+    return KeysetPaginator(queryset, ordering, por_pagina).ordenado()[:por_pagina + 1]
+
+
+def consultas():
+    """(descripción, tabla, prefijos de índice aceptados, selectiva, queryset) de las consultas principales.
+
+    Las consultas no selectivas (una tabla chica o un agregado de toda la
+    tabla) se resuelven bien con un Seq Scan: solo se verifican forzando el
+    uso de índices, no con --natural.
+    """
+    proceso = Proceso.objects.order_by('id').first()
+    proceso_id = proceso.pk if proceso else 0
+    # El estado menos frecuente: con uno común el planificador recorre la clave primaria y filtra
+    estado = (Proceso.objects.values('estado').annotate(total=Count('id')).order_by('total', 'estado')
+              .values_list('estado', flat=True).first() or '')
+    return [
+        ('Último evento de un proceso', 'pages_evento', ['evento_proceso_fecha_id_idx'], True,
+         Evento.objects.filter(proceso_id=proceso_id).order_by('-fecha', '-id')[:1]),
+        ('Página de evento_list (fecha)', 'pages_evento', ['evento_proceso_fecha_id_idx'], True,
+         _pagina(Evento.objects.filter(proceso_id=proceso_id), ORDENES_EVENTOS['fecha'], EVENTOS_POR_PAGINA)),
+        ('Página de evento_list (-fecha)', 'pages_evento', ['evento_proceso_fecha_id_idx'], True,
+         _pagina(Evento.objects.filter(proceso_id=proceso_id), ORDENES_EVENTOS['-fecha'], EVENTOS_POR_PAGINA)),
+        ('Eventos de la línea de tiempo', 'pages_evento', ['evento_proceso_fecha_id_idx'], True,
+         Evento.objects.filter(proceso_id__in=[proceso_id], acti__in=[1, 2]).order_by('proceso_id', 'fecha', 'id')),
+        # Formula es chica: basta un índice que empiece por parametro, el planificador elige cuál
+        ('Fórmula por (parametro, cantidad)', 'pages_formula', ['formula_param_'], False,
+         Formula.objects.filter(parametro_id=ESTADOS, cantidad=1)),
+        ('Fórmula por (parametro, orden)', 'pages_formula', ['formula_param_'], False,
+         Formula.objects.filter(parametro_id=ACTIVIDADES, orden=1)),
+        ('Fórmula por (parametro, nombre)', 'pages_formula', ['formula_param_'], False,
+         Formula.objects.filter(parametro_id=PERIODOS, nombre='2024')),
+        ('Dashboard, mercado Extranjero', 'pages_proceso', ['proceso_mercado_nombre_idx'], True,
+         _pagina(procesos_por_mercado('Extranjero'), ('nombre', 'id'), PROCESOS_POR_PAGINA)),
+        ('Dashboard, mercado Nacional', 'pages_proceso', ['proceso_mercado_nombre_idx'], True,
+         _pagina(procesos_por_mercado('Nacional'), ('nombre', 'id'), PROCESOS_POR_PAGINA)),
+        ('Procesos por mercado (gráfico de pastel)', 'pages_proceso', ['proceso_mercado_nombre_idx'], False,
+         Proceso.objects.exclude(nombre__isnull=True).exclude(nombre='').por_mercado()),
+        ('proceso_list filtrado por estado', 'pages_proceso', ['proceso_estado_id_idx'], True,
+         _pagina(Proceso.objects.filter(estado=estado), ORDENES_PROCESOS['estado'], 10)),
+        ('proceso_list por estimado', 'pages_proceso', ['proceso_estimado_id_idx'], True,
+         _pagina(Proceso.objects.all(), ORDENES_PROCESOS['-estimado'], 10)),
+    ]
+
+
+def nodos(plan):
+    yield plan
+    for hijo in plan.get('Plans', []):
+        yield from nodos(hijo)
+
+
+class Command(BaseCommand):
+    help = ("Ejecuta EXPLAIN sobre las consultas principales de las vistas y verifica que "
+            "usen los índices esperados (sin recorrido secuencial de la tabla). Por defecto genera "
+            "datos sintéticos en la base de datos de pruebas y los analiza antes de verificar.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--natural', action='store_true',
+            help=('No desactiva enable_seqscan ni enable_sort/enable_incremental_sort y verifica solo las '
+                  'consultas selectivas; con pocos datos el planificador puede preferir un Seq Scan o un Sort.'),
+        )
+        parser.add_argument('--procesos', type=int, default=3000, help='Procesos sintéticos a generar.')
+        parser.add_argument('--eventos', type=int, default=10, help='Eventos por proceso sintético.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sintéticos.')
+        parser.add_argument('--keepdb', action='store_true', help='Conserva la base de datos de pruebas.')
+        parser.add_argument(
+            '--datos-actuales', action='store_true',
+            help='Verifica sobre la base de datos configurada, sin crear la de pruebas ni generar datos.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("check_indices requiere PostgreSQL.")
+        if options['procesos'] < 1 or options['eventos'] < 1:
+            raise CommandError("--procesos y --eventos deben ser mayores que cero.")
+
+        if options['datos_actuales']:
+            fallas = self.verificar(options)
+        else:
+            fallas = self.verificar_datos_sinteticos(options)
+        if fallas:
+            raise CommandError(f"{fallas} consultas no usan el índice esperado.")
+
+    def verificar_datos_sinteticos(self, options):
+        verbosity = options['verbosity']
+        config = setup_databases(verbosity, interactive=False, keepdb=options['keepdb'])
+        try:
+            # El catálogo en memoria puede venir de la base real
+            registry.invalidar(compartir=False)
+            synthetic.borrar()
+            synthetic.generar(options['procesos'], options['eventos'], seed=options['seed'])
+            # Estadísticas al día, como las tendría la base real tras el autovacuum
+            tablas = ', '.join(model._meta.db_table for model in (Proceso, Evento, Formula))
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {tablas}')
+            fallas = self.verificar(options)
+            if options['keepdb']:
+                synthetic.borrar()
+            return fallas
+        finally:
+            teardown_databases(config, verbosity, keepdb=options['keepdb'])
+            registry.invalidar(compartir=False)
+
+    def verificar(self, options):
+        fallas = 0
+        for descripcion, tabla, esperados, selectiva, queryset in consultas():
+            if options['natural'] and not selectiva:
+                self.stdout.write(f"--     {descripcion}: no selectiva, se omite con --natural")
+                continue
+            with transaction.atomic():
+                if not options['natural']:
+                    # Con pocas filas un Seq Scan o un Sort son más baratos; así se comprueba
+                    # que el índice sirve para filtrar y para entregar el orden pedido
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                        cursor.execute('SET LOCAL enable_sort = off')
+                        cursor.execute('SET LOCAL enable_incremental_sort = off')
+                plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+
+            recorridos = [nodo for nodo in nodos(plan) if nodo.get('Relation Name') == tabla or
+                          nodo.get('Index Name', '').startswith(tuple(esperados))]
+            indices = sorted({nodo['Index Name'] for nodo in recorridos if 'Index Name' in nodo})
+            secuencial = any(nodo['Node Type'] == 'Seq Scan' for nodo in recorridos)
+            ok = not secuencial and any(indice.startswith(tuple(esperados)) for indice in indices)
+
+            if ok:
+                self.stdout.write(self.style.SUCCESS(f"OK     {descripcion}: {', '.join(indices)}"))
+            else:
+                fallas += 1
+                usados = ', '.join(indices) or 'Seq Scan'
+                self.stdout.write(self.style.ERROR(
+                    f"FALLA  {descripcion}: usa {usados}; se esperaba {' o '.join(esperados)}"
+                ))
+            if options['verbosity'] > 1:
+                self.stdout.write(json.dumps(plan, indent=2))
+        return fallas
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from pages import synthetic
+
+
+class Command(BaseCommand):
+    help = ("Genera datos sintéticos para pruebas de rendimiento: los catálogos 11, 12, 29 y 50 "
+            "(si no existen) y N procesos con M eventos cada uno, insertados con bulk_create.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=1000, help='Cantidad de procesos a generar.')
+        parser.add_argument('--eventos', type=int, default=10, help='Eventos por proceso.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla para obtener siempre los mismos datos.')
+        parser.add_argument('--borrar', action='store_true',
+                            help=f'Borra antes los procesos sintéticos (nomenclatura {synthetic.PREFIJO}...).')
+        parser.add_argument('--solo-borrar', action='store_true', help='Solo borra los procesos sintéticos.')
+
+    def handle(self, *args, **options):
+        if options['procesos'] < 0 or options['eventos'] < 0:
+            raise CommandError("--procesos y --eventos no pueden ser negativos.")
+
+        if options['borrar'] or options['solo_borrar']:
+            borrados = synthetic.borrar()
+            self.stdout.write(f"{borrados} procesos sintéticos borrados.")
+            if options['solo_borrar']:
+                return
+
+        inicio = time.perf_counter()
+        creados = synthetic.generar_catalogos()
+        if creados:
+            self.stdout.write(f"Catálogos creados: {', '.join(map(str, creados))}.")
+        procesos, eventos = synthetic.generar(options['procesos'], options['eventos'], seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{procesos} procesos y {eventos} eventos generados en {time.perf_counter() - inicio:.1f}s."
+        ))
@@ -0,0 +1,49 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from pages.importer import (
+    IMPORTADORES, TAMANO_LOTE, ErrorImportacion, importar, escribir_rechazos,
+)
+
+
+class Command(BaseCommand):
+    help = ("Importa procesos o eventos desde un archivo CSV o XLSX por lotes, en una transacción. "
+            "Las filas inválidas no detienen la importación y se informan al final.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=list(IMPORTADORES), help='Qué contiene el archivo.')
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote.')
+        parser.add_argument('--rechazados', help="Archivo CSV para las filas rechazadas ('-' para la salida estándar).")
+        parser.add_argument('--simular', action='store_true', help='Valida e inserta, pero deshace todo al final.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar(
+                    options['tipo'], archivo, options['archivo'],
+                    tamano_lote=options['lote'], simular=options['simular'],
+                )
+        except (OSError, ErrorImportacion) as e:
+            raise CommandError(str(e))
+
+        accion = 'validadas (simulación, sin guardar)' if options['simular'] else 'insertadas'
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.insertadas} de {resultado.leidas} filas {accion} en {resultado.segundos:.1f}s; "
+            f"{len(resultado.rechazadas)} rechazadas."
+        ))
+
+        if resultado.rechazadas:
+            columnas = IMPORTADORES[options['tipo']].columnas
+            destino = options['rechazados']
+            if destino == '-':
+                escribir_rechazos(resultado, sys.stdout, columnas)
+            elif destino:
+                with open(destino, 'w', newline='', encoding='utf-8') as salida:
+                    escribir_rechazos(resultado, salida, columnas)
+                self.stdout.write(f"Filas rechazadas guardadas en {destino}")
+            else:
+                for linea, errores, _ in resultado.rechazadas[:20]:
+                    detalle = '; '.join(f"{campo}: {' '.join(mensajes)}" for campo, mensajes in errores.items())
+                    self.stdout.write(f"Línea {linea}: {detalle}")
+                if len(resultado.rechazadas) > 20:
+                    self.stdout.write("... use --rechazados para obtener la lista completa.")
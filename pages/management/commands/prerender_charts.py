@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from pages import chart_store
+from pages.cache import get_data_version
+from pages.charts import chart_jobs
+from pages.prerender import init_worker, render_job
+
+
+class Command(BaseCommand):
+    help = ("Pre-renderiza en segundo plano los gráficos del dashboard (todas las combinaciones "
+            "de mercado y página) en un pool de procesos cada vez que cambian los datos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Procesos del pool de renderizado.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre cada revisión de la versión de los datos.')
+        parser.add_argument('--once', action='store_true', help='Renderiza una sola vez y termina.')
+
+    def handle(self, *args, **options):
+        # Cerrar las conexiones del proceso principal antes de crear el pool
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context,
+                                 initializer=init_worker, initargs=(settings_module,)) as pool:
+            estado_renderizado = None
+            while True:
+                # Se vuelve a renderizar cuando cambian los datos o cambia el día (línea de "Hoy")
+                estado_actual = (get_data_version(), timezone.localdate())
+                if estado_actual != estado_renderizado:
+                    self.render_all(pool)
+                    estado_renderizado = estado_actual
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+    def render_all(self, pool):
+        inicio = time.perf_counter()
+        jobs = chart_jobs()
+        pendientes = [key for key in jobs if chart_store.read(key) is None]
+        futures = [pool.submit(render_job, key) for key in pendientes]
+        renderizados = 0
+        for future in as_completed(futures):
+            try:
+                future.result()
+                renderizados += 1
+            except Exception as e:
+                self.stderr.write(f"Error al renderizar un gráfico: {e}")
+        # La versión renderizada y la actual, si cambió mientras tanto: los workers ya escriben en esa
+        borradas = chart_store.prune({key[-1] for key in jobs} | {get_data_version()})
+        connections.close_all()
+        self.stdout.write(
+            f"{renderizados} gráficos renderizados ({len(jobs)} vigentes, {borradas} obsoletos borrados) "
+            f"en {time.perf_counter() - inicio:.1f}s"
+        )
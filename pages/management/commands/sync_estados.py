@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from pages.models import Proceso
+
+CAMPOS = ('ultimo_evento', 'ultimo_acti', 'estado', 'fecha_ultimo_evento')
+
+
+class Command(BaseCommand):
+    help = ("Recalcula (backfill) o verifica las columnas de estado desnormalizadas de Proceso "
+            "(ultimo_evento, ultimo_acti, estado, fecha_ultimo_evento).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Solo verifica; falla si hay diferencias.')
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            actualizados = Proceso.objects.actualizar_estados()
+            self.stdout.write(self.style.SUCCESS(f"{actualizados} procesos actualizados."))
+            return
+
+        # Comparar las columnas guardadas con lo calculado desde los eventos
+        columnas = ['id', 'nombre'] + [f'{campo}_id' if campo == 'ultimo_evento' else campo for campo in CAMPOS]
+        filas = Proceso.objects.con_estado_calculado().values(*columnas, *[f'calc_{campo}' for campo in CAMPOS])
+        total = 0
+        for fila in filas.iterator(chunk_size=2000):
+            diferencias = [
+                f"{campo}={fila[columna]!r} (esperado {fila[f'calc_{campo}']!r})"
+                for campo, columna in zip(CAMPOS, columnas[2:])
+                if fila[columna] != fila[f'calc_{campo}']
+            ]
+            if diferencias:
+                total += 1
+                self.stdout.write(f"Proceso {fila['id']} ({fila['nombre']}): " + ', '.join(diferencias))
+        if total:
+            raise CommandError(f"{total} procesos con estado desactualizado; ejecute sync_estados sin --verify.")
+        self.stdout.write(self.style.SUCCESS("Todos los procesos tienen el estado al día."))
@@ -0,0 +1,52 @@
+import time
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from pages.cache import bump_data_version
+from pages.models import Proceso
+from pages.timeline import cargar_estados, cargar_segmentos, segmentos_desde_eventos
+
+COLUMNAS = ['proceso_id', 'inicio', 'fin', 'estado', 'color']
+
+
+class Command(BaseCommand):
+    help = ("Recalcula (refresco completo) o verifica la tabla de intervalos de estado (IntervaloEstado) "
+            "de todos los procesos. Cada lote de procesos va en su propia transacción: las lecturas siguen "
+            "viendo los intervalos anteriores de un lote hasta que se confirma el nuevo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Procesos por transacción.')
+        parser.add_argument('--verify', action='store_true',
+                            help='Solo compara con lo calculado desde los eventos; falla si hay diferencias.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser mayor que cero.")
+        ids = list(Proceso.objects.order_by('id').values_list('id', flat=True))
+        bloques = [ids[desde:desde + options['lote']] for desde in range(0, len(ids), options['lote'])]
+
+        if options['verify']:
+            self.verificar(bloques)
+            return
+
+        inicio = time.perf_counter()
+        tramos = 0
+        for bloque in bloques:
+            tramos += Proceso.objects.filter(pk__in=bloque).actualizar_intervalos()
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"{tramos} intervalos de {len(ids)} procesos recalculados en {time.perf_counter() - inicio:.1f}s."
+        ))
+
+    def verificar(self, bloques):
+        _, color_map, _ = cargar_estados()
+        total = 0
+        for bloque in bloques:
+            guardados = cargar_segmentos(bloque, color_map)[COLUMNAS]
+            esperados = segmentos_desde_eventos(bloque)[COLUMNAS]
+            diferencias = guardados.merge(esperados, how='outer', indicator=True).query("_merge != 'both'")
+            for proceso_id in pd.unique(diferencias['proceso_id']):
+                total += 1
+                self.stdout.write(f"Proceso {proceso_id}: intervalos desactualizados.")
+        if total:
+            raise CommandError(f"{total} procesos con intervalos desactualizados; ejecute sync_intervalos sin --verify.")
+        self.stdout.write(self.style.SUCCESS("Todos los procesos tienen los intervalos al día."))
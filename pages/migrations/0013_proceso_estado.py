@@ -0,0 +1,60 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_estado(apps, schema_editor):
+    Proceso = apps.get_model('pages', 'Proceso')
+    Evento = apps.get_model('pages', 'Evento')
+    Formula = apps.get_model('pages', 'Formula')
+    def eventos_estado(proceso_ref):
+        return Evento.objects.filter(
+            proceso=proceso_ref,
+            acti__in=Formula.objects.filter(parametro_id=29).values('cantidad'),
+        ).order_by('-fecha', '-id')
+
+    ultimo_evento = eventos_estado(OuterRef('pk'))
+    nombre_estado = Formula.objects.filter(
+        parametro_id=29,
+        cantidad=Subquery(eventos_estado(OuterRef(OuterRef('pk'))).values('acti')[:1]),
+    ).order_by('id').values('nombre')[:1]
+    Proceso.objects.update(
+        ultimo_evento=Subquery(ultimo_evento.values('id')[:1]),
+        ultimo_acti=Subquery(ultimo_evento.values('acti')[:1]),
+        fecha_ultimo_evento=Subquery(ultimo_evento.values('fecha')[:1]),
+        estado=Coalesce(Subquery(nombre_estado), Value('Sin estado'), output_field=CharField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0012_alter_proceso_convocado_alter_proceso_periodo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proceso',
+            name='estado',
+            field=models.CharField(db_index=True, default='Sin estado', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='proceso',
+            name='fecha_ultimo_evento',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='proceso',
+            name='ultimo_acti',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='proceso',
+            name='ultimo_evento',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pages.evento'),
+        ),
+        migrations.RunPython(backfill_estado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:46
+
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0013_proceso_estado'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='evento',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('actividad', 'documento', config='spanish', weight='A'), '||', django.contrib.postgres.search.SearchVector('situacion', config='spanish', weight='B'), django.contrib.postgres.search.SearchConfig('spanish')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddField(
+            model_name='proceso',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('nombre', 'nomenclatura', config='spanish', weight='A'), '||', django.contrib.postgres.search.SearchVector('descripcion', config='spanish', weight='B'), django.contrib.postgres.search.SearchConfig('spanish')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='evento_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('documento'), name='gin_trgm_ops'), name='evento_documento_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('situacion'), name='gin_trgm_ops'), name='evento_situacion_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='proceso_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nombre'), name='gin_trgm_ops'), name='proceso_nombre_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nomenclatura'), name='gin_trgm_ops'), name='proceso_nomenclatura_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('descripcion'), name='gin_trgm_ops'), name='proceso_descripcion_trgm'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# nombre LIKE 'RE%' no necesita un índice text_pattern_ops propio: nombre es único y
+# Django ya le crea el índice varchar_pattern_ops (pages_proceso_nombre_..._like). La
+# separación por mercado del dashboard la sirve proceso_mercado_nombre_idx (0016).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0014_busqueda'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evento',
+            name='proceso',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='pages.proceso'),
+        ),
+        migrations.AlterField(
+            model_name='formula',
+            name='parametro',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='formulas', to='pages.parametro'),
+        ),
+        migrations.AlterField(
+            model_name='proceso',
+            name='estado',
+            field=models.CharField(default='Sin estado', editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['proceso', '-fecha', '-id'], name='evento_proceso_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formula',
+            index=models.Index(fields=['parametro', 'cantidad'], name='formula_param_cantidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formula',
+            index=models.Index(fields=['parametro', 'orden'], name='formula_param_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formula',
+            index=models.Index(fields=['parametro', 'nombre'], name='formula_param_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=models.Index(fields=['estado', 'id'], name='proceso_estado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=models.Index(fields=['estimado', 'id'], name='proceso_estimado_id_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-18 16:50
+
+import django.db.models.functions.text
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0015_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proceso',
+            name='mercado',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(django.db.models.lookups.Exact(django.db.models.functions.text.Left('nombre', 2), models.Value('RE')), then=models.Value('Extranjero')), default=models.Value('Nacional'), output_field=models.CharField()), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddIndex(
+            model_name='proceso',
+            index=models.Index(fields=['mercado', 'nombre', 'id'], name='proceso_mercado_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_intervalos(apps, schema_editor):
+    # Tramos de estado (parametro 50) de todos los procesos; ver INTERVALOS_SQL en models.py
+    schema_editor.execute("""
+        INSERT INTO pages_intervaloestado (proceso_id, orden, estado, acti, inicio, fin, duracion, acti_color, actual)
+        SELECT proceso_id, orden, estado, acti, inicio, fin, fin - inicio, acti_color, orden = total
+        FROM (
+            SELECT proceso_id, estado, acti, inicio,
+                   ROW_NUMBER() OVER tramos AS orden,
+                   COUNT(*) OVER (PARTITION BY proceso_id) AS total,
+                   COALESCE(LEAD(inicio) OVER tramos, ultima_fecha) AS fin,
+                   COALESCE(LEAD(acti) OVER tramos, ultimo_acti) AS acti_color
+            FROM (
+                SELECT e.proceso_id, e.id, e.fecha AS inicio, e.acti, s.nombre AS estado,
+                       LAG(s.nombre) OVER eventos AS estado_anterior,
+                       LAST_VALUE(e.fecha) OVER todos AS ultima_fecha,
+                       LAST_VALUE(e.acti) OVER todos AS ultimo_acti
+                FROM pages_evento e
+                JOIN (
+                    SELECT DISTINCT ON (cantidad) cantidad, nombre FROM pages_formula
+                    WHERE parametro_id = 50 AND cantidad IS NOT NULL
+                    ORDER BY cantidad, id
+                ) s ON s.cantidad = e.acti
+                WINDOW eventos AS (PARTITION BY e.proceso_id ORDER BY e.fecha, e.id),
+                       todos AS (eventos ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+            ) eventos
+            WHERE estado_anterior IS DISTINCT FROM estado
+            WINDOW tramos AS (PARTITION BY proceso_id ORDER BY inicio, id)
+        ) tramos
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0016_proceso_mercado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntervaloEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orden', models.PositiveIntegerField()),
+                ('estado', models.CharField(max_length=100)),
+                ('acti', models.IntegerField()),
+                ('inicio', models.DateField()),
+                ('fin', models.DateField()),
+                ('duracion', models.IntegerField()),
+                ('acti_color', models.IntegerField()),
+                ('actual', models.BooleanField(default=False)),
+                ('proceso', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='intervalos', to='pages.proceso')),
+            ],
+            options={
+                'verbose_name': 'Intervalo de estado',
+                'verbose_name_plural': 'Intervalos de estado',
+                'indexes': [models.Index(condition=models.Q(('actual', True)), fields=['inicio'], name='intervalo_actual_inicio_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='intervaloestado',
+            constraint=models.UniqueConstraint(fields=('proceso', 'orden'), name='intervalo_proceso_orden_uniq'),
+        ),
+        migrations.RunPython(backfill_intervalos, migrations.RunPython.noop),
+    ]
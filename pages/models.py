@@ -1,5 +1,131 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models import Case, When, Value, Count, Sum, OuterRef, Subquery, CharField
+from django.db.models.functions import Coalesce, Left, Upper
+from django.db.models.lookups import Exact
 from django.utils import timezone
+from .catalog import catalogo, PERIODOS, ACTIVIDADES, ESTADOS_GRAFICO
+
+# Los procesos cuyo nombre empieza con "RE" son del mercado extranjero. Se usa LEFT() en lugar
+# de LIKE 'RE%' porque el % no se puede incluir en la expresión de una columna generada
+MERCADO_EXPRESION = Case(
+    When(Exact(Left('nombre', 2), Value('RE')), then=Value('Extranjero')),
+    default=Value('Nacional'),
+    output_field=models.CharField(),
+)
+
+SIN_ESTADO = 'Sin estado'
+
+# Configuración de texto completo de PostgreSQL para las búsquedas
+CONFIG_BUSQUEDA = 'spanish'
+
+def indice_trigramas(campo, nombre):
+    # icontains se traduce a UPPER(campo) LIKE UPPER('%texto%'); el índice debe cubrir esa expresión
+    return GinIndex(OpClass(Upper(campo), name='gin_trgm_ops'), name=nombre)
+
+def _eventos_estado(proceso_ref):
+    # Eventos del proceso con acti válido (parametro 29), del más reciente al más antiguo
+    return Evento.objects.filter(
+        proceso=proceso_ref,
+        acti__in=Formula.objects.filter(parametro_id=29).values('cantidad'),
+    ).order_by('-fecha', '-id')
+
+def estado_expresiones():
+    """Expresiones que calculan el estado actual de un proceso a partir de sus eventos.
+
+    El último evento es el más reciente (fecha, id) cuyo acti es un estado
+    válido del parametro 29; el estado es el nombre de esa fórmula.
+    """
+    ultimo_evento = _eventos_estado(OuterRef('pk'))
+    nombre_estado = Formula.objects.filter(
+        parametro_id=29,
+        # Subconsulta anidada: el proceso se referencia dos niveles hacia afuera
+        cantidad=Subquery(_eventos_estado(OuterRef(OuterRef('pk'))).values('acti')[:1]),
+    ).order_by('id').values('nombre')[:1]
+    return {
+        'ultimo_evento': Subquery(ultimo_evento.values('id')[:1]),
+        'ultimo_acti': Subquery(ultimo_evento.values('acti')[:1]),
+        'fecha_ultimo_evento': Subquery(ultimo_evento.values('fecha')[:1]),
+        'estado': Coalesce(Subquery(nombre_estado), Value(SIN_ESTADO), output_field=CharField()),
+    }
+
+# Tramos de la línea de tiempo (ver IntervaloEstado) de una lista de ids de procesos.
+# Un tramo empieza con el primer evento de un proceso o cuando cambia el nombre del estado
+# (parametro 50) respecto del evento anterior, y termina donde empieza el siguiente o en el
+# último evento del proceso. El color es el del acti que abre el tramo siguiente (o el del
+# último evento). Es lo mismo que timeline.calcular_segmentos (sync_intervalos --verify compara ambos)
+INTERVALOS_SQL = """
+INSERT INTO {intervalos} (proceso_id, orden, estado, acti, inicio, fin, duracion, acti_color, actual)
+SELECT proceso_id, orden, estado, acti, inicio, fin, fin - inicio, acti_color, orden = total
+FROM (
+    SELECT proceso_id, estado, acti, inicio,
+           ROW_NUMBER() OVER tramos AS orden,
+           COUNT(*) OVER (PARTITION BY proceso_id) AS total,
+           COALESCE(LEAD(inicio) OVER tramos, ultima_fecha) AS fin,
+           COALESCE(LEAD(acti) OVER tramos, ultimo_acti) AS acti_color
+    FROM (
+        SELECT e.proceso_id, e.id, e.fecha AS inicio, e.acti, s.nombre AS estado,
+               LAG(s.nombre) OVER eventos AS estado_anterior,
+               LAST_VALUE(e.fecha) OVER todos AS ultima_fecha,
+               LAST_VALUE(e.acti) OVER todos AS ultimo_acti
+        FROM {eventos} e
+        JOIN (
+            -- Con varias fórmulas por cantidad, la de menor id (como el catálogo en memoria)
+            SELECT DISTINCT ON (cantidad) cantidad, nombre FROM {formulas}
+            WHERE parametro_id = %s AND cantidad IS NOT NULL
+            ORDER BY cantidad, id
+        ) s ON s.cantidad = e.acti
+        WHERE e.proceso_id = ANY(%s)
+        WINDOW eventos AS (PARTITION BY e.proceso_id ORDER BY e.fecha, e.id),
+               todos AS (eventos ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+    ) eventos
+    WHERE estado_anterior IS DISTINCT FROM estado
+    WINDOW tramos AS (PARTITION BY proceso_id ORDER BY inicio, id)
+) tramos
+"""
+
+class ProcesoQuerySet(models.QuerySet):
+    def actualizar_estados(self):
+        """Recalcula el estado desnormalizado de los procesos del queryset.
+
+        Las columnas de estado van en un solo UPDATE y los tramos de la línea
+        de tiempo se reemplazan con ``actualizar_intervalos``. Devuelve la
+        cantidad de procesos actualizados.
+        """
+        actualizados = self.update(**estado_expresiones())
+        self.actualizar_intervalos()
+        return actualizados
+
+    def actualizar_intervalos(self):
+        """Reemplaza los IntervaloEstado de los procesos del queryset (un DELETE y un INSERT ... SELECT).
+
+        Las filas de los procesos se bloquean antes (en orden de id, para no
+        formar deadlocks): dos actualizaciones simultáneas del mismo proceso se
+        turnan en lugar de insertar los mismos tramos dos veces. Devuelve la
+        cantidad de tramos creados.
+        """
+        tabla = IntervaloEstado._meta.db_table
+        sql = INTERVALOS_SQL.format(intervalos=tabla, eventos=Evento._meta.db_table, formulas=Formula._meta.db_table)
+        with transaction.atomic(using=self.db):
+            ids = list(self.select_for_update().order_by('pk').values_list('pk', flat=True))
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(f'DELETE FROM {tabla} WHERE proceso_id = ANY(%s)', [ids])
+                cursor.execute(sql, [ESTADOS_GRAFICO, ids])
+                return cursor.rowcount
+
+    def con_estado_calculado(self):
+        """Anota el estado calculado desde los eventos (calc_*) para comparar con las columnas."""
+        return self.annotate(**{
+            f'calc_{campo}': expresion for campo, expresion in estado_expresiones().items()
+        })
+
+    def por_mercado(self):
+        """Cantidad de procesos y suma de estimados por mercado, en un solo GROUP BY."""
+        return self.values('mercado').annotate(
+            total_procesos=Count('id'),
+            total_estimado=Sum('estimado'),
+        ).order_by('mercado')
 
 class Proceso(models.Model):
     id = models.IntegerField(primary_key=True)
@@ -15,17 +141,41 @@ class Proceso(models.Model):
     convocado = models.ForeignKey('Formula', on_delete=models.SET_NULL, null=True, related_name='procesos_convocado', limit_choices_to={'parametro_id': 11})
     derivado = models.IntegerField(null=True, blank=True)
 
+    # Estado actual desnormalizado; lo mantienen las señales de Evento y Formula (ver signals.py)
+    ultimo_evento = models.ForeignKey('Evento', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+')
+    ultimo_acti = models.IntegerField(null=True, blank=True, editable=False)
+    estado = models.CharField(max_length=100, default=SIN_ESTADO, editable=False)
+    fecha_ultimo_evento = models.DateField(null=True, blank=True, db_index=True, editable=False)
+
+    # Mercado (Nacional/Extranjero) calculado por PostgreSQL a partir del nombre
+    mercado = models.GeneratedField(
+        expression=MERCADO_EXPRESION,
+        output_field=models.CharField(max_length=20),
+        db_persist=True,
+    )
+
+    # Vector de búsqueda de texto completo; PostgreSQL lo mantiene al insertar o actualizar la fila
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('nombre', 'nomenclatura', config=CONFIG_BUSQUEDA, weight='A')
+            + SearchVector('descripcion', config=CONFIG_BUSQUEDA, weight='B')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = ProcesoQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
-        if not self.periodo_id:
+        if not self.periodo_id or not self.convocado_id:
+            # Por defecto, el periodo del año en curso (catálogo en memoria, sin consultas)
             current_year = timezone.now().year
-            default_periodo = Formula.objects.filter(parametro_id=11, nombre=str(current_year)).first()
+            default_periodo = catalogo(PERIODOS).por_nombre.get(str(current_year))
             if default_periodo:
-                self.periodo = default_periodo
-        if not self.convocado_id:
-            current_year = timezone.now().year
-            default_convocado = Formula.objects.filter(parametro_id=11, nombre=str(current_year)).first()
-            if default_convocado:
-                self.convocado = default_convocado
+                if not self.periodo_id:
+                    self.periodo = default_periodo
+                if not self.convocado_id:
+                    self.convocado = default_periodo
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -34,19 +184,24 @@ class Proceso(models.Model):
     class Meta:
         verbose_name = "Proceso"
         verbose_name_plural = "Procesos"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='proceso_search_vector_gin'),
+            indice_trigramas('nombre', 'proceso_nombre_trgm'),
+            indice_trigramas('nomenclatura', 'proceso_nomenclatura_trgm'),
+            indice_trigramas('descripcion', 'proceso_descripcion_trgm'),
+            # Páginas del dashboard por mercado, ordenadas por (nombre, id), y conteo por mercado
+            models.Index(fields=['mercado', 'nombre', 'id'], name='proceso_mercado_nombre_idx'),
+            # Órdenes de proceso_list con el id como desempate (paginación por clave)
+            models.Index(fields=['estado', 'id'], name='proceso_estado_id_idx'),
+            models.Index(fields=['estimado', 'id'], name='proceso_estimado_id_idx'),
+        ]
 
     def get_estado(self):
-        ultimo_evento = self.eventos.order_by('-fecha', '-id').first()
-        if ultimo_evento:
-            formula_estado = Formula.objects.filter(parametro_id=29, cantidad=ultimo_evento.acti).first()
-            if formula_estado:
-                return formula_estado.nombre
-        return "Sin estado"
+        return self.estado
 
     def get_orden_estado(self):
-        ultimo_evento = self.eventos.order_by('-fecha', '-id').first()
-        if ultimo_evento:
-            formula_orden = Formula.objects.filter(parametro_id=12, descripcion=ultimo_evento.acti).first()
+        if self.ultimo_acti is not None:
+            formula_orden = catalogo(ACTIVIDADES).por_descripcion.get(str(self.ultimo_acti))
             if formula_orden:
                 return formula_orden.orden
         return 0
@@ -59,16 +214,23 @@ class Proceso(models.Model):
 
     def get_periodo(self):
         if self.periodo_id:
-            return Formula.objects.filter(parametro_id=11, orden=self.periodo_id).first()
+            return catalogo(PERIODOS).por_orden.get(self.periodo_id)
         return None
 
     def get_convocado(self):
         if self.convocado_id:
-            return Formula.objects.filter(parametro_id=11, orden=self.convocado_id).first()
+            return catalogo(PERIODOS).por_orden.get(self.convocado_id)
         return None
 
+class EventoQuerySet(models.QuerySet):
+    def con_acti_nombre(self):
+        """Anota el nombre de la actividad (parametro 12, por orden) en la misma consulta."""
+        nombre = Formula.objects.filter(parametro_id=ACTIVIDADES, orden=OuterRef('acti')).order_by('id').values('nombre')[:1]
+        return self.annotate(acti_nombre=Coalesce(Subquery(nombre), Value('N/A'), output_field=CharField()))
+
 class Evento(models.Model):
-    proceso = models.ForeignKey(Proceso, on_delete=models.CASCADE, related_name='eventos')  # Relación con Proceso
+    # Sin índice propio: lo cubre evento_proceso_fecha_id_idx, que empieza por proceso
+    proceso = models.ForeignKey(Proceso, on_delete=models.CASCADE, related_name='eventos', db_index=False)  # Relación con Proceso
     actividad = models.CharField(max_length=100, blank=True, null=True)  # Campo de texto corto
     documento = models.CharField(max_length=100, blank=True, null=True)  # Campo de texto corto
     fecha = models.DateField(default=timezone.now)  # Usa la fecha actual como valor por defecto
@@ -76,9 +238,59 @@ class Evento(models.Model):
     importe = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Campo numérico con 2 decimales, por defecto 0
     acti = models.IntegerField(null=True, blank=True)
 
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('actividad', 'documento', config=CONFIG_BUSQUEDA, weight='A')
+            + SearchVector('situacion', config=CONFIG_BUSQUEDA, weight='B')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = EventoQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.actividad or ''} - {self.proceso.nombre or ''}"
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='evento_search_vector_gin'),
+            indice_trigramas('documento', 'evento_documento_trgm'),
+            indice_trigramas('situacion', 'evento_situacion_trgm'),
+            # Último evento de un proceso y páginas de evento_list (se recorre en ambos sentidos)
+            models.Index(fields=['proceso', '-fecha', '-id'], name='evento_proceso_fecha_id_idx'),
+        ]
+
+class IntervaloEstado(models.Model):
+    """Tramo de la línea de tiempo de un proceso: un estado (parametro 50) entre dos fechas.
+
+    Es un dato derivado de los eventos. ProcesoQuerySet.actualizar_estados lo
+    reemplaza solo para los procesos que cambian (y sync_intervalos para
+    todos), así que los gráficos, los reportes de duración y los filtros por
+    estado lo leen con índices en lugar de recorrer el historial de eventos.
+    """
+    proceso = models.ForeignKey(Proceso, on_delete=models.CASCADE, related_name='intervalos', db_index=False)
+    orden = models.PositiveIntegerField()  # 1, 2, ... dentro del proceso
+    estado = models.CharField(max_length=100)
+    acti = models.IntegerField()  # acti del evento que abre el tramo
+    inicio = models.DateField()
+    fin = models.DateField()  # inicio del tramo siguiente, o fecha del último evento del proceso
+    duracion = models.IntegerField()  # días entre inicio y fin
+    acti_color = models.IntegerField()  # acti que da el color en el gráfico (timeline.COLORES_DISTINTIVOS)
+    actual = models.BooleanField(default=False)  # último tramo: el estado en que está el proceso
+
+    class Meta:
+        verbose_name = "Intervalo de estado"
+        verbose_name_plural = "Intervalos de estado"
+        constraints = [
+            # Tramos de un proceso en orden (línea de tiempo); también sirve para el DELETE por proceso
+            models.UniqueConstraint(fields=['proceso', 'orden'], name='intervalo_proceso_orden_uniq'),
+        ]
+        indexes = [
+            # "Más de N días en el estado actual" (el estado se filtra en Proceso.estado)
+            models.Index(fields=['inicio'], condition=models.Q(actual=True), name='intervalo_actual_inicio_idx'),
+        ]
+
 class Parametro(models.Model):
     id = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100)
@@ -94,7 +306,8 @@ class Parametro(models.Model):
         unique_together = ['tipo', 'nombre']
 
 class Formula(models.Model):
-    parametro = models.ForeignKey(Parametro, on_delete=models.CASCADE, related_name='formulas', null=True, blank=True)
+    # Sin índice propio: lo cubren los índices compuestos (parametro, ...) de Meta.indexes
+    parametro = models.ForeignKey(Parametro, on_delete=models.CASCADE, related_name='formulas', null=True, blank=True, db_index=False)
     nombre = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True, null=True)
     orden = models.IntegerField(default=0)  # O cualquier otro valor por defecto que tenga sentido para tu aplicación
@@ -110,4 +323,10 @@ class Formula(models.Model):
 
     class Meta:
         verbose_name = "Fórmula"
-        verbose_name_plural = "Fórmulas"
\ No newline at end of file
+        verbose_name_plural = "Fórmulas"
+        # Búsquedas del catálogo y subconsultas de estado/actividad por parametro
+        indexes = [
+            models.Index(fields=['parametro', 'cantidad'], name='formula_param_cantidad_idx'),
+            models.Index(fields=['parametro', 'orden'], name='formula_param_orden_idx'),
+            models.Index(fields=['parametro', 'nombre'], name='formula_param_nombre_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,192 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+
+
+class KeysetPage:
+    """Página de un KeysetPaginator; se recorre como la lista de objetos."""
+
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    @property
+    def total(self):
+        return self.paginator.total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], 'n')
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], 'p')
+
+
+class KeysetPaginator:
+    """Paginación por clave (keyset) en lugar de OFFSET.
+
+    ``ordering`` es una tupla de campos del modelo (con '-' para descendente)
+    cuyo último campo debe ser único, p. ej. ``('-fecha', '-id')``. Cada página
+    es una sola consulta ``WHERE (campos) > (cursor) LIMIT per_page + 1``, así
+    que cuesta lo mismo en la primera página que en la última. El cursor es
+    un token opaco con los valores de la última (o primera) fila mostrada.
+
+    Los campos que admiten NULL se ordenan con los nulos al final, en ambos
+    sentidos. ``total`` puede ser None (sin total), 'aprox' (estimación del
+    planificador, sin COUNT) o 'exacto'.
+    """
+
+    def __init__(self, queryset, ordering, per_page, total=None):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.modo_total = total
+        self.campos = [campo.lstrip('-') for campo in self.ordering]
+        self.descendente = [campo.startswith('-') for campo in self.ordering]
+        opts = queryset.model._meta
+        self.nulos = [opts.get_field(campo).null for campo in self.campos]
+
+    def encode_cursor(self, obj, direccion):
+        datos = {'d': direccion, 'v': [getattr(obj, campo) for campo in self.campos]}
+        texto = json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Devuelve (dirección, valores) o None si el cursor no es válido."""
+        try:
+            texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            datos = json.loads(texto)
+            if datos['d'] not in ('n', 'p') or len(datos['v']) != len(self.campos):
+                return None
+            opts = self.queryset.model._meta
+            valores = [opts.get_field(campo).to_python(valor) for campo, valor in zip(self.campos, datos['v'])]
+            return datos['d'], valores
+        except (ValueError, TypeError, KeyError, ValidationError):
+            return None
+
+    def _orden(self, invertir=False):
+        orden = []
+        for campo, descendente, nulo in zip(self.campos, self.descendente, self.nulos):
+            expresion = F(campo).desc if descendente != invertir else F(campo).asc
+            if not nulo:
+                # Sin NULLs no hace falta NULLS LAST, y así el índice del campo sirve en ambos sentidos
+                orden.append(expresion())
+            elif invertir:
+                orden.append(expresion(nulls_first=True))
+            else:
+                orden.append(expresion(nulls_last=True))
+        return orden
+
+    def ordenado(self):
+        """El queryset con el mismo orden que usan las páginas."""
+        return self.queryset.order_by(*self._orden())
+
+    def _despues_de(self, valores, invertir):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        # Con nulos al final: NULL va después de cualquier valor y es igual a otro NULL
+        condicion = Q()
+        iguales = Q()
+        for campo, valor, descendente, nulo in zip(self.campos, valores, self.descendente, self.nulos):
+            mayor = descendente == invertir
+            if valor is None:
+                if invertir:
+                    condicion |= iguales & Q(**{f'{campo}__isnull': False})
+                iguales &= Q(**{f'{campo}__isnull': True})
+                continue
+            siguiente = Q(**{f'{campo}__{"gt" if mayor else "lt"}': valor})
+            if nulo and not invertir:
+                siguiente |= Q(**{f'{campo}__isnull': True})
+            condicion |= iguales & siguiente
+            iguales &= Q(**{campo: valor})
+        return condicion
+
+    @property
+    def total(self):
+        """Total de filas según ``modo_total``; se calcula una sola vez."""
+        if self.modo_total is None:
+            return None
+        if not hasattr(self, '_total'):
+            if self.modo_total == 'aprox':
+                self._total = conteo_aproximado(self.queryset)
+            else:
+                self._total = self.queryset.count()
+        return self._total
+
+    def _consulta(self, cursor):
+        # (queryset limitado a per_page + 1, dirección): 'n' siguiente, 'p' anterior, None primera página
+        decodificado = self.decode_cursor(cursor) if cursor else None
+        if decodificado is None:
+            return self.queryset.order_by(*self._orden())[:self.per_page + 1], None
+        direccion, valores = decodificado
+        if direccion == 'n':
+            queryset = self.queryset.filter(self._despues_de(valores, False)).order_by(*self._orden())
+        else:
+            # Página anterior: se recorre en orden inverso y se da vuelta el resultado
+            queryset = self.queryset.filter(self._despues_de(valores, True)).order_by(*self._orden(invertir=True))
+        return queryset[:self.per_page + 1], direccion
+
+    def _pagina(self, filas, direccion):
+        hay_mas = len(filas) > self.per_page
+        if direccion is None:
+            return KeysetPage(self, filas[:self.per_page], hay_mas, False)
+        if direccion == 'n':
+            return KeysetPage(self, filas[:self.per_page], hay_mas, True)
+        return KeysetPage(self, filas[:self.per_page][::-1], True, hay_mas)
+
+    def get_page(self, cursor=None):
+        """Página siguiente/anterior al cursor; sin cursor (o si no es válido), la primera."""
+        queryset, direccion = self._consulta(cursor)
+        return self._pagina(list(queryset), direccion)
+
+    def restaurar_pagina(self, object_list, has_next, has_previous, total=None):
+        """Página armada con filas ya conocidas (p. ej. de una caché), sin consultar."""
+        if self.modo_total is not None:
+            self._total = total
+        return KeysetPage(self, object_list, has_next, has_previous)
+
+    async def aget_page(self, cursor=None):
+        """Versión asíncrona de ``get_page`` (ORM asíncrono, para vistas async)."""
+        queryset, direccion = self._consulta(cursor)
+        return self._pagina([fila async for fila in queryset], direccion)
+
+
+def conteo_aproximado(queryset):
+    """Filas estimadas por el planificador de PostgreSQL (EXPLAIN), sin recorrer la tabla.
+
+    En otros motores hace el COUNT exacto.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,50 @@
+import os
+
+# Funciones que ejecutan los procesos del pool de prerender_charts. El módulo no
+# importa modelos al cargarse porque los procesos hijos arrancan sin Django.
+
+
+def init_worker(settings_module):
+    # Cada proceso del pool arranca con su propio Django y sus propias conexiones. Sin pool de
+    # conexiones: cada trabajo cierra la suya al terminar y no quedan min_size abiertas por proceso
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    os.environ['DB_POOL'] = '0'
+    import django
+    django.setup()
+
+
+def precargar():
+    # La primera tarea de cada proceso del dashboard asíncrono: importa matplotlib y pandas antes
+    # de que llegue un render
+    from . import charts  # noqa: F401
+    return os.getpid()
+
+
+def render_job(key):
+    from . import chart_store
+    from .charts import render_key
+    chart_store.write(key, render_key(key))
+    return key
+
+
+def cargar_o_renderizar(key):
+    # Lo usa el dashboard asíncrono: el almacén pre-renderizado si ya existe, si no un render nuevo
+    # que se guarda ahí para que la petición de la imagen lo encuentre aunque la atienda otro worker
+    from django.db import connections
+    from . import chart_store
+    from .charts import render_key
+    try:
+        image = chart_store.read(key)
+        if image is None:
+            image = render_key(key)
+            chart_store.write(key, image)
+        return image
+    finally:
+        connections.close_all()
+
+
+def cargar_o_renderizar_medido(key):
+    # cargar_o_renderizar con las consultas y el tiempo de render medidos en el hilo o proceso que lo
+    # ejecuta; aget_chart los suma a las métricas de la petición
+    from .instrumentation import medido
+    return medido(cargar_o_renderizar, key)
@@ -0,0 +1,203 @@
+import io
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Máximo de gráficos renderizándose a la vez en un worker; el resto espera turno
+MAX_RENDERS = getattr(settings, 'CHART_MAX_CONCURRENT_RENDERS', 2)
+
+_semaforo = threading.BoundedSemaphore(MAX_RENDERS)
+_lock = threading.Lock()
+_figuras_libres = {}
+
+# Métricas acumuladas del worker (ver render_stats()). rss_delta_* es lo que cada render deja de
+# más en el RSS (una fuga se ve como un total que no deja de crecer); rss_pico_proceso_kb es el
+# máximo de toda la vida del proceso
+_stats = {'renders': 0, 'segundos': 0.0, 'rss_delta_max_kb': 0, 'rss_delta_total_kb': 0,
+          'rss_pico_proceso_kb': 0, 'ultimo': None}
+
+MARGENES = ('left', 'right', 'top', 'bottom', 'wspace', 'hspace')
+
+# Indican si el localizador, el formato o la etiqueta de un eje son los que pone su conversor de unidades
+POR_DEFECTO = ('isDefault_majloc', 'isDefault_minloc', 'isDefault_majfmt', 'isDefault_minfmt', 'isDefault_label')
+
+# Formatos de salida: vectorial (svg), comprimido (webp) y png optimizado
+FORMATOS = {
+    'png': {'content_type': 'image/png', 'savefig': {'pil_kwargs': {'optimize': True}}},
+    'webp': {'content_type': 'image/webp', 'savefig': {'pil_kwargs': {'quality': 80, 'method': 4}}},
+    'svg': {'content_type': 'image/svg+xml', 'savefig': {}},
+}
+
+# Tamaños: 'thumb' para la tarjeta del dashboard y 'full' para la versión completa
+TAMANOS = ('thumb', 'full')
+
+
+def rss_actual_kb():
+    """RSS actual del proceso en KB (None si /proc no está disponible)."""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def rss_pico_proceso_kb():
+    # Pico de RSS de toda la vida del proceso (en Linux ru_maxrss viene en KB): no baja nunca
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class FiguraPlantilla:
+    """Figura Agg con los ejes de su plantilla ya configurados.
+
+    ``configurar(fig)`` corre una sola vez, al crearla. Después de cada render
+    ``limpiar()`` quita solo lo que dibujó el render (barras, líneas, textos,
+    leyendas) y deja ejes, localizadores, etiquetas, límites y márgenes como
+    quedaron al configurarla, así la figura vuelve al pool lista para el siguiente.
+    """
+
+    def __init__(self, figsize, configurar=None):
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = configurar(self.fig) if configurar else self.fig.subplots()
+        ax = self.ax
+        self._artistas = set(ax.get_children())
+        self._contenedores = list(ax.containers)
+        self._margenes = {clave: getattr(self.fig.subplotpars, clave) for clave in MARGENES}
+        self._limites = (ax.get_xlim(), ax.get_ylim(), ax.get_autoscalex_on(), ax.get_autoscaley_on())
+        self._etiquetas = (ax.get_xlabel(), ax.get_ylabel(), ax.get_title())
+        self._aspecto = (ax.get_aspect(), ax.get_adjustable(), ax.get_frame_on())
+        self._ejes = [
+            (eje, eje.get_converter(), eje.get_units(), eje.get_major_locator(), eje.get_major_formatter(), eje.get_minor_locator(),
+             eje.get_minor_formatter(), {bandera: getattr(eje, bandera) for bandera in POR_DEFECTO})
+            for eje in (ax.xaxis, ax.yaxis)
+        ]
+
+    def limpiar(self):
+        ax = self.ax
+        # Los contenedores (barh, pie...) se quitan con sus artistas
+        for contenedor in list(ax.containers):
+            if contenedor not in self._contenedores:
+                contenedor.remove()
+        for artista in ax.get_children():
+            if artista not in self._artistas:
+                artista.remove()
+        # Los colores automáticos vuelven a empezar por el primero del ciclo
+        ax.set_prop_cycle(None)
+        # Los límites de los datos solo con lo que quedó (la parte fija de la plantilla)
+        ax.relim()
+        for eje, conversor, unidades, mayor, formato_mayor, menor, formato_menor, banderas in self._ejes:
+            # Las categorías de barh (etiquetas de los procesos) se vuelven a numerar en el próximo render.
+            # Igual que Axis.clear, que además borraría los tick_params de la plantilla; set_units(None)
+            # no sirve: el conversor de categorías lo rechaza
+            eje._converter, eje.units = conversor, unidades
+            eje.set_major_locator(mayor)
+            eje.set_major_formatter(formato_mayor)
+            eje.set_minor_locator(menor)
+            eje.set_minor_formatter(formato_menor)
+            for bandera, valor in banderas.items():
+                setattr(eje, bandera, valor)
+        xlim, ylim, autoscalex, autoscaley = self._limites
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)  # también deshace invert_yaxis
+        ax.set_autoscalex_on(autoscalex)
+        ax.set_autoscaley_on(autoscaley)
+        xlabel, ylabel, titulo = self._etiquetas
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(titulo)
+        aspecto, ajuste, marco = self._aspecto
+        ax.set_aspect(aspecto, adjustable=ajuste)
+        ax.set_frame_on(marco)
+        # tight_layout o subplots_adjust del render
+        self.fig.subplots_adjust(**self._margenes)
+
+
+def _tomar_figura(plantilla, figsize, configurar):
+    with _lock:
+        libres = _figuras_libres.setdefault(plantilla, [])
+        figura = libres.pop() if libres else None
+    if figura is None:
+        return FiguraPlantilla(figsize, configurar), False
+    return figura, True
+
+
+def _devolver_figura(plantilla, figura):
+    try:
+        figura.limpiar()
+    except Exception:
+        # Una figura que no se pudo limpiar no vuelve al pool
+        logger.exception('No se pudo limpiar la figura %s', plantilla)
+        return
+    with _lock:
+        libres = _figuras_libres.setdefault(plantilla, [])
+        # Nunca se guardan más figuras de las que se pueden usar a la vez
+        if len(libres) < MAX_RENDERS:
+            libres.append(figura)
+
+
+@contextmanager
+def figura(plantilla, figsize, configurar=None):
+    """Entrega (fig, ax) de una figura Agg independiente de pyplot.
+
+    Limita los renders simultáneos, reutiliza las figuras de cada plantilla
+    con sus ejes ya configurados y siempre quita lo dibujado al terminar.
+    ``configurar(fig)`` aplica la parte fija de la plantilla y devuelve los
+    ejes; solo se llama al crear una figura nueva (una plantilla usa siempre
+    el mismo ``figsize`` y el mismo ``configurar``).
+    """
+    with _semaforo:
+        rss_antes = rss_actual_kb()
+        inicio = time.perf_counter()
+        figura_plantilla, reutilizada = _tomar_figura(plantilla, figsize, configurar)
+        try:
+            yield figura_plantilla.fig, figura_plantilla.ax
+        finally:
+            _devolver_figura(plantilla, figura_plantilla)
+            _registrar(plantilla, time.perf_counter() - inicio, rss_antes, reutilizada)
+
+
+def exportar(fig, formato='png', **kwargs):
+    """Guarda la figura en memoria en el formato indicado y devuelve los bytes de la imagen."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=formato, **FORMATOS[formato]['savefig'], **kwargs)
+    return buffer.getvalue()
+
+
+def _registrar(plantilla, segundos, rss_antes, reutilizada):
+    rss_despues = rss_actual_kb()
+    metricas = {
+        'plantilla': plantilla,
+        'reutilizada': reutilizada,
+        'segundos': round(segundos, 3),
+        'rss_antes_kb': rss_antes,
+        'rss_despues_kb': rss_despues,
+        # Lo que este render dejó de más en el RSS (None sin /proc)
+        'rss_delta_kb': rss_despues - rss_antes if rss_antes is not None and rss_despues is not None else None,
+        'rss_pico_proceso_kb': rss_pico_proceso_kb(),
+    }
+    with _lock:
+        _stats['renders'] += 1
+        _stats['segundos'] += segundos
+        if metricas['rss_delta_kb'] is not None:
+            _stats['rss_delta_max_kb'] = max(_stats['rss_delta_max_kb'], metricas['rss_delta_kb'])
+            _stats['rss_delta_total_kb'] += metricas['rss_delta_kb']
+        _stats['rss_pico_proceso_kb'] = max(_stats['rss_pico_proceso_kb'], metricas['rss_pico_proceso_kb'])
+        _stats['ultimo'] = metricas
+    logger.info(
+        'render %(plantilla)s %(segundos)ss rss=%(rss_despues_kb)sKB delta=%(rss_delta_kb)sKB '
+        'pico_proceso=%(rss_pico_proceso_kb)sKB', metricas,
+    )
+
+
+def render_stats():
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,53 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+from .models import Proceso, Evento, CONFIG_BUSQUEDA
+
+# Resultados por tipo en la búsqueda unificada
+RESULTADOS_POR_TIPO = 20
+
+
+def consulta(texto):
+    # Sintaxis tipo buscador web: "frase exacta", -excluir, palabra OR palabra
+    return SearchQuery(texto, config=CONFIG_BUSQUEDA, search_type='websearch')
+
+
+def buscar_procesos(texto, procesos=None):
+    """Procesos que coinciden con ``texto`` por texto completo o por subcadena, ordenados por relevancia.
+
+    La subcadena cubre códigos y nomenclaturas que el diccionario español no
+    separa en palabras; la usan los índices de trigramas.
+    """
+    procesos = Proceso.objects.all() if procesos is None else procesos
+    query = consulta(texto)
+    return procesos.filter(
+        Q(search_vector=query)
+        | Q(nombre__icontains=texto)
+        | Q(nomenclatura__icontains=texto)
+        | Q(descripcion__icontains=texto)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query),
+    ).order_by('-rank', 'nombre', 'id')
+
+
+def buscar_eventos(texto, eventos=None):
+    """Eventos cuya actividad, documento o situación coinciden con ``texto``, ordenados por relevancia."""
+    eventos = Evento.objects.all() if eventos is None else eventos
+    query = consulta(texto)
+    return eventos.filter(
+        Q(search_vector=query)
+        | Q(documento__icontains=texto)
+        | Q(situacion__icontains=texto)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query),
+    ).select_related('proceso').order_by('-rank', '-fecha', '-id')
+
+
+def buscar(texto, limite=RESULTADOS_POR_TIPO):
+    """Búsqueda unificada: los procesos y eventos más relevantes para ``texto``."""
+    texto = (texto or '').strip()
+    if not texto:
+        return {'procesos': [], 'eventos': []}
+    return {
+        'procesos': list(buscar_procesos(texto)[:limite]),
+        'eventos': list(buscar_eventos(texto).con_acti_nombre()[:limite]),
+    }
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Proceso, Evento, Formula, Parametro
+from .cache import bump_data_version
+from .catalog import registry, ESTADOS, ESTADOS_GRAFICO
+
+# Campos de una fórmula de los parametros 29 y 50 de los que dependen el estado y los intervalos
+CAMPOS_ESTADO = ('parametro_id', 'cantidad', 'nombre')
+
+
+def _borrado_con_proceso(kwargs):
+    # Eventos que se borran en cascada con su proceso: no hay estado que mantener y el
+    # post_delete del proceso ya avanza la versión
+    origen = kwargs.get('origin')
+    if origen is None:
+        return False
+    modelo = getattr(origen, 'model', type(origen))  # una instancia o un queryset
+    return issubclass(modelo, Proceso)
+
+
+@receiver([post_save, post_delete], sender=Proceso)
+@receiver([post_save, post_delete], sender=Evento)
+@receiver([post_save, post_delete], sender=Formula)
+def data_changed(sender, **kwargs):
+    # Cualquier cambio en los datos del dashboard invalida los gráficos cacheados
+    if sender is Evento and _borrado_con_proceso(kwargs):
+        return
+    # Después del commit: antes, otro worker podría leer los datos viejos y cachearlos con la versión nueva
+    transaction.on_commit(bump_data_version)
+
+
+@receiver([post_save, post_delete], sender=Evento)
+def evento_changed(sender, instance, **kwargs):
+    # Mantener el estado desnormalizado (columnas e intervalos) del proceso del evento
+    if _borrado_con_proceso(kwargs):
+        return
+    Proceso.objects.filter(pk=instance.proceso_id).actualizar_estados()
+
+
+@receiver(pre_save, sender=Formula)
+def formula_previa(sender, instance, **kwargs):
+    # Valores guardados antes del cambio, para saber en post_save si afecta a los estados
+    instance._estado_previo = None
+    if instance.pk is not None:
+        instance._estado_previo = Formula.objects.filter(pk=instance.pk).values_list(*CAMPOS_ESTADO).first()
+
+
+@receiver([post_save, post_delete], sender=Formula)
+def formula_changed(sender, instance, **kwargs):
+    # Los nombres y acti válidos de los estados salen del parametro 29 y los de los intervalos del 50
+    previo = getattr(instance, '_estado_previo', None)
+    actual = tuple(getattr(instance, campo) for campo in CAMPOS_ESTADO)
+    if kwargs.get('signal') is post_save and previo == actual:
+        return  # no cambió nada de lo que define un estado (p. ej. solo descripcion u orden)
+    parametros = {actual[0], previo[0] if previo else None}
+    if ESTADOS in parametros:
+        # Todos los procesos, después del commit y fuera de la transacción del guardado
+        transaction.on_commit(Proceso.objects.actualizar_estados)
+    elif ESTADOS_GRAFICO in parametros:
+        transaction.on_commit(Proceso.objects.actualizar_intervalos)
+
+
+@receiver([post_save, post_delete], sender=Formula)
+@receiver([post_save, post_delete], sender=Parametro)
+def catalog_changed(sender, **kwargs):
+    # Recargar el catálogo en memoria cuando el cambio sea visible para los demás workers
+    transaction.on_commit(registry.invalidar)
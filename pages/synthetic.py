@@ -0,0 +1,170 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from .cache import bump_data_version
+from .catalog import catalogo, registry, PERIODOS, ACTIVIDADES, ESTADOS, ESTADOS_GRAFICO
+from .models import Proceso, Evento, Parametro, Formula, IntervaloEstado
+
+# Los procesos generados se reconocen por la nomenclatura, para poder borrarlos sin tocar los reales
+PREFIJO = 'SYN-'
+
+# Proporción de procesos del mercado Extranjero (nombre 'RE-...')
+PROPORCION_EXTRANJERO = 0.3
+
+NOMBRES_ESTADOS = [
+    'Inicio', 'Actos previos', 'Convocatoria', 'Evaluacion', 'Buena pro', 'Consentida', 'Contrato',
+    'Ejecucion', 'Desierto', 'Nulidad', 'Cancelado', 'Apelacion', 'Culminado',
+]
+TOTAL_ACTIVIDADES = 20
+
+
+def _formulas_periodos():
+    # El id de cada periodo es el año: Proceso.periodo/convocado guardan el orden de la fórmula
+    anio = date.today().year
+    return [
+        Formula(id=a, nombre=str(a), orden=a, cantidad=2 if a == anio else 1)
+        for a in range(anio - 2, anio + 1)
+    ]
+
+
+def _formulas_actividades():
+    return [
+        Formula(nombre=f'Actividad {n}', descripcion=str(n), orden=n)
+        for n in range(1, TOTAL_ACTIVIDADES + 1)
+    ]
+
+
+def _formulas_estados():
+    return [Formula(nombre=nombre, orden=i, cantidad=i + 1) for i, nombre in enumerate(NOMBRES_ESTADOS)]
+
+
+CATALOGOS = {
+    PERIODOS: ('Periodo', _formulas_periodos),
+    ACTIVIDADES: ('Actividad', _formulas_actividades),
+    ESTADOS: ('Estado', _formulas_estados),
+    ESTADOS_GRAFICO: ('Estado grafico', _formulas_estados),
+}
+
+
+def generar_catalogos():
+    """Crea los parametros 11, 12, 29 y 50 con sus fórmulas si aún no tienen ninguna.
+
+    Los catálogos que ya existen no se modifican. Devuelve los parametros creados.
+    """
+    creados = []
+    with transaction.atomic():
+        for parametro_id, (nombre, formulas) in CATALOGOS.items():
+            parametro, _ = Parametro.objects.get_or_create(
+                pk=parametro_id, defaults={'nombre': nombre, 'tipo': f'T{parametro_id}'},
+            )
+            if parametro.formulas.exists():
+                continue
+            nuevas = formulas()
+            for formula in nuevas:
+                formula.parametro = parametro
+            Formula.objects.bulk_create(nuevas)
+            creados.append(parametro_id)
+        if creados:
+            # Los ids explícitos no avanzan la secuencia de Formula
+            _reiniciar_secuencia(Formula)
+            # bulk_create no envía señales: el estado de los procesos y los catálogos se actualizan aquí.
+            # Este worker los lee enseguida (generar), aunque haya una transacción de afuera sin terminar
+            registry.invalidar(compartir=False)
+            transaction.on_commit(registry.invalidar)
+            if ESTADOS in creados or ESTADOS_GRAFICO in creados:
+                Proceso.objects.actualizar_estados()
+    return creados
+
+
+def _reiniciar_secuencia(model):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+def _eventos(proceso, eventos_por_proceso, rng, inicio, actividades, estados):
+    # El estado avanza en orden con saltos ocasionales; entre medio hay actividades que no son estado
+    fecha = inicio + timedelta(days=rng.randint(0, 90))
+    indice_estado = 0
+    eventos = []
+    for n in range(eventos_por_proceso):
+        fecha += timedelta(days=rng.randint(1, 10))
+        if rng.random() < 0.7:
+            acti = estados[min(indice_estado, len(estados) - 1)]
+            indice_estado += rng.choice((0, 1, 1, 2))
+        else:
+            acti = rng.choice(actividades)
+        eventos.append(Evento(
+            proceso=proceso,
+            actividad=catalogo(ACTIVIDADES).nombre(acti, defecto=f'Actividad {acti}'),
+            documento=f'DOC-{proceso.pk}-{n}',
+            fecha=fecha,
+            situacion=rng.choice(('Registrado', 'En revision', 'Observado', 'Aprobado')),
+            importe=Decimal(rng.randint(0, 500000)) / 100,
+            acti=acti,
+        ))
+    return eventos
+
+
+def generar(procesos, eventos_por_proceso, seed=0, lote=2000):
+    """Inserta ``procesos`` procesos sintéticos con ``eventos_por_proceso`` eventos cada uno.
+
+    Usa bulk_create por lotes dentro de una transacción y recalcula el estado
+    de todos los procesos nuevos con un solo UPDATE al final (bulk_create no
+    envía las señales que lo hacen en cada guardado). Devuelve (procesos, eventos) creados.
+    """
+    generar_catalogos()
+    rng = random.Random(seed)
+    periodos = catalogo(PERIODOS).ordenadas
+    estados = sorted(catalogo(ESTADOS).por_cantidad)
+    actividades = [formula.orden for formula in catalogo(ACTIVIDADES).ordenadas] or estados
+    inicio = date(date.today().year, 1, 1)
+    total_eventos = 0
+
+    with transaction.atomic():
+        primer_id = (Proceso.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+        for desde in range(0, procesos, lote):
+            nuevos = []
+            for pk in range(primer_id + desde, primer_id + min(desde + lote, procesos)):
+                periodo = rng.choice(periodos) if periodos else None
+                prefijo = 'RE' if rng.random() < PROPORCION_EXTRANJERO else 'LP'
+                nuevos.append(Proceso(
+                    id=pk,
+                    nomenclatura=f'{PREFIJO}{pk:07d}',
+                    nombre=f'{prefijo}-{PREFIJO}{pk:07d}',
+                    descripcion=f'Proceso sintético {pk} para pruebas de rendimiento',
+                    estimado=Decimal(rng.randint(10000, 5000000)),
+                    periodo=periodo,
+                    convocado=periodo,
+                ))
+            Proceso.objects.bulk_create(nuevos)
+
+            eventos = []
+            for proceso in nuevos:
+                eventos.extend(_eventos(proceso, eventos_por_proceso, rng, inicio, actividades, estados))
+            Evento.objects.bulk_create(eventos, batch_size=lote)
+            total_eventos += len(eventos)
+
+        Proceso.objects.filter(id__gte=primer_id).actualizar_estados()
+        transaction.on_commit(bump_data_version)
+    return procesos, total_eventos
+
+
+def borrar():
+    """Borra los procesos sintéticos y sus eventos. Devuelve la cantidad de procesos borrados.
+
+    Se borra con SQL directo: Model.delete() enviaría una señal (y un UPDATE de
+    estado) por cada evento.
+    """
+    procesos = Proceso.objects.filter(nomenclatura__startswith=PREFIJO)
+    ids_sql, params = procesos.values('id').query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {IntervaloEstado._meta.db_table} WHERE proceso_id IN ({ids_sql})', params)
+        cursor.execute(f'DELETE FROM {Evento._meta.db_table} WHERE proceso_id IN ({ids_sql})', params)
+        cursor.execute(f'DELETE FROM {Proceso._meta.db_table} WHERE id IN ({ids_sql})', params)
+        borrados = cursor.rowcount
+        transaction.on_commit(bump_data_version)
+    return borrados
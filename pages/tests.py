@@ -1,3 +1,1082 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import tempfile
+import time
+import warnings
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.urls import reverse
+from django.test import Client, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.utils import timezone
+from .bulk import MAXIMO_PROCESOS
+from .cache import ChartCache, bump_data_version, chart_cache, get_data_version
+from .catalog import catalogo, registry, PERIODOS, ACTIVIDADES, ESTADOS, ESTADOS_GRAFICO
+from .charts import (
+    PROCESOS_POR_PAGINA, aget_chart, chart_jobs, get_chart, procesos_por_mercado, timeline_key, mercados_key,
+    render_timeline,
+)
+from .duraciones import reporte_duraciones
+from .forms import CatalogoChoiceField
+from .graphic2 import generate_pie_chart
+from .importer import importar
+from .instrumentation import registrar_peticion
+from .models import Proceso, Evento, Parametro, Formula, IntervaloEstado
+from .pagination import KeysetPaginator
+from .search import buscar, buscar_procesos
+from . import benchmark, chart_store, export, renderer, synthetic
+from .timeline import COLORES_DISTINTIVOS, construir_linea_tiempo, segmentos_desde_eventos
+from .views import EVENTOS_POR_PAGINA, filtrar_procesos
 
-# Create your tests here.
+ESTADOS_PRUEBA = ['Inicio', 'Convocatoria', 'Buena pro', 'Contrato']
+
+
+class CatalogoMixin:
+    """Catálogos mínimos de los parametros 11, 12, 29 y 50.
+
+    El periodo del año en curso tiene un id distinto de su orden, como en la
+    base real: Proceso.periodo_id / convocado_id guardan el orden.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.anio = timezone.now().year
+        parametros = {
+            parametro_id: Parametro.objects.create(id=parametro_id, nombre=f'P{parametro_id}', tipo=f'T{parametro_id}')
+            for parametro_id in (PERIODOS, ACTIVIDADES, ESTADOS, ESTADOS_GRAFICO)
+        }
+        self.periodo = Formula.objects.create(
+            id=1, parametro=parametros[PERIODOS], nombre=str(self.anio), orden=self.anio, cantidad=2,
+        )
+        # La FK de periodo apunta a Formula.id: debe existir una fórmula con id igual al orden
+        Formula.objects.create(id=self.anio, nombre='Relleno', orden=0)
+        for n in range(1, 6):
+            Formula.objects.create(id=100 + n, parametro=parametros[ACTIVIDADES], nombre=f'Actividad {n}', orden=n)
+        for i, nombre in enumerate(ESTADOS_PRUEBA):
+            for parametro_id in (ESTADOS, ESTADOS_GRAFICO):
+                Formula.objects.create(
+                    id=parametro_id * 10 + i, parametro=parametros[parametro_id], nombre=nombre, orden=i, cantidad=i + 1,
+                )
+        registry.invalidar()
+
+    def tearDown(self):
+        registry.invalidar()
+        super().tearDown()
+
+
+class ImportarProcesosTests(CatalogoMixin, TestCase):
+    def test_proceso_importado_aparece_en_la_lista_por_defecto(self):
+        archivo = io.BytesIO(f'nombre,descripcion,periodo\nLP-IMP-1,Importado,{self.anio}\nLP-IMP-2,Sin periodo,\n'.encode())
+        resultado = importar('procesos', archivo, 'procesos.csv')
+
+        self.assertEqual(resultado.insertadas, 2, resultado.rechazadas)
+        for proceso in Proceso.objects.filter(nombre__startswith='LP-IMP-'):
+            self.assertEqual(proceso.periodo_id, self.anio)
+            self.assertEqual(proceso.convocado_id, self.anio)
+
+        _, paginator, _, default_convoca, _ = filtrar_procesos(RequestFactory().get('/procesos/'))
+        self.assertEqual(default_convoca, self.periodo)
+        self.assertEqual(
+            sorted(paginator.ordenado().values_list('nombre', flat=True)), ['LP-IMP-1', 'LP-IMP-2'],
+        )
+
+
+class VersionDatosTests(TestCase):
+    def test_avanza_despues_del_commit(self):
+        version = get_data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Proceso.objects.create(id=1, nombre='LP-VER-1')
+            # Dentro de la transacción otro worker todavía ve los datos anteriores
+            self.assertEqual(get_data_version(), version)
+        self.assertNotEqual(get_data_version(), version)
+
+    def test_no_avanza_si_la_transaccion_se_deshace(self):
+        version = get_data_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Proceso.objects.create(id=2, nombre='LP-VER-2')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_data_version(), version)
+
+
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.enterContext(override_settings(CHART_STORE_DIR=directorio.name))
+        chart_cache.clear()
+        self.addCleanup(chart_cache.clear)
+
+    def test_descarta_la_entrada_menos_usada(self):
+        cache = ChartCache(2)
+        cache.set('a', b'a')
+        cache.set('b', b'b')
+        cache.get('a')
+        cache.set('c', b'c')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'a')
+
+    def test_se_sirve_hasta_que_cambian_los_datos(self):
+        render = mock.Mock(side_effect=[b'v1', b'v2'])
+        self.assertEqual(get_chart(mercados_key(), render), b'v1')
+        self.assertEqual(get_chart(mercados_key(), render), b'v1')
+        self.assertEqual(render.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Proceso.objects.create(id=1, nombre='LP-1')
+        self.assertEqual(get_chart(mercados_key(), render), b'v2')
+        self.assertEqual(render.call_count, 2)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 11 procesos: 7 con fecha (algunas repetidas) y 4 sin fecha, que van al final en ambos sentidos
+        fechas = [date(2024, 1, d) for d in (5, 3, 3, 9, 1, 5, 5)] + [None] * 4
+        Proceso.objects.bulk_create([
+            Proceso(id=pk, nombre=f'P{pk:02d}', fecha_ultimo_evento=fecha)
+            for pk, fecha in enumerate(fechas, start=1)
+        ])
+
+    def recorrer(self, ordering):
+        paginator = KeysetPaginator(Proceso.objects.all(), ordering, 3)
+        esperados = list(paginator.ordenado().values_list('id', flat=True))
+
+        # Hacia adelante con los cursores "siguiente"
+        paginas = [paginator.get_page()]
+        while paginas[-1].has_next():
+            paginas.append(paginator.get_page(paginas[-1].next_cursor))
+        adelante = [[proceso.pk for proceso in pagina] for pagina in paginas]
+        self.assertEqual([pk for pagina in adelante for pk in pagina], esperados)
+        self.assertFalse(paginas[0].has_previous())
+        self.assertTrue(paginas[-1].has_previous())
+
+        # Y de vuelta desde la última con los cursores "anterior": las mismas páginas
+        pagina = paginas[-1]
+        atras = [[proceso.pk for proceso in pagina]]
+        while pagina.has_previous():
+            pagina = paginator.get_page(pagina.previous_cursor)
+            atras.append([proceso.pk for proceso in pagina])
+        self.assertEqual(atras[::-1], adelante)
+
+    def test_fecha_ascendente_con_nulos(self):
+        self.recorrer(('fecha_ultimo_evento', 'id'))
+
+    def test_fecha_descendente_con_nulos(self):
+        self.recorrer(('-fecha_ultimo_evento', '-id'))
+
+    def test_cursor_alterado_vuelve_a_la_primera_pagina(self):
+        paginator = KeysetPaginator(Proceso.objects.all(), ('fecha_ultimo_evento', 'id'), 3)
+        primera = [proceso.pk for proceso in paginator.get_page()]
+
+        def token(texto):
+            return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+        for cursor in (
+            'no-es-un-cursor',
+            token('{"d":"n","v":[1]}'),                   # falta un valor
+            token('{"d":"x","v":["2024-01-01",1]}'),      # dirección desconocida
+            token('{"d":"n","v":["no-es-fecha",1]}'),     # valor que no es del tipo del campo
+            token('[1,2]'),
+        ):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(paginator.decode_cursor(cursor))
+                pagina = paginator.get_page(cursor)
+                self.assertEqual([proceso.pk for proceso in pagina], primera)
+                self.assertFalse(pagina.has_previous())
+
+
+def segmentos_originales(eventos):
+    """Segmentos de un proceso con el algoritmo original de generate_graphic (un evento a la vez).
+
+    ``eventos`` son (fecha, acti) ordenados por (fecha, id). Devuelve (inicio, duración, color, estado).
+    """
+    formulas = list(Formula.objects.filter(parametro_id=ESTADOS_GRAFICO).order_by('orden'))
+    color_map = {formula.cantidad: COLORES_DISTINTIVOS[i] for i, formula in enumerate(formulas)}
+    validos = [(fecha, acti) for fecha, acti in eventos if acti in color_map]
+    inicios, duraciones, colores, estados = [], [], [], []
+    estado_actual, color_actual = None, 'grey'
+    for i, (fecha, acti) in enumerate(validos):
+        formula = Formula.objects.filter(parametro_id=ESTADOS_GRAFICO, cantidad=acti).order_by('pk').first()
+        if formula.nombre != estado_actual:
+            if estado_actual is not None:
+                duraciones.append((fecha - inicios[-1]).days)
+                colores.append(color_actual)
+            inicios.append(fecha)
+            estados.append(formula.nombre)
+            estado_actual = formula.nombre
+        siguiente = validos[i + 1][1] if i + 1 < len(validos) else acti
+        color_actual = color_map.get(siguiente, 'grey')
+    if inicios:
+        duraciones.append((validos[-1][0] - inicios[-1]).days)
+        colores.append(color_actual)
+    return list(zip(inicios, duraciones, colores, estados))
+
+
+class SegmentosTimelineTests(CatalogoMixin, TestCase):
+    # (fecha, acti) por proceso; 9 no es un estado del parametro 50 y 5 comparte nombre con 2
+    EVENTOS = {
+        1: [(date(2024, 1, 1), 1), (date(2024, 1, 4), 2), (date(2024, 1, 4), 3), (date(2024, 2, 1), 4)],
+        2: [(date(2024, 3, 1), 2), (date(2024, 3, 5), 5), (date(2024, 3, 9), 9), (date(2024, 3, 20), 3)],
+        3: [(date(2024, 5, 1), 3)],
+        4: [(date(2024, 6, 1), 1), (date(2024, 6, 2), 1), (date(2024, 6, 3), 2), (date(2024, 6, 9), 1)],
+        5: [(date(2024, 7, 1), 9)],
+    }
+
+    def setUp(self):
+        super().setUp()
+        Formula.objects.create(
+            id=ESTADOS_GRAFICO * 10 + 9, parametro_id=ESTADOS_GRAFICO, nombre=ESTADOS_PRUEBA[1], orden=9, cantidad=5,
+        )
+        registry.invalidar()
+        Proceso.objects.bulk_create([Proceso(id=pk, nombre=f'LP-{pk}', descripcion='') for pk in self.EVENTOS])
+        # En desorden, para que el orden por (fecha, id) no coincida con el de inserción
+        Evento.objects.bulk_create([
+            Evento(proceso_id=pk, fecha=fecha, acti=acti)
+            for pk, eventos in self.EVENTOS.items() for fecha, acti in reversed(eventos)
+        ][::-1])
+        Proceso.objects.actualizar_estados()
+
+    def esperados(self):
+        filas = []
+        for pk in self.EVENTOS:
+            eventos = Evento.objects.filter(proceso_id=pk).order_by('fecha', 'id').values_list('fecha', 'acti')
+            filas.extend((pk, *segmento) for segmento in segmentos_originales(list(eventos)))
+        return filas
+
+    @staticmethod
+    def filas(segmentos):
+        return [
+            (fila.proceso_id, fila.inicio.date(), fila.duracion, fila.color, fila.estado)
+            for fila in segmentos.itertuples()
+        ]
+
+    def test_calcular_segmentos_igual_al_algoritmo_original(self):
+        self.assertEqual(self.filas(segmentos_desde_eventos(list(self.EVENTOS))), self.esperados())
+
+    def test_intervalos_guardados_iguales_al_algoritmo_original(self):
+        procesos = list(Proceso.objects.order_by('id'))
+        _, _, segmentos = construir_linea_tiempo(procesos)
+        self.assertEqual(self.filas(segmentos), self.esperados())
+
+    def test_intervalos_se_actualizan_al_cambiar_eventos(self):
+        Evento.objects.create(proceso_id=3, fecha=date(2024, 5, 10), acti=4)
+        Evento.objects.filter(proceso_id=1, acti=3).delete()
+        _, _, segmentos = construir_linea_tiempo(list(Proceso.objects.order_by('id')))
+        self.assertEqual(self.filas(segmentos), self.esperados())
+
+    @staticmethod
+    def intervalos():
+        return list(IntervaloEstado.objects.order_by('proceso_id', 'orden').values_list(
+            'proceso_id', 'orden', 'estado', 'acti', 'inicio', 'fin', 'duracion', 'acti_color', 'actual',
+        ))
+
+    def test_actualizar_un_proceso_igual_al_refresco_completo(self):
+        antes = self.intervalos()
+        # bulk_create y update no envían señales: solo cambian los eventos del proceso 2
+        Evento.objects.bulk_create([Evento(proceso_id=2, fecha=date(2024, 3, 12), acti=1)])
+        Evento.objects.filter(proceso_id=2, acti=5).update(acti=4)
+
+        Proceso.objects.filter(pk=2).actualizar_intervalos()
+        incremental = self.intervalos()
+        self.assertNotEqual(incremental, antes)
+        self.assertEqual([fila for fila in incremental if fila[0] != 2], [fila for fila in antes if fila[0] != 2])
+
+        call_command('sync_intervalos', stdout=io.StringIO())
+        self.assertEqual(self.intervalos(), incremental)
+
+
+class EstadoDesnormalizadoTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.proceso = Proceso.objects.create(id=1, nombre='LP-1')
+
+    def estado(self):
+        self.proceso.refresh_from_db()
+        return self.proceso.estado, self.proceso.ultimo_acti, self.proceso.fecha_ultimo_evento
+
+    def test_se_mantiene_al_crear_editar_y_borrar_eventos(self):
+        self.assertEqual(self.estado(), ('Sin estado', None, None))
+
+        Evento.objects.create(proceso=self.proceso, fecha=date(2024, 1, 1), acti=1)
+        ultimo = Evento.objects.create(proceso=self.proceso, fecha=date(2024, 2, 1), acti=2)
+        self.assertEqual(self.estado(), ('Convocatoria', 2, date(2024, 2, 1)))
+        self.assertEqual(self.proceso.ultimo_evento_id, ultimo.pk)
+
+        ultimo.acti = 4
+        ultimo.save()
+        self.assertEqual(self.estado(), ('Contrato', 4, date(2024, 2, 1)))
+
+        # Un acti sin estado en el parametro 29 no cuenta
+        Evento.objects.create(proceso=self.proceso, fecha=date(2024, 3, 1), acti=99)
+        self.assertEqual(self.estado()[:2], ('Contrato', 4))
+
+        ultimo.delete()
+        self.assertEqual(self.estado()[:2], ('Inicio', 1))
+
+    def test_se_actualiza_al_renombrar_un_estado(self):
+        Evento.objects.create(proceso=self.proceso, fecha=date(2024, 1, 1), acti=2)
+        formula = Formula.objects.get(parametro_id=ESTADOS, cantidad=2)
+        formula.nombre = 'Convocatoria publicada'
+        with self.captureOnCommitCallbacks(execute=True):
+            formula.save()
+
+        self.assertEqual(self.estado()[0], 'Convocatoria publicada')
+
+    def test_sync_estados_verifica_y_recalcula(self):
+        Evento.objects.create(proceso=self.proceso, fecha=date(2024, 1, 1), acti=1)
+        # Un cambio que no pasa por las señales
+        Evento.objects.update(acti=3)
+
+        with self.assertRaises(CommandError):
+            call_command('sync_estados', verify=True, stdout=io.StringIO())
+        call_command('sync_estados', stdout=io.StringIO())
+        call_command('sync_estados', verify=True, stdout=io.StringIO())
+        self.assertEqual(self.estado()[:2], ('Buena pro', 3))
+
+
+class CatalogoChoiceFieldTests(CatalogoMixin, TestCase):
+    def test_valida_con_el_catalogo_en_memoria(self):
+        field = CatalogoChoiceField(PERIODOS, to_field_name='orden')
+        catalogo(PERIODOS)  # cargado una vez
+        with self.assertNumQueries(0):
+            self.assertEqual(field.clean(str(self.anio)), self.periodo)
+            self.assertEqual([valor for valor, _ in field.choices], ['', self.anio])
+
+    def test_rechaza_valores_desconocidos(self):
+        field = CatalogoChoiceField(PERIODOS, to_field_name='orden')
+        # 1999 no existe; 1 es el orden de una actividad (parametro 12), no de un periodo
+        for valor in ('1999', '1', 'abc'):
+            with self.subTest(valor=valor), self.assertRaises(ValidationError) as error:
+                field.clean(valor)
+            self.assertEqual(error.exception.code, 'invalid_choice')
+
+    def test_toma_los_cambios_del_catalogo(self):
+        field = CatalogoChoiceField(PERIODOS, to_field_name='orden')
+        with self.assertRaises(ValidationError):
+            field.clean('2000')
+
+        # Las señales recargan el catálogo al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Formula.objects.create(id=2000, parametro_id=PERIODOS, nombre='2000', orden=2000)
+        self.assertEqual(field.clean('2000'), nuevo)
+        self.assertIn(2000, [valor for valor, _ in field.choices])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        with self.assertRaises(ValidationError):
+            field.clean('2000')
+
+
+class EventoListTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user('usuario'))
+        Proceso.objects.bulk_create([Proceso(id=1, nombre='LP-1')])
+        # Dos páginas y media, con fechas repetidas; 99 no es una actividad del parametro 12
+        Evento.objects.bulk_create([
+            Evento(proceso_id=1, fecha=date(2024, 1, 1 + n // 3), acti=99 if n % 7 == 0 else n % 5 + 1)
+            for n in range(EVENTOS_POR_PAGINA * 2 + 10)
+        ])
+        catalogo(ACTIVIDADES)
+
+    def test_paginas_por_fecha_con_nombre_de_actividad(self):
+        for order_by, orden in (('fecha', ('fecha', 'id')), ('-fecha', ('-fecha', '-id'))):
+            with self.subTest(order_by=order_by):
+                esperados = list(Evento.objects.order_by(*orden).values_list('id', 'acti'))
+                vistos, cursor = [], ''
+                while True:
+                    # Sesión, usuario, proceso y una consulta por página, sin importar la página
+                    with self.assertNumQueries(4):
+                        response = self.client.get(
+                            reverse('evento_list', args=[1]), {'order_by': order_by, 'cursor': cursor},
+                        )
+                    pagina = response.context['page_obj']
+                    vistos.extend(pagina)
+                    if not pagina.has_next():
+                        break
+                    cursor = pagina.next_cursor
+                self.assertEqual([(evento.pk, evento.acti) for evento in vistos], esperados)
+                for evento in vistos:
+                    nombre = 'N/A' if evento.acti == 99 else f'Actividad {evento.acti}'
+                    self.assertEqual(evento.acti_nombre, nombre)
+
+
+class ApiEventosMasivoTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = get_user_model().objects.create_user('usuario')
+        self.client.force_login(self.usuario)
+        Proceso.objects.bulk_create([Proceso(id=pk, nombre=f'LP-{pk}') for pk in (1, 2, 3)])
+        self.url = reverse('api_eventos_masivo')
+
+    def enviar(self, datos, client=None):
+        cuerpo = datos if isinstance(datos, str) else json.dumps(datos)
+        return (client or self.client).post(self.url, cuerpo, content_type='application/json')
+
+    def datos(self, **cambios):
+        return {'procesos': [1, 2, 3], 'acti': 2, 'fecha': '2024-05-01', 'documento': 'Oficio 1', **cambios}
+
+    def test_crea_un_evento_por_proceso_y_actualiza_el_estado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.enviar(self.datos())
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['creados'], 3)
+        eventos = Evento.objects.filter(pk__in=response.json()['eventos'])
+        self.assertEqual(sorted(eventos.values_list('proceso_id', flat=True)), [1, 2, 3])
+        self.assertEqual(set(eventos.values_list('actividad', flat=True)), {'Actividad 2'})
+        for proceso in Proceso.objects.all():
+            self.assertEqual(proceso.estado, ESTADOS_PRUEBA[1])
+            self.assertEqual(proceso.fecha_ultimo_evento, date(2024, 5, 1))
+            self.assertTrue(proceso.intervalos.filter(actual=True, estado=ESTADOS_PRUEBA[1]).exists())
+
+    def test_falla_parcial_no_crea_ningun_evento(self):
+        # Un proceso inexistente entre válidos rechaza todo el envío
+        response = self.enviar(self.datos(procesos=[1, 2, 999]))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999', response.json()['errores']['procesos'][0]['message'])
+        self.assertFalse(Evento.objects.exists())
+
+    def test_errores_de_validacion(self):
+        casos = {
+            'acti': self.datos(acti=99),
+            'fecha': self.datos(fecha='2024-13-01'),
+            'documento': self.datos(documento=''),
+            'procesos': self.datos(procesos=list(range(1, MAXIMO_PROCESOS + 2))),
+        }
+        for campo, datos in casos.items():
+            with self.subTest(campo=campo):
+                response = self.enviar(datos)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(campo, response.json()['errores'])
+        for cuerpo in ('{no es json', '[1, 2]'):
+            with self.subTest(cuerpo=cuerpo):
+                response = self.enviar(cuerpo)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('__all__', response.json()['errores'])
+        self.assertFalse(Evento.objects.exists())
+
+    def test_permisos(self):
+        anonimo = Client()
+        response = self.enviar(self.datos(), client=anonimo)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], f"{reverse('login')}?next={self.url}")
+
+        # Sin token CSRF, aunque la sesión sea válida
+        con_csrf = Client(enforce_csrf_checks=True)
+        con_csrf.force_login(self.usuario)
+        self.assertEqual(self.enviar(self.datos(), client=con_csrf).status_code, 403)
+
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertFalse(Evento.objects.exists())
+
+
+class BusquedaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Proceso.objects.bulk_create([
+            Proceso(id=1, nombre='Puentes del distrito norte', nomenclatura='LP-SM-2024-01'),
+            Proceso(id=2, nombre='LP-2', descripcion='Mantenimiento del puente principal'),
+            Proceso(id=3, nombre='LP-3', descripcion='Compra de camionetas'),
+        ])
+        Evento.objects.bulk_create([
+            Evento(proceso_id=3, fecha=date(2024, 1, 1), documento='OFICIO-77', situacion='Observaciones al expediente'),
+            Evento(proceso_id=3, fecha=date(2024, 1, 2), situacion='Sin novedad'),
+        ])
+
+    def test_ordena_por_relevancia(self):
+        # El nombre pesa más que la descripción; "puentes" y "puente" tienen la misma raíz
+        self.assertEqual([proceso.pk for proceso in buscar_procesos('puente')], [1, 2])
+
+    def test_sintaxis_de_buscador_web(self):
+        self.assertEqual([proceso.pk for proceso in buscar_procesos('puente -norte')], [2])
+
+    def test_subcadena_de_un_codigo(self):
+        self.assertEqual([proceso.pk for proceso in buscar_procesos('sm-2024')], [1])
+
+    def test_busqueda_unificada(self):
+        # "expedientes" y "expediente" tienen la misma raíz
+        resultados = buscar('expedientes')
+        self.assertEqual(resultados['procesos'], [])
+        self.assertEqual([evento.documento for evento in resultados['eventos']], ['OFICIO-77'])
+        self.assertEqual(buscar('  '), {'procesos': [], 'eventos': []})
+
+
+class MercadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Proceso.objects.bulk_create([
+            Proceso(id=1, nombre='LP-1', estimado=Decimal('100.50')),
+            Proceso(id=2, nombre='LP-2', estimado=Decimal('200.00')),
+            Proceso(id=3, nombre='RE-3', estimado=Decimal('50.25')),
+        ])
+
+    def test_columna_mercado(self):
+        self.assertEqual(
+            dict(Proceso.objects.values_list('id', 'mercado')), {1: 'Nacional', 2: 'Nacional', 3: 'Extranjero'},
+        )
+        # Columna generada: la calcula la base de datos al cambiar el nombre
+        Proceso.objects.filter(pk=2).update(nombre='RE-2')
+        self.assertEqual(Proceso.objects.get(pk=2).mercado, 'Extranjero')
+
+    def test_procesos_por_mercado_filtra_por_la_columna(self):
+        procesos = procesos_por_mercado('Extranjero')
+        self.assertEqual([proceso.pk for proceso in procesos], [3])
+        self.assertIn('"mercado" =', str(procesos.query))
+        self.assertNotIn('LIKE', str(procesos.query))
+        # Cualquier otro valor cuenta como Nacional
+        self.assertEqual([proceso.pk for proceso in procesos_por_mercado('otro')], [1, 2])
+
+    def test_por_mercado_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            filas = list(Proceso.objects.por_mercado())
+
+        self.assertEqual(filas, [
+            {'mercado': 'Extranjero', 'total_procesos': 1, 'total_estimado': Decimal('50.25')},
+            {'mercado': 'Nacional', 'total_procesos': 2, 'total_estimado': Decimal('300.50')},
+        ])
+
+
+class ChartEndpointTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.enterContext(override_settings(CHART_STORE_DIR=directorio.name))
+        chart_cache.clear()
+        self.addCleanup(chart_cache.clear)
+
+        self.client.force_login(get_user_model().objects.create_user('usuario'))
+        Proceso.objects.bulk_create([Proceso(id=pk, nombre=f'{prefijo}-{pk}') for pk, prefijo in ((1, 'LP'), (2, 'RE'))])
+        Evento.objects.bulk_create([Evento(proceso_id=pk, fecha=date(2024, 1, 1), acti=1) for pk in (1, 2)])
+        Proceso.objects.actualizar_estados()
+
+    def test_imagen_con_etag_y_304(self):
+        for url in (reverse('chart_mercados', args=['png']), reverse('chart_timeline', args=['png'])):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'size': 'thumb'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'image/png')
+                self.assertTrue(response.content.startswith(b'\x89PNG'))
+                self.assertIn('Last-Modified', response)
+
+                response = self.client.get(url, {'size': 'thumb'}, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_etag_cambia_con_los_datos(self):
+        url = reverse('chart_mercados', args=['png'])
+        etag = self.client.get(url, {'size': 'thumb'})['ETag']
+        self.assertEqual(self.client.get(url, {'size': 'thumb'})['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Proceso.objects.create(id=3, nombre='LP-3')
+        response = self.client.get(url, {'size': 'thumb'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ApiTimelineTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user('usuario'))
+        Proceso.objects.bulk_create([Proceso(id=1, nombre='LP-1')])
+        Evento.objects.bulk_create([
+            Evento(proceso_id=1, fecha=date(2024, 1, 1), acti=1),
+            Evento(proceso_id=1, fecha=date(2024, 1, 11), acti=2),
+            Evento(proceso_id=1, fecha=date(2024, 1, 31), acti=3),
+        ])
+        Proceso.objects.actualizar_estados()
+
+    def test_segmentos_y_leyenda(self):
+        response = self.client.get(reverse('api_timeline'), {'mercado': 'Nacional'})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([proceso['id'] for proceso in data['procesos']], [1])
+        segmentos = data['procesos'][0]['segmentos']
+        self.assertEqual(
+            [(segmento['inicio'], segmento['duracion'], segmento['estado']) for segmento in segmentos[:2]],
+            [('2024-01-01', 10, 'Inicio'), ('2024-01-11', 20, 'Convocatoria')],
+        )
+        self.assertTrue(all(segmento['color'] for segmento in segmentos))
+        # La leyenda omite el primer estado, como el gráfico
+        self.assertEqual([estado['nombre'] for estado in data['leyenda']], ESTADOS_PRUEBA[1:])
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get(reverse('api_timeline'), {'mercado': 'Nacional'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    # Sin collectstatic no hay manifiesto de los archivos estáticos que incluye el modo cliente
+    @override_settings(STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_modo_cliente_no_pide_la_imagen(self):
+        with mock.patch('pages.views.aget_chart') as aget_chart:
+            response = self.client.get(reverse('home'), {'modo': 'cliente'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('api_timeline'))
+        self.assertNotContains(response, reverse('chart_timeline', args=['webp']))
+        # Solo la miniatura del gráfico de mercados
+        self.assertEqual([llamada.args[0][0] for llamada in aget_chart.call_args_list], ['mercados'])
+
+
+class FormatosGraficoTests(TestCase):
+    FILAS = [
+        {'mercado': 'Extranjero', 'total_procesos': 1, 'total_estimado': Decimal('50')},
+        {'mercado': 'Nacional', 'total_procesos': 3, 'total_estimado': Decimal('300')},
+    ]
+
+    def test_formatos(self):
+        firmas = {'png': b'\x89PNG', 'webp': b'RIFF', 'svg': b'<?xml'}
+        for formato, firma in firmas.items():
+            with self.subTest(formato=formato):
+                self.assertTrue(generate_pie_chart(self.FILAS, formato, 'thumb').startswith(firma))
+
+    def test_miniatura_para_la_tarjeta_y_version_completa(self):
+        miniatura = Image.open(io.BytesIO(generate_pie_chart(self.FILAS, 'png', 'thumb')))
+        completa = Image.open(io.BytesIO(generate_pie_chart(self.FILAS, 'png', 'full')))
+
+        self.assertLess(miniatura.width, 1000)
+        self.assertGreater(completa.width, 4000)
+
+    def test_formato_desconocido(self):
+        self.client.force_login(get_user_model().objects.create_user('usuario'))
+        self.assertEqual(self.client.get(reverse('chart_mercados', args=['gif'])).status_code, 404)
+
+
+class HomeViewTests(CatalogoMixin, TransactionTestCase):
+    # TransactionTestCase: el render de respaldo corre en otro hilo, con su propia conexión
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.enterContext(override_settings(CHART_STORE_DIR=directorio.name))
+        chart_cache.clear()
+        self.addCleanup(chart_cache.clear)
+
+        self.client.force_login(get_user_model().objects.create_user('usuario'))
+        Proceso.objects.bulk_create([Proceso(id=pk, nombre=f'{prefijo}-{pk}') for pk, prefijo in ((1, 'LP'), (2, 'RE'))])
+        Evento.objects.bulk_create([
+            Evento(proceso_id=pk, fecha=date(2024, 1, dia), acti=acti)
+            for pk in (1, 2) for dia, acti in ((1, 1), (10, 2))
+        ])
+        Proceso.objects.actualizar_estados()
+
+    def test_pool_de_procesos_roto_renderiza_en_hilos(self):
+        roto = mock.Mock()
+        roto.submit.side_effect = BrokenProcessPool('un proceso de renderizado murió')
+        with mock.patch('pages.charts.render_executor', return_value=roto), self.assertLogs('pages.charts', 'WARNING'):
+            response = self.client.get(reverse('home'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(roto.submit.call_count, 2)
+        roto.shutdown.assert_called_with(wait=False)
+        # Las dos miniaturas se renderizaron igual, en el executor por defecto del event loop
+        for clave in (timeline_key('Nacional', '', 'webp', 'thumb'), mercados_key('webp', 'thumb')):
+            self.assertIsNotNone(chart_cache.get(clave), clave[0])
+
+    def test_referencia_los_graficos_por_url(self):
+        response = self.client.get(reverse('home'))
+
+        self.assertContains(response, reverse('chart_timeline', args=['webp']))
+        self.assertContains(response, reverse('chart_mercados', args=['webp']))
+        self.assertNotContains(response, 'data:image')
+
+    async def test_metricas_de_la_peticion_incluyen_los_renders_del_executor(self):
+        # El render corre en un hilo del executor, con sus propias conexiones
+        with registrar_peticion() as metricas:
+            await aget_chart(timeline_key('Nacional', '', 'webp', 'thumb'))
+
+        self.assertGreater(metricas.consultas, 0)
+        self.assertGreater(metricas.tiempos['db'], 0)
+        self.assertGreater(metricas.tiempos['chart'], 0)
+
+
+class PrerenderTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.enterContext(override_settings(CHART_STORE_DIR=directorio.name))
+        # Tres páginas de procesos nacionales y una de extranjeros
+        Proceso.objects.bulk_create(
+            [Proceso(id=pk, nombre=f'LP-{pk:02d}') for pk in range(1, 2 * PROCESOS_POR_PAGINA + 2)]
+            + [Proceso(id=100, nombre='RE-100')]
+        )
+
+    def test_incluye_las_paginas_pedidas_con_el_cursor_anterior(self):
+        jobs = set(chart_jobs())
+        paginator = KeysetPaginator(Proceso.objects.filter(mercado='Nacional'), ('nombre', 'id'), PROCESOS_POR_PAGINA)
+        # Hasta la última página con "siguiente" y de vuelta a la primera con "anterior", como el dashboard
+        cursores = [None]
+        pagina = paginator.get_page()
+        while pagina.has_next():
+            cursores.append(pagina.next_cursor)
+            pagina = paginator.get_page(pagina.next_cursor)
+        while pagina.has_previous():
+            cursores.append(pagina.previous_cursor)
+            pagina = paginator.get_page(pagina.previous_cursor)
+
+        self.assertEqual(len(set(cursores)), 5)
+        for cursor in cursores:
+            for formato, tamano in (('webp', 'thumb'), ('png', 'full')):
+                self.assertIn(timeline_key('Nacional', cursor, formato, tamano), jobs)
+
+    def test_prune_borra_solo_las_versiones_viejas(self):
+        vigente = timeline_key('Nacional', 'cursor-de-un-worker', 'webp', 'thumb')
+        vieja = vigente[:-1] + ('version-vieja',)
+        for clave in (vigente, vieja):
+            chart_store.write(clave, b'imagen')
+
+        self.assertEqual(chart_store.prune({vigente[-1]}), 1)
+        self.assertEqual(chart_store.read(vigente), b'imagen')
+        self.assertIsNone(chart_store.read(vieja))
+
+
+class PoolConexionesTests(TestCase):
+    def conexion(self):
+        # Un alias más sobre la base de pruebas, con su propio pool de una sola conexión
+        alias = 'pool_pruebas'
+        settings_dict = dict(connection.settings_dict)
+        settings_dict['OPTIONS'] = {**settings_dict['OPTIONS'], 'pool': {'min_size': 1, 'max_size': 1, 'timeout': 5}}
+        connections.settings[alias] = settings_dict
+        wrapper = connections[alias]
+
+        def quitar():
+            wrapper.close_pool()
+            del connections[alias]
+            del connections.settings[alias]
+        self.addCleanup(quitar)
+        return wrapper
+
+    def test_close_devuelve_la_conexion_al_pool(self):
+        wrapper = self.conexion()
+        wrapper.ensure_connection()
+        fisica = wrapper.connection
+        with wrapper.cursor() as cursor:
+            cursor.execute('SHOW TIME ZONE')
+            self.assertEqual(cursor.fetchone()[0], wrapper.timezone_name)
+
+        wrapper.close()
+        self.assertIsNone(wrapper.connection)
+        self.assertFalse(fisica.closed)
+
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, fisica)
+        self.assertEqual(wrapper.pool.get_stats()['connections_num'], 1)
+
+        wrapper.close_pool()
+        self.assertTrue(fisica.closed)
+
+    def test_servidor_inalcanzable_falla_enseguida(self):
+        wrapper = self.conexion()
+        # Un puerto sin servidor: el pool esperaría su timeout completo antes de fallar
+        wrapper.settings_dict['PORT'] = 1
+        wrapper.settings_dict['OPTIONS']['pool']['timeout'] = 30
+
+        inicio = time.monotonic()
+        with self.assertRaises(OperationalError):
+            wrapper.ensure_connection()
+        self.assertLess(time.monotonic() - inicio, 5)
+        self.assertTrue(wrapper.pool.closed)
+
+    def test_transaccion_abierta_se_deshace_al_devolver(self):
+        wrapper = self.conexion()
+        tabla = Parametro._meta.db_table
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {tabla} (nombre, tipo) VALUES ('Sin commit', 'pool')")
+        with self.assertLogs('psycopg.pool', 'WARNING'):
+            wrapper.close()
+
+        wrapper.ensure_connection()
+        self.assertTrue(wrapper.get_autocommit())
+        with wrapper.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {tabla} WHERE tipo = 'pool'")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class DatosSinteticosTests(TestCase):
+    def setUp(self):
+        registry.invalidar()
+        self.addCleanup(registry.invalidar)
+
+    def test_generar_y_borrar(self):
+        Proceso.objects.create(id=1, nombre='LP-REAL')
+        procesos, eventos = synthetic.generar(20, 5, seed=1)
+
+        self.assertEqual((procesos, eventos), (20, 100))
+        self.assertEqual(
+            set(Parametro.objects.values_list('id', flat=True)), {PERIODOS, ACTIVIDADES, ESTADOS, ESTADOS_GRAFICO},
+        )
+        sinteticos = Proceso.objects.filter(nomenclatura__startswith=synthetic.PREFIJO)
+        self.assertEqual(sinteticos.count(), 20)
+        self.assertEqual(Evento.objects.filter(proceso__in=sinteticos).count(), 100)
+        self.assertTrue(sinteticos.filter(mercado='Extranjero').exists())
+        # El estado se calculó con un solo UPDATE al final
+        call_command('sync_estados', verify=True, stdout=io.StringIO())
+
+        self.assertEqual(synthetic.borrar(), 20)
+        self.assertEqual(list(Proceso.objects.values_list('nombre', flat=True)), ['LP-REAL'])
+        self.assertFalse(Evento.objects.exists())
+
+    def test_misma_semilla_mismos_datos(self):
+        def datos():
+            return list(Evento.objects.order_by('proceso_id', 'fecha', 'id').values_list('proceso_id', 'fecha', 'acti'))
+
+        synthetic.generar(5, 4, seed=7)
+        primeros = datos()
+        synthetic.borrar()
+        synthetic.generar(5, 4, seed=7)
+        self.assertEqual(datos(), primeros)
+
+    def test_benchmark(self):
+        synthetic.generar(5, 3)
+        resultados = benchmark.ejecutar(['proceso_list', 'evento_list'], repeticiones=1)
+
+        for escenario in ('proceso_list', 'evento_list'):
+            self.assertEqual(set(resultados[escenario]), {'wall_ms', 'wall_ms_min', 'queries', 'db_ms', 'peak_kb'})
+            self.assertGreater(resultados[escenario]['queries'], 0)
+
+        anterior = {'escalas': [{'procesos': 5, 'eventos_por_proceso': 3, 'resultados': resultados}]}
+        actual = json.loads(json.dumps(anterior))
+        actual['escalas'][0]['resultados']['proceso_list']['wall_ms'] = resultados['proceso_list']['wall_ms'] * 2
+        cambios = {fila[1:3]: fila[5] for fila in benchmark.comparar(anterior, actual)}
+        self.assertAlmostEqual(cambios[('proceso_list', 'wall_ms')], 1.0)
+        self.assertEqual(cambios[('evento_list', 'queries')], 0.0)
+
+
+class ListaCacheTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Las señales avanzan la versión después del commit, que TestCase nunca hace: cada prueba empieza
+        # con una versión propia para no leer páginas de otra
+        bump_data_version()
+        self.client.force_login(get_user_model().objects.create_user('usuario', is_staff=True))
+        Proceso.objects.bulk_create([
+            Proceso(id=pk, nombre=f'LP-CACHE-{pk}', estimado=Decimal(pk * 100), convocado_id=self.anio)
+            for pk in range(1, 4)
+        ])
+
+    def listar(self, **parametros):
+        response = self.client.get(reverse('proceso_list'), parametros)
+        return [proceso.nombre for proceso in response.context['page_obj']]
+
+    def stats(self):
+        return self.client.get(reverse('api_cache')).json()['proceso_list']
+
+    def test_filtros_equivalentes_comparten_la_entrada(self):
+        antes = self.stats()
+        primera = self.listar(nombre='CACHE', estimado='100', estimado_condition='gt')
+        segunda = self.listar(nombre='cache', estimado='100.00', estimado_condition='gt')
+        despues = self.stats()
+
+        self.assertEqual(primera, ['LP-CACHE-2', 'LP-CACHE-3'])
+        self.assertEqual(segunda, primera)
+        self.assertEqual((despues['misses'] - antes['misses'], despues['hits'] - antes['hits']), (1, 1))
+
+    def test_un_cambio_en_los_datos_invalida_las_paginas(self):
+        self.assertEqual(self.listar(), ['LP-CACHE-1', 'LP-CACHE-2', 'LP-CACHE-3'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Proceso.objects.create(id=4, nombre='LP-CACHE-0', convocado_id=self.anio)
+
+        self.assertEqual(self.listar(), ['LP-CACHE-0', 'LP-CACHE-1', 'LP-CACHE-2', 'LP-CACHE-3'])
+
+
+class DuracionesTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        bump_data_version()  # una versión propia: la caché de reportes no guarda resultados de otra prueba
+        self.client.force_login(get_user_model().objects.create_user('usuario'))
+        # Inicio dura 1..9 días y 100 en el último proceso nacional; Convocatoria, 5; Buena pro es el tramo actual
+        dias_inicio = {pk: pk for pk in range(1, 10)} | {10: 100, 11: 7}
+        Proceso.objects.bulk_create([
+            Proceso(id=pk, nombre=f'{"RE" if pk == 11 else "LP"}-{pk:02d}', periodo_id=self.anio) for pk in dias_inicio
+        ])
+        inicio = date(2024, 1, 1)
+        Evento.objects.bulk_create([
+            Evento(proceso_id=pk, fecha=inicio + timedelta(days=desplazamiento), acti=acti)
+            for pk, dias in dias_inicio.items()
+            for desplazamiento, acti in ((0, 1), (dias, 2), (dias + 5, 3))
+        ])
+        Proceso.objects.actualizar_estados()
+
+    def test_percentiles_y_atipicos_por_mercado(self):
+        reporte = self.client.get(reverse('api_duraciones')).json()
+
+        self.assertEqual([grupo['grupo'] for grupo in reporte['grupos']], ['Extranjero', 'Nacional'])
+        inicio, convocatoria = reporte['grupos'][1]['etapas']
+        # percentile_cont interpola: mediana entre 5 y 6, p90 entre 9 y 100
+        self.assertEqual(inicio, {
+            'estado': 'Inicio', 'tramos': 10, 'promedio': 14.5, 'mediana': 5.5, 'p90': 18.1, 'maximo': 100,
+            'limite_atipico': 14.5, 'atipicos': 1,
+        })
+        self.assertEqual(
+            (convocatoria['estado'], convocatoria['tramos'], convocatoria['mediana']), ('Convocatoria', 10, 5.0),
+        )
+        # El tramo actual (Buena pro) no terminó y no cuenta
+        self.assertNotIn('Buena pro', [etapa['estado'] for grupo in reporte['grupos'] for etapa in grupo['etapas']])
+        self.assertEqual(
+            [(atipico['proceso_id'], atipico['estado'], atipico['duracion']) for atipico in reporte['atipicos']],
+            [(10, 'Inicio', 100)],
+        )
+
+    def test_por_periodo_desde_la_cache(self):
+        reporte = reporte_duraciones('periodo')
+        self.assertEqual([grupo['grupo'] for grupo in reporte['grupos']], [str(self.anio)])
+        self.assertEqual(reporte['grupos'][0]['etapas'][0]['tramos'], 11)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(reporte_duraciones('periodo'), reporte)
+
+
+class ExportacionTests(CatalogoMixin, TestCase):
+    # Django avisa cuando, bajo ASGI, tiene que leer entero un iterador síncrono antes de enviarlo
+    def setUp(self):
+        super().setUp()
+        usuario = get_user_model().objects.create_user('usuario')
+        self.client.force_login(usuario)
+        self.async_client.force_login(usuario)
+        Proceso.objects.bulk_create([
+            Proceso(id=pk, nombre=f'LP-EXP-{pk}', periodo_id=self.anio, convocado_id=self.anio) for pk in range(1, 6)
+        ])
+        self.url = reverse('proceso_export')
+
+    def lineas(self, contenido):
+        return contenido.decode('utf-8-sig').splitlines()
+
+    def test_csv_por_wsgi(self):
+        response = self.client.get(self.url, {'formato': 'csv', 'order_by': 'nombre'})
+        self.assertTrue(response.streaming)
+        lineas = self.lineas(b''.join(response.streaming_content))
+        self.assertEqual(lineas[0].split(',')[:3], ['Id', 'Nomenclatura', 'Nombre'])
+        self.assertEqual([linea.split(',')[2] for linea in lineas[1:]], [f'LP-EXP-{pk}' for pk in range(1, 6)])
+
+    def test_mismos_filtros_y_orden_que_proceso_list(self):
+        Proceso.objects.filter(pk__in=[2, 4]).update(descripcion='Obra vial')
+        Proceso.objects.filter(pk=4).update(estimado=Decimal('500'))
+        Evento.objects.create(proceso_id=2, fecha=date(2024, 1, 1), acti=3)
+        parametros = {'formato': 'csv', 'descripcion': 'VIAL', 'order_by': '-estimado'}
+
+        lista = self.client.get(reverse('proceso_list'), parametros)
+        response = self.client.get(self.url, parametros)
+
+        exportadas = list(csv.DictReader(self.lineas(b''.join(response.streaming_content))))
+        self.assertEqual([int(fila['Id']) for fila in exportadas], [proceso.pk for proceso in lista.context['page_obj']])
+        self.assertEqual([(fila['Nombre'], fila['Estado']) for fila in exportadas], [
+            ('LP-EXP-4', 'Sin estado'), ('LP-EXP-2', 'Buena pro'),
+        ])
+        self.assertEqual(exportadas[0]['Periodo'], str(self.anio))
+
+    @mock.patch('pages.export.CHUNK_SIZE', 2)
+    def test_una_fila_por_evento_con_una_consulta_por_bloque(self):
+        Evento.objects.bulk_create([
+            Evento(proceso_id=1, fecha=date(2024, 1, dia), acti=1, documento=f'DOC-{dia}') for dia in (2, 1)
+        ])
+        catalogo(PERIODOS)  # el catálogo ya cargado, como en un worker que atendió otras peticiones
+
+        # El cursor del servidor y los eventos de cada bloque de 2 procesos
+        with self.assertNumQueries(1 + 3):
+            lineas = list(export.filas(Proceso.objects.order_by('id'), con_eventos=True))
+
+        self.assertEqual(len(lineas), 6)
+        documento = len(export.COLUMNAS_PROCESO) + 4
+        self.assertEqual([(linea[0], linea[documento]) for linea in lineas[:3]], [(1, 'DOC-1'), (1, 'DOC-2'), (2, None)])
+
+    @mock.patch('pages.views.CHUNK_SIZE', 2)
+    @mock.patch('pages.export.CHUNK_SIZE', 2)
+    async def test_csv_por_asgi_se_envia_por_partes(self):
+        # Con un iterador síncrono Django avisaría (y leería todo en memoria) antes de enviar
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', 'StreamingHttpResponse must consume synchronous iterators')
+            response = await self.async_client.get(self.url, {'formato': 'csv', 'order_by': 'nombre'})
+            self.assertTrue(response.is_async)
+            partes = [parte async for parte in response.streaming_content]
+
+        # Cabecera y 5 filas, de a 2 líneas por parte
+        self.assertEqual(len(partes), 3)
+        lineas = self.lineas(b''.join(partes))
+        self.assertEqual([linea.split(',')[2] for linea in lineas[1:]], [f'LP-EXP-{pk}' for pk in range(1, 6)])
+
+    async def test_xlsx_por_asgi(self):
+        from openpyxl import load_workbook
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', 'StreamingHttpResponse must consume synchronous iterators')
+            response = await self.async_client.get(self.url, {'formato': 'xlsx'})
+            self.assertTrue(response.is_async)
+            contenido = b''.join([parte async for parte in response.streaming_content])
+        hoja = load_workbook(io.BytesIO(contenido), read_only=True)['Procesos']
+        self.assertEqual(len(list(hoja.rows)), 6)
+
+
+class RendererTests(CatalogoMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        renderer._figuras_libres.clear()
+        self.addCleanup(renderer._figuras_libres.clear)
+
+    def renders(self, primero, segundo):
+        """(segundo render sobre la figura que dejó el primero, segundo render en una figura nueva)."""
+        primero()
+        reutilizada = segundo()
+        self.assertTrue(renderer.render_stats()['ultimo']['reutilizada'])
+        renderer._figuras_libres.clear()
+        nueva = segundo()
+        self.assertFalse(renderer.render_stats()['ultimo']['reutilizada'])
+        return reutilizada, nueva
+
+    def test_figura_reutilizada_igual_a_una_nueva_pastel(self):
+        filas = [{'mercado': 'Nacional', 'total_procesos': 3, 'total_estimado': Decimal('100')},
+                 {'mercado': 'Extranjero', 'total_procesos': 1, 'total_estimado': Decimal('5')}]
+        reutilizada, nueva = self.renders(
+            lambda: generate_pie_chart(filas, 'png', 'thumb'), lambda: generate_pie_chart(filas[:1], 'png', 'thumb'),
+        )
+        self.assertEqual(reutilizada, nueva)
+
+    def test_figura_reutilizada_igual_a_una_nueva_linea_de_tiempo(self):
+        Proceso.objects.bulk_create([
+            Proceso(id=pk, nombre=f'{prefijo}-{pk}', descripcion=f'Proceso {pk}')
+            for pk, prefijo in ((1, 'LP'), (2, 'LP'), (3, 'RE'))
+        ])
+        Evento.objects.bulk_create([
+            Evento(proceso_id=pk, fecha=date(2024, mes, 1), acti=acti)
+            for pk in (1, 2, 3) for mes, acti in ((pk, 1), (pk + 2, 2), (pk + 5, 3))
+        ])
+        Proceso.objects.actualizar_estados()
+
+        reutilizada, nueva = self.renders(
+            lambda: render_timeline('Nacional', None, 'png', 'thumb'),
+            lambda: render_timeline('Extranjero', None, 'png', 'thumb'),
+        )
+        self.assertEqual(reutilizada, nueva)
+
+    def test_configura_la_plantilla_una_sola_vez(self):
+        configurar = mock.Mock(side_effect=lambda fig: fig.subplots())
+        for valor in (1, 2):
+            with renderer.figura('prueba', (2, 2), configurar) as (fig, ax):
+                ax.plot([0, valor])
+                self.assertEqual(len(ax.lines), 1)
+        configurar.assert_called_once()
+        ultimo = renderer.render_stats()['ultimo']
+        if ultimo['rss_antes_kb'] is not None:
+            self.assertEqual(ultimo['rss_delta_kb'], ultimo['rss_despues_kb'] - ultimo['rss_antes_kb'])
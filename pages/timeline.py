@@ -0,0 +1,131 @@
+import pandas as pd
+from .catalog import catalogo, ESTADOS_GRAFICO
+from .models import Evento, IntervaloEstado
+
+# Lista de colores distintivos para los estados (parametro 50), asignados por 'orden'
+COLORES_DISTINTIVOS = [
+    '#FF4500', '#FFD700', '#32CD32', '#1E90FF', '#FFD700',
+    '#9400D3', '#FF8C00', '#FF0000', '#00FF00', '#8B4513',
+    '#4169E1', '#FF69B4', '#20B2AA'
+]
+
+COLUMNAS_SEGMENTOS = ['proceso_id', 'inicio', 'fin', 'duracion', 'acti', 'estado', 'color']
+
+
+def cargar_estados():
+    """Toma del catálogo en memoria los estados de la línea de tiempo (parametro 50).
+
+    Devuelve las fórmulas ordenadas por 'orden', el mapa acti -> color y el
+    mapa acti -> nombre del estado.
+    """
+    estados = catalogo(ESTADOS_GRAFICO)
+    formulas = estados.ordenadas
+    color_map = {formula.cantidad: COLORES_DISTINTIVOS[i] for i, formula in enumerate(formulas)}
+
+    # Si hay varias fórmulas con la misma cantidad se usa la de menor id, como hacía .first()
+    nombres = {cantidad: formula.nombre for cantidad, formula in estados.por_cantidad.items()}
+    return formulas, color_map, nombres
+
+
+def cargar_eventos(eventos, proceso_ids, acti_validos):
+    """Trae en una sola consulta ordenada los eventos válidos de los procesos indicados."""
+    filas = eventos.filter(
+        proceso_id__in=list(proceso_ids),
+        acti__in=list(acti_validos),
+    ).order_by('proceso_id', 'fecha', 'id').values_list('proceso_id', 'fecha', 'acti')
+    df = pd.DataFrame(list(filas), columns=['proceso_id', 'fecha', 'acti'])
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+def calcular_segmentos(df, color_map, nombres):
+    """Convierte los eventos ordenados en segmentos (inicio, duración, color) por proceso.
+
+    Un segmento empieza cada vez que cambia el estado dentro de un proceso y
+    termina en el inicio del siguiente segmento (o en el último evento del
+    proceso). El color de un segmento es el de la actividad que abre el
+    segmento siguiente; el último segmento usa el color del último evento.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_SEGMENTOS)
+
+    df = df.assign(estado=df['acti'].map(nombres))
+    nuevo_proceso = df['proceso_id'].ne(df['proceso_id'].shift())
+    cambio_estado = nuevo_proceso | df['estado'].ne(df['estado'].shift())
+
+    por_proceso = df.groupby('proceso_id', sort=False)
+    ultima_fecha = por_proceso['fecha'].transform('last')
+    ultimo_acti = por_proceso['acti'].transform('last')
+
+    segmentos = df.loc[cambio_estado, ['proceso_id', 'fecha', 'acti', 'estado']].rename(columns={'fecha': 'inicio'})
+    siguiente = segmentos.groupby('proceso_id', sort=False)[['inicio', 'acti']].shift(-1)
+
+    segmentos['fin'] = siguiente['inicio'].fillna(ultima_fecha[cambio_estado])
+    acti_color = siguiente['acti'].fillna(ultimo_acti[cambio_estado]).astype(int)
+    segmentos['duracion'] = (segmentos['fin'] - segmentos['inicio']).dt.days
+    segmentos['color'] = acti_color.map(color_map).fillna('grey')
+    return segmentos[COLUMNAS_SEGMENTOS].reset_index(drop=True)
+
+
+def cargar_segmentos(proceso_ids, color_map):
+    """Lee de IntervaloEstado, en una sola consulta por índice, los segmentos de los procesos indicados."""
+    filas = IntervaloEstado.objects.filter(proceso_id__in=list(proceso_ids)).order_by('proceso_id', 'orden').values_list(
+        'proceso_id', 'inicio', 'fin', 'duracion', 'acti', 'estado', 'acti_color',
+    )
+    df = pd.DataFrame(list(filas), columns=COLUMNAS_SEGMENTOS[:-1] + ['acti_color'])
+    df['inicio'] = pd.to_datetime(df['inicio'])
+    df['fin'] = pd.to_datetime(df['fin'])
+    df['color'] = df.pop('acti_color').map(color_map).fillna('grey')
+    return df[COLUMNAS_SEGMENTOS]
+
+
+def segmentos_desde_eventos(proceso_ids):
+    """Segmentos recalculados desde el historial de eventos (sync_intervalos --verify los compara con la tabla)."""
+    _, color_map, nombres = cargar_estados()
+    df = cargar_eventos(Evento.objects.all(), proceso_ids, color_map.keys())
+    return calcular_segmentos(df, color_map, nombres)
+
+
+def construir_linea_tiempo(procesos):
+    """Segmentos de la línea de tiempo de los procesos dados.
+
+    Los tramos ya están calculados en IntervaloEstado (se mantienen al cambiar
+    los eventos); el catálogo de estados y los colores salen de memoria.
+    """
+    formulas, color_map, _ = cargar_estados()
+    return formulas, color_map, cargar_segmentos([proceso.pk for proceso in procesos], color_map)
+
+
+def etiqueta_proceso(proceso, max_label_length):
+    descripcion = proceso.descripcion or ''
+    return f"{proceso.nombre} - {descripcion[:max_label_length]}{'...' if len(descripcion) > max_label_length else ''}"
+
+
+def linea_tiempo_json(procesos, max_label_length):
+    """Segmentos de la línea de tiempo y leyenda (parametro 50) listos para serializar a JSON."""
+    procesos = sorted(procesos, key=lambda p: p.nombre)
+    formulas, color_map, segmentos = construir_linea_tiempo(procesos)
+    segmentos_por_proceso = dict(tuple(segmentos.groupby('proceso_id', sort=False)))
+
+    filas = []
+    for proceso in procesos:
+        segmentos_proceso = segmentos_por_proceso.get(proceso.pk)
+        if segmentos_proceso is None:
+            continue
+        filas.append({
+            'id': proceso.pk,
+            'label': etiqueta_proceso(proceso, max_label_length),
+            'segmentos': [
+                {
+                    'inicio': segmento.inicio.date().isoformat(),
+                    'duracion': int(segmento.duracion),
+                    'color': segmento.color,
+                    'estado': segmento.estado,
+                }
+                for segmento in segmentos_proceso.itertuples()
+            ],
+        })
+
+    # La leyenda excluye el primer estado, igual que el gráfico
+    leyenda = [{'nombre': formula.nombre, 'color': color_map[formula.cantidad]} for formula in formulas[1:]]
+    return {'procesos': filas, 'leyenda': leyenda}
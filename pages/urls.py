@@ -1,31 +1,43 @@
 from django.urls import path
 from django.contrib.auth.views import LogoutView
 from .views import (
-    home_view, SignUpView, proceso_list, proceso_detail, proceso_create, 
+    home_view, chart_timeline, chart_mercados, api_timeline, api_pool, api_cache, api_eventos_masivo, api_duraciones, duraciones_view, SignUpView, proceso_list, proceso_export, proceso_detail, proceso_create, 
     proceso_update, proceso_delete, evento_list, evento_detail, 
-    evento_create_update, evento_delete, about_view, parametro_list, 
+    evento_create_update, evento_delete, evento_masivo, about_view, buscar_view, importar_view, parametro_list, 
     parametro_detail, parametro_create, parametro_update, parametro_delete, 
     formula_list, formula_detail, formula_create, formula_update, formula_delete
 )
 
 urlpatterns = [
     path('', home_view, name='home'),
+    path('charts/timeline.<str:formato>', chart_timeline, name='chart_timeline'),
+    path('charts/mercados.<str:formato>', chart_mercados, name='chart_mercados'),
+    path('api/timeline/', api_timeline, name='api_timeline'),
+    path('api/pool/', api_pool, name='api_pool'),
+    path('api/cache/', api_cache, name='api_cache'),
+    path('api/eventos/masivo/', api_eventos_masivo, name='api_eventos_masivo'),
+    path('api/duraciones/', api_duraciones, name='api_duraciones'),
     path('signup/', SignUpView.as_view(), name='signup'),
     path('accounts/logout/', LogoutView.as_view(), name='logout'),  # Ruta de logout
     path('procesos/', proceso_list, name='proceso_list'),
+    path('procesos/exportar/', proceso_export, name='proceso_export'),
     path('procesos/<int:pk>/', proceso_detail, name='proceso_detail'),
     path('procesos/new/', proceso_create, name='proceso_create'),
     path('procesos/<int:pk>/edit/', proceso_update, name='proceso_update'),
     path('procesos/<int:pk>/delete/', proceso_delete, name='proceso_delete'),
     
     # URLs para eventos
+    path('procesos/eventos/masivo/', evento_masivo, name='evento_masivo'),
     path('procesos/<int:proceso_id>/eventos/', evento_list, name='evento_list'),
     path('procesos/<int:proceso_id>/eventos/<int:evento_id>/', evento_detail, name='evento_detail'),
     path('procesos/<int:proceso_id>/eventos/new/', evento_create_update, name='evento_create'),
     path('procesos/<int:proceso_id>/eventos/create/', evento_create_update, name='evento_create'),
     path('procesos/<int:proceso_id>/eventos/<int:evento_id>/update/', evento_create_update, name='evento_update'),
     path('procesos/<int:proceso_id>/eventos/<int:pk>/delete/', evento_delete, name='evento_delete'),
+    path('duraciones/', duraciones_view, name='duraciones'),
     path('about/', about_view, name='about'),
+    path('buscar/', buscar_view, name='buscar'),
+    path('importar/', importar_view, name='importar'),
     path('parametros/', parametro_list, name='parametro_list'),
     path('parametros/<int:pk>/', parametro_detail, name='parametro_detail'),
     path('parametros/new/', parametro_create, name='parametro_create'),
@@ -1,122 +1,219 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse, FileResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from .decorators import login_required
 from .models import Proceso, Evento, Parametro, Formula
-from .forms import ProcesoForm, CustomUserCreationForm, ProcesoFilterForm, EventoForm, ParametroForm, ParametroFilterForm, FormulaForm
+from .forms import ProcesoForm, CustomUserCreationForm, ProcesoFilterForm, EventoForm, ParametroForm, ParametroFilterForm, FormulaForm, ImportarForm, EventoMasivoForm
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
-from django.db.models import Count, Sum, F, Value, IntegerField, OuterRef, Subquery, Exists, CharField, Q
-from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
 from django.utils import timezone
-from .graphic import generate_graphic, get_market_buttons
-from .graphic2 import generate_pie_chart
+from .graphic import get_market_buttons
+from .charts import (
+    procesos_por_mercado, apaginar_procesos_mercado, timeline_key, mercados_key,
+    render_timeline, render_mercados, timeline_data, get_chart, aget_chart
+)
+from .cache import get_data_version, get_data_modified, list_cache
+from .catalog import catalogo, PERIODOS, ACTIVIDADES, ESTADOS
+from .renderer import FORMATOS, TAMANOS
+from .pagination import KeysetPaginator
+from .search import buscar
+from .importer import IMPORTADORES, ErrorImportacion, importar
+from .bulk import registrar_eventos
+from .duraciones import AGRUPACIONES, reporte_duraciones
+from .export import FORMATOS_EXPORTACION, CHUNK_SIZE, BLOQUES_ARCHIVO, aiterar, csv_stream, xlsx_archivo
+from .instrumentation import estadisticas_pool
+
+logger = logging.getLogger(__name__)
+
+# Órdenes permitidos en evento_list; el id desempata para que la paginación por clave sea estable
+ORDENES_EVENTOS = {
+    'fecha': ('fecha', 'id'),
+    '-fecha': ('-fecha', '-id'),
+}
+EVENTOS_POR_PAGINA = 25
+
+# Órdenes permitidos en proceso_list (los campos con NULL van al final en ambos sentidos)
+ORDENES_PROCESOS = {
+    'nombre': ('nombre', 'id'),
+    '-nombre': ('-nombre', '-id'),
+    'estimado': ('estimado', 'id'),
+    '-estimado': ('-estimado', '-id'),
+    'estado': ('estado', 'id'),
+    '-estado': ('-estado', '-id'),
+}
+PROCESOS_POR_PAGINA = 10
 
 @login_required
-def home_view(request):
+async def home_view(request):
     mercados = get_market_buttons()
     mercado_seleccionado = request.GET.get('mercado', 'Nacional')
     
-    procesos = Proceso.objects.all()
+    procesos = procesos_por_mercado(mercado_seleccionado)
+
+    # Paginación por cursor: el cursor de la página viene en la URL
+    cursor = request.GET.get('cursor', '')
+
+    # Modo 'cliente': el navegador dibuja la línea de tiempo a partir de api_timeline
+    modo = 'cliente' if request.GET.get('modo') == 'cliente' else 'imagen'
+
+    # ORM asíncrono: la vista no ocupa el event loop mientras espera a la base de datos. Las
+    # consultas van una tras otra: todas corren en el mismo hilo de la petición
+    page_obj = await apaginar_procesos_mercado(procesos, cursor)
+    hay_procesos = await Proceso.objects.aexists()
+
+    # Los gráficos se descargan desde sus propias URLs (chart_timeline y chart_mercados); aquí se
+    # dejan listas en la caché las miniaturas que pide la página, renderizando las dos a la vez
+    claves = await sync_to_async(_claves_dashboard)(mercado_seleccionado, cursor, modo, page_obj, hay_procesos)
+    if claves:
+        # aget_chart suma a la petición el tiempo de render y las consultas de cada gráfico
+        resultados = await asyncio.gather(*(aget_chart(clave) for clave in claves), return_exceptions=True)
+        for clave, resultado in zip(claves, resultados):
+            if isinstance(resultado, Exception):
+                # La imagen lo vuelve a intentar desde su propia URL
+                logger.warning('No se pudo pre-renderizar %s: %r', clave[0], resultado)
 
-    if mercado_seleccionado == 'Extranjero':
-        procesos = procesos.filter(nombre__startswith='RE')
-    else:
-        procesos = procesos.exclude(nombre__startswith='RE')
+    context = {
+        'procesos': page_obj,  # Enviar el objeto de paginación al template
+        'cursor': cursor,
+        'mercados': mercados,
+        'mercado_seleccionado': mercado_seleccionado,
+        'modo': modo,
+        'hay_procesos': hay_procesos,
+    }
+    return await sync_to_async(render)(request, 'home.html', context)
 
-    # Ordenar los procesos por el campo 'nombre'
-    procesos = procesos.order_by('nombre')
+def _claves_dashboard(mercado_seleccionado, cursor, modo, page_obj, hay_procesos):
+    # Las miniaturas que muestra home.html (las mismas claves que usan chart_timeline y chart_mercados)
+    claves = []
+    if modo == 'imagen' and page_obj.object_list:
+        claves.append(timeline_key(mercado_seleccionado, cursor, 'webp', 'thumb'))
+    if hay_procesos:
+        claves.append(mercados_key('webp', 'thumb'))
+    return claves
 
-    eventos = Evento.objects.filter(proceso__in=procesos).order_by('fecha')
+def _tamano(request):
+    # 'thumb' para la tarjeta del dashboard, 'full' para la versión completa
+    tamano = request.GET.get('size', 'full')
+    return tamano if tamano in TAMANOS else 'full'
 
-    # Obtener las actividades (suponiendo que están relacionadas con los eventos)
-    activities = eventos.values_list('acti', flat=True).distinct()
+def _timeline_key(request, formato='png'):
+    return timeline_key(request.GET.get('mercado', 'Nacional'), request.GET.get('cursor'), formato, _tamano(request))
 
-    # Paginación
-    paginator = Paginator(procesos, 15)  # 15 procesos por página
-    page_number = request.GET.get('page')  # Obtener número de página desde los parámetros de la URL
-    page_obj = paginator.get_page(page_number)  # Obtener los procesos para la página actual
+def _mercados_key(request, formato='png'):
+    return mercados_key(formato, _tamano(request))
 
-    # Definir una longitud máxima para las etiquetas (ajusta según tus necesidades)
-    max_label_length = 20
+def _timeline_json_key(request):
+    return ('timeline-json', request.GET.get('mercado', 'Nacional'), request.GET.get('cursor') or '',
+            get_data_version(), timezone.localdate().isoformat())
 
-    # Generar el gráfico solo con los procesos de la página actual
-    graphic = generate_graphic(page_obj, eventos, mercado_seleccionado, activities, max_label_length)
-    
-    # Procesos por nombre para el gráfico de pastel
-    procesos_por_nombre = Proceso.objects.values('nombre').annotate(
-        total_procesos=Count('id'),
-        total_estimado=Sum('estimado')
-    )
-    graphic2 = generate_pie_chart(procesos_por_nombre)
+def _chart_etag(key_func):
+    def etag(request, *args, **kwargs):
+        # ETag fuerte: cambia con la versión de los datos y con la fecha de su último cambio
+        key = key_func(request, *args, **kwargs) + (get_data_modified().isoformat(),)
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+    return etag
 
-    context = {
-        'graphic': graphic,
-        'graphic2': graphic2,
-        'procesos': page_obj,  # Enviar el objeto de paginación al template
-        'mercados': mercados,
-        'mercado_seleccionado': mercado_seleccionado,
-    }
-    return render(request, 'home.html', context)
+def _chart_response(image, formato):
+    return HttpResponse(image, content_type=FORMATOS[formato]['content_type'])
 
+def _chart_last_modified(request, *args, **kwargs):
+    return get_data_modified()
 
 @login_required
-def proceso_list(request):
-    print("Iniciando proceso_list")
-    
-    print("Número total de Procesos:", Proceso.objects.count())
-    print("Número total de Eventos:", Evento.objects.count())
-    print("Número de Fórmulas con parametro_id=29:", Formula.objects.filter(parametro_id=29).count())
-    
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag(_timeline_key), last_modified_func=_chart_last_modified)
+def chart_timeline(request, formato='png'):
+    if formato not in FORMATOS:
+        raise Http404("Formato de gráfico no soportado")
+    mercado_seleccionado = request.GET.get('mercado', 'Nacional')
+    cursor = request.GET.get('cursor')
+    tamano = _tamano(request)
+    # Los gráficos se sirven desde caché mientras no cambie la versión de los datos
+    image = get_chart(
+        _timeline_key(request, formato),
+        lambda: render_timeline(mercado_seleccionado, cursor, formato, tamano)
+    )
+    return _chart_response(image, formato)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag(_mercados_key), last_modified_func=_chart_last_modified)
+def chart_mercados(request, formato='png'):
+    if formato not in FORMATOS:
+        raise Http404("Formato de gráfico no soportado")
+    tamano = _tamano(request)
+    image = get_chart(_mercados_key(request, formato), lambda: render_mercados(formato, tamano))
+    return _chart_response(image, formato)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag(_timeline_json_key), last_modified_func=_chart_last_modified)
+def api_timeline(request):
+    # Segmentos por proceso y leyenda para dibujar el gráfico en el navegador
+    data = timeline_data(request.GET.get('mercado', 'Nacional'), request.GET.get('cursor'))
+    return JsonResponse(data)
+
+@staff_member_required
+@cache_control(private=True, no_store=True)
+def api_pool(request):
+    # Estadísticas del pool de conexiones del worker que responde (solo staff)
+    return JsonResponse({'pid': os.getpid(), 'pools': estadisticas_pool()})
+
+@staff_member_required
+@cache_control(private=True, no_store=True)
+def api_cache(request):
+    # Aciertos y fallos de la caché de resultados de proceso_list en el worker que responde (solo staff)
+    return JsonResponse({'pid': os.getpid(), 'proceso_list': list_cache.stats()})
+
+
+def filtrar_procesos(request):
+    """Aplica los filtros de ProcesoFilterForm y el orden de la URL, como los muestra proceso_list.
+
+    Devuelve (form, paginator, order_by, default_convoca, filtros); ``paginator.ordenado()``
+    es el queryset filtrado con el orden de la lista (lo usa también proceso_export) y
+    ``filtros`` son los lookups aplicados, normalizados: dos URLs que muestran lo mismo
+    tienen los mismos filtros (proceso_list los usa como clave de la caché de resultados).
+    """
     form = ProcesoFilterForm(request.GET)
-    procesos = Proceso.objects.all()
+    filtros = {}
     default_convoca = None
 
-    # Obtener los valores válidos de 'cantidad' para el parámetro_id=29
-    valores_validos = Formula.objects.filter(parametro_id=29).values_list('cantidad', flat=True)
-
-    # Subquery para obtener el último evento de cada proceso con acti válido
-    ultimo_evento = Evento.objects.filter(
-        proceso=OuterRef('pk'),
-        acti__in=valores_validos
-    ).order_by('-fecha', '-id').values('acti')[:1]
-
-    # Anotar cada proceso con su estado
-    procesos = procesos.annotate(
-        ultimo_acti=Subquery(ultimo_evento),
-        estado=Coalesce(
-            Subquery(
-                Formula.objects.filter(
-                    parametro_id=29,
-                    cantidad=OuterRef('ultimo_acti')
-                ).values('nombre')[:1]
-            ),
-            Value('Sin estado'),
-            output_field=CharField()
-        )
-    )
-
-    # Obtener los estados válidos para el filtro
-    estados_validos = Formula.objects.filter(parametro_id=29).values_list('nombre', 'nombre').distinct()
+    # El estado de cada proceso (último evento con acti válido del parametro 29) está
+    # guardado en Proceso.estado / ultimo_acti y lo mantienen las señales de Evento
 
     if form.is_valid():
-        # Aplicar filtros
+        # Aplicar filtros (icontains no distingue mayúsculas, así que se guardan en minúsculas)
         if form.cleaned_data.get('nombre'):
-            procesos = procesos.filter(nombre__icontains=form.cleaned_data['nombre'])
+            filtros['nombre__icontains'] = form.cleaned_data['nombre'].lower()
         if form.cleaned_data.get('descripcion'):
-            procesos = procesos.filter(descripcion__icontains=form.cleaned_data['descripcion'])
-        if form.cleaned_data.get('estimado') and form.cleaned_data.get('estimado_condition'):
-            if form.cleaned_data['estimado_condition'] == 'gt':
-                procesos = procesos.filter(estimado__gt=form.cleaned_data['estimado'])
-            elif form.cleaned_data['estimado_condition'] == 'lt':
-                procesos = procesos.filter(estimado__lt=form.cleaned_data['estimado'])
-            elif form.cleaned_data['estimado_condition'] == 'eq':
-                procesos = procesos.filter(estimado=form.cleaned_data['estimado'])
+            filtros['descripcion__icontains'] = form.cleaned_data['descripcion'].lower()
+        condicion = form.cleaned_data.get('estimado_condition')
+        if form.cleaned_data.get('estimado') and condicion in ('gt', 'lt', 'eq'):
+            # 100 y 100.00 son el mismo filtro
+            filtros['estimado' if condicion == 'eq' else f'estimado__{condicion}'] = form.cleaned_data['estimado'].normalize()
         
         if form.cleaned_data.get('estado'):
-            procesos = procesos.filter(estado=form.cleaned_data['estado'])
-            print(f"Filtrando por estado: {form.cleaned_data['estado']}")
-            print(f"Procesos después del filtro: {procesos.count()}")
+            filtros['estado'] = form.cleaned_data['estado']
+            logger.debug("Filtrando por estado: %s", form.cleaned_data['estado'])
+
+        dias_estado = form.cleaned_data.get('dias_estado')
+        if dias_estado:
+            # El estado (parametro 29) se filtra arriba en Proceso.estado; aquí solo la duración:
+            # el tramo actual de la línea de tiempo (IntervaloEstado) empezó hace más de N días
+            filtros['intervalos__actual'] = True
+            filtros['intervalos__inicio__lt'] = timezone.localdate() - timedelta(days=dias_estado)
 
         # Aplicar filtro de convoca
         convoca = form.cleaned_data.get('convoca')
@@ -125,54 +222,104 @@ def proceso_list(request):
                 # Si el orden es 20, no aplicamos ningún filtro (se muestran todos los procesos)
                 pass
             else:
-                procesos = procesos.filter(convocado=convoca.orden)
+                filtros['convocado'] = convoca.orden
                 default_convoca = convoca
         else:
             # Aplicar filtro por defecto si no se ha seleccionado ningún valor
-            default_convoca = Formula.objects.filter(parametro_id=11, cantidad=2).first()
+            default_convoca = catalogo(PERIODOS).por_cantidad.get(2)
             if default_convoca and default_convoca.orden != 20:
-                procesos = procesos.filter(convocado=default_convoca.orden)
+                filtros['convocado'] = default_convoca.orden
 
     # Ordenación
     order_by = request.GET.get('order_by', 'nombre')
-    if order_by.startswith('-'):
-        procesos = procesos.order_by(F(order_by[1:]).desc(nulls_last=True))
-    else:
-        procesos = procesos.order_by(F(order_by).asc(nulls_last=True))
-
-    # Imprimir información detallada de los procesos
-    for proceso in procesos[:20]:  # Limitamos a 20 para no sobrecargar los logs
-        print(f"Proceso: {proceso.id}, Último acti: {proceso.ultimo_acti}, Estado: {proceso.estado}")
-        ultimo_evento = Evento.objects.filter(proceso=proceso).order_by('-fecha', '-id').first()
-        if ultimo_evento:
-            print(f"  Último evento: fecha={ultimo_evento.fecha}, acti={ultimo_evento.acti}")
-            formula = Formula.objects.filter(parametro_id=29, cantidad=ultimo_evento.acti).first()
-            if formula:
-                print(f"  Fórmula correspondiente: {formula.nombre}")
-            else:
-                print(f"  No se encontró fórmula para acti={ultimo_evento.acti}")
-        else:
-            print("  No se encontraron eventos para este proceso")
+    if order_by not in ORDENES_PROCESOS:
+        order_by = 'nombre'
+    procesos = Proceso.objects.filter(**filtros)
+    paginator = KeysetPaginator(procesos, ORDENES_PROCESOS[order_by], PROCESOS_POR_PAGINA, total='aprox')
+    return form, paginator, order_by, default_convoca, filtros
+
+# Campos de cada fila de proceso_list que guarda la caché de resultados (incluye los de todos los órdenes)
+CAMPOS_LISTA = ('id', 'nombre', 'descripcion', 'estimado', 'estado')
+
+def _pagina_procesos(paginator, filtros, order_by, cursor):
+    # Página de proceso_list desde list_cache; en un fallo se consulta y se guarda solo lo que muestra la lista
+    def consultar():
+        page = paginator.get_page(cursor)
+        return {
+            'filas': [tuple(getattr(proceso, campo) for campo in CAMPOS_LISTA) for proceso in page],
+            'has_next': page.has_next(),
+            'has_previous': page.has_previous(),
+            'total': page.total,
+        }
+
+    datos = list_cache.get_or_set(('proceso_list', tuple(sorted(filtros.items())), order_by, cursor), consultar)
+    procesos = [Proceso.from_db(paginator.queryset.db, CAMPOS_LISTA, fila) for fila in datos['filas']]
+    return paginator.restaurar_pagina(procesos, datos['has_next'], datos['has_previous'], datos['total'])
 
-    paginator = Paginator(procesos, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+@login_required
+def proceso_list(request):
+    # Los conteos cuestan consultas: solo se hacen con el log de depuración activo
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Número total de Procesos: %s", Proceso.objects.count())
+        logger.debug("Número total de Eventos: %s", Evento.objects.count())
+        logger.debug("Número de Fórmulas con parametro_id=29: %s", len(catalogo(ESTADOS)))
+
+    form, paginator, order_by, default_convoca, filtros = filtrar_procesos(request)
+
+    # Obtener los estados válidos para el filtro
+    estados_validos = [(nombre, nombre) for nombre in catalogo(ESTADOS).nombres()]
+
+    # Paginación por cursor: la página N cuesta lo mismo que la primera, y las combinaciones de
+    # filtros, orden y página que ya se pidieron con la versión actual de los datos salen de la caché
+    page_obj = _pagina_procesos(paginator, filtros, order_by, request.GET.get('cursor') or '')
 
-    # Imprimir los estados de los procesos
-    for proceso in page_obj:
-        print(f"Proceso: {proceso.id}, Último acti: {proceso.ultimo_acti}, Estado: {proceso.estado}")
+    # Estado de los procesos de la página; las filas de la caché solo traen CAMPOS_LISTA y leer
+    # cualquier otro campo haría una consulta por fila
+    if logger.isEnabledFor(logging.DEBUG):
+        for proceso in page_obj:
+            logger.debug("Proceso: %s, Estado: %s", proceso.id, proceso.estado)
 
-    print("Finalizando proceso_list")
+    # Filtros y orden actuales para los enlaces de exportación (sin el cursor de la página)
+    filtros = request.GET.copy()
+    filtros.pop('cursor', None)
 
     context = {
         'page_obj': page_obj,
         'form': form,
         'order_by': order_by,
+        'filtros_export': filtros.urlencode(),
         'default_convoca': default_convoca,
         'estados_validos': estados_validos,  # Agregar esto al contexto
     }
     return render(request, 'pages/proceso_list.html', context)
 
+@login_required
+def proceso_export(request):
+    # Los mismos filtros y orden que proceso_list, sin paginar; eventos=1 agrega una fila por evento
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        raise Http404("Formato de exportación no soportado")
+    _, paginator, _, _, _ = filtrar_procesos(request)
+    procesos = paginator.ordenado()
+    con_eventos = request.GET.get('eventos') == '1'
+    nombre = f"procesos{'_eventos' if con_eventos else ''}_{timezone.localdate():%Y%m%d}.{formato}"
+
+    if formato == 'csv':
+        # Las filas se envían a medida que llegan del cursor del servidor
+        response = StreamingHttpResponse(csv_stream(procesos, con_eventos), content_type=FORMATOS_EXPORTACION['csv'])
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        tamano = CHUNK_SIZE
+    else:
+        response = FileResponse(
+            xlsx_archivo(procesos, con_eventos), as_attachment=True, filename=nombre,
+            content_type=FORMATOS_EXPORTACION['xlsx'],
+        )
+        tamano = BLOQUES_ARCHIVO
+    if isinstance(request, ASGIRequest):
+        # Bajo ASGI un iterador síncrono se leería entero en memoria antes de enviar nada
+        response.streaming_content = aiterar(response.streaming_content, tamano)
+    return response
+
 @login_required
 def proceso_detail(request, pk):
     proceso = get_object_or_404(Proceso, pk=pk)
@@ -207,9 +354,7 @@ def proceso_update(request, pk):
     else:
         form = ProcesoForm(instance=proceso)
     
-    # Asegurarse de que los campos periodo y convocado solo muestren opciones con parametro_id=11
-    form.fields['periodo'].queryset = Formula.objects.filter(parametro_id=11)
-    form.fields['convocado'].queryset = Formula.objects.filter(parametro_id=11)
+    # Los campos periodo y convocado ya solo muestran las opciones del parametro 11 (catálogo en memoria)
     
     context = {
         'form': form,
@@ -235,18 +380,18 @@ class SignUpView(CreateView):
 def evento_list(request, proceso_id):
     proceso = get_object_or_404(Proceso, pk=proceso_id)
     order_by = request.GET.get('order_by', 'fecha')  # Default a ordenar por fecha ascendente
+    if order_by not in ORDENES_EVENTOS:
+        order_by = 'fecha'
     
-    eventos = proceso.eventos.all().order_by(order_by)
-    
-    formulas = Formula.objects.filter(parametro_id=12).order_by('orden')
-    
-    for evento in eventos:
-        formula = formulas.filter(orden=evento.acti).first()
-        evento.acti_nombre = formula.nombre if formula else "N/A"
+    # El nombre de la actividad viene anotado en la misma consulta de la página
+    eventos = Evento.objects.filter(proceso=proceso).con_acti_nombre()
+    paginator = KeysetPaginator(eventos, ORDENES_EVENTOS[order_by], EVENTOS_POR_PAGINA)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'proceso': proceso,
-        'eventos': eventos,
+        'eventos': page_obj,
+        'page_obj': page_obj,
         'order_by': order_by,
     }
     return render(request, 'pages/evento_list.html', context)
@@ -255,8 +400,7 @@ def evento_list(request, proceso_id):
 def evento_detail(request, proceso_id, evento_id):
     proceso = get_object_or_404(Proceso, pk=proceso_id)
     evento = get_object_or_404(Evento, pk=evento_id, proceso=proceso)
-    formula = Formula.objects.filter(parametro_id=12, orden=evento.acti).first()
-    evento.acti_nombre = formula.nombre if formula else "N/A"
+    evento.acti_nombre = catalogo(ACTIVIDADES).nombre(evento.acti, defecto="N/A")
     
     context = {
         'proceso': proceso,
@@ -295,9 +439,113 @@ def evento_delete(request, proceso_id, pk):
         return redirect('evento_list', proceso_id=proceso.id)
     return render(request, 'pages/evento_confirm_delete.html', {'evento': evento, 'proceso': proceso})
 
+@login_required
+def duraciones_view(request):
+    # Duración de las etapas por mercado o por periodo (?agrupar=), desde la caché de reportes
+    reporte = reporte_duraciones(request.GET.get('agrupar', 'mercado'))
+    context = {'reporte': reporte, 'agrupaciones': AGRUPACIONES}
+    return render(request, 'pages/duraciones.html', context)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+def api_duraciones(request):
+    return JsonResponse(reporte_duraciones(request.GET.get('agrupar', 'mercado')))
+
 def about_view(request):
     return render(request, 'pages/about.html')
 
+# Filas rechazadas que se muestran en la página de importación (el comando import_data da la lista completa)
+RECHAZOS_VISIBLES = 200
+
+@login_required
+def importar_view(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarForm(request.POST, request.FILES)
+        if form.is_valid():
+            tipo = form.cleaned_data['tipo']
+            archivo = form.cleaned_data['archivo']
+            try:
+                # Los archivos grandes llegan como archivo temporal; se leen por lotes sin cargarlos enteros
+                resultado = importar(tipo, archivo.file, archivo.name, simular=form.cleaned_data['simular'])
+            except ErrorImportacion as e:
+                form.add_error('archivo', str(e))
+    else:
+        form = ImportarForm()
+
+    context = {
+        'form': form,
+        'resultado': resultado,
+        'rechazadas': resultado.rechazadas[:RECHAZOS_VISIBLES] if resultado else [],
+        'columnas': {tipo: ', '.join(importador.columnas) for tipo, importador in IMPORTADORES.items()},
+    }
+    return render(request, 'pages/importar.html', context)
+
+def _registrar_masivo(form):
+    datos = form.cleaned_data
+    return registrar_eventos(
+        datos['procesos'], datos['acti'], datos['fecha'], datos['documento'],
+        actividad=datos['actividad'], situacion=datos['situacion'], importe=datos['importe'],
+    )
+
+@login_required
+def evento_masivo(request):
+    # Mismo evento para varios procesos: un INSERT y un recálculo de estados por envío
+    creados = None
+    if request.method == 'POST':
+        form = EventoMasivoForm(request.POST)
+        if form.is_valid():
+            creados = _registrar_masivo(form)
+            form = EventoMasivoForm(initial={
+                campo: form.cleaned_data[campo] for campo in ('acti', 'fecha', 'documento')
+            })
+    else:
+        # ?procesos=1,2,3 llega desde otras páginas con los procesos ya elegidos
+        form = EventoMasivoForm(initial={'procesos': request.GET.get('procesos', '')})
+
+    context = {
+        'form': form,
+        'creados': creados,
+        'procesos': sorted({evento.proceso_id for evento in creados}) if creados else [],
+    }
+    return render(request, 'pages/evento_masivo.html', context)
+
+@login_required
+@require_POST
+def api_eventos_masivo(request):
+    """Crea el mismo evento en varios procesos.
+
+    Recibe JSON ``{"procesos": [ids], "acti": n, "fecha": "AAAA-MM-DD", "documento": "..."}``
+    (y opcionalmente actividad, situacion e importe); responde 201 con los ids
+    de los eventos creados, o 400 con los errores por campo.
+    """
+    try:
+        datos = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'errores': {'__all__': [{'message': 'JSON no válido.', 'code': 'invalid'}]}}, status=400)
+    if not isinstance(datos, dict):
+        return JsonResponse({'errores': {'__all__': [{'message': 'Se esperaba un objeto JSON.', 'code': 'invalid'}]}}, status=400)
+    if isinstance(datos.get('procesos'), list):
+        datos['procesos'] = ','.join(str(pk) for pk in datos['procesos'])
+
+    form = EventoMasivoForm(datos)
+    if not form.is_valid():
+        return JsonResponse({'errores': form.errors.get_json_data()}, status=400)
+    eventos = _registrar_masivo(form)
+    return JsonResponse({'creados': len(eventos), 'eventos': [evento.pk for evento in eventos]}, status=201)
+
+@login_required
+def buscar_view(request):
+    # Búsqueda unificada (texto completo + subcadena) sobre procesos y eventos
+    texto = request.GET.get('q', '').strip()
+    resultados = buscar(texto)
+    context = {
+        'q': texto,
+        'procesos': resultados['procesos'],
+        'eventos': resultados['eventos'],
+    }
+    return render(request, 'pages/buscar.html', context)
+
 @login_required
 def parametro_list(request):
     form = ParametroFilterForm(request.GET)
@@ -0,0 +1,141 @@
+// Dibuja la línea de tiempo de procesos en el navegador (SVG) a partir de /pages/api/timeline/
+(function () {
+    const contenedor = document.getElementById('timeline-chart');
+    if (!contenedor) {
+        return;
+    }
+
+    const SVG_NS = 'http://www.w3.org/2000/svg';
+    const DIA = 24 * 60 * 60 * 1000;
+    const MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic'];
+
+    const filtro = document.getElementById('timeline-filtro');
+    const desde = document.getElementById('timeline-desde');
+    const hasta = document.getElementById('timeline-hasta');
+
+    let datos = null;
+
+    function parseFecha(texto) {
+        const [anio, mes, dia] = texto.split('-').map(Number);
+        return Date.UTC(anio, mes - 1, dia);
+    }
+
+    function crear(tag, atributos, padre) {
+        const el = document.createElementNS(SVG_NS, tag);
+        Object.entries(atributos).forEach(([clave, valor]) => el.setAttribute(clave, valor));
+        if (padre) {
+            padre.appendChild(el);
+        }
+        return el;
+    }
+
+    function rangoFechas(procesos, hoy) {
+        // Por defecto el año en curso, ampliado para incluir todos los segmentos
+        const anio = new Date(hoy).getUTCFullYear();
+        let inicio = Date.UTC(anio, 0, 1);
+        let fin = Date.UTC(anio, 11, 31);
+        procesos.forEach((proceso) => {
+            proceso.segmentos.forEach((segmento) => {
+                const ini = parseFecha(segmento.inicio);
+                inicio = Math.min(inicio, ini);
+                fin = Math.max(fin, ini + segmento.duracion * DIA);
+            });
+        });
+        if (desde.value) {
+            inicio = parseFecha(desde.value);
+        }
+        if (hasta.value) {
+            fin = parseFecha(hasta.value);
+        }
+        return [inicio, Math.max(fin, inicio + DIA)];
+    }
+
+    function dibujar() {
+        contenedor.innerHTML = '';
+        if (!datos) {
+            return;
+        }
+
+        const texto = (filtro.value || '').toLowerCase();
+        const procesos = datos.procesos.filter((proceso) => proceso.label.toLowerCase().includes(texto));
+        const hoy = parseFecha(datos.hoy);
+        const [inicio, fin] = rangoFechas(procesos, hoy);
+
+        const margenIzq = 260;
+        const ancho = Math.max(contenedor.clientWidth, 600);
+        const altoFila = 24;
+        const alto = procesos.length * altoFila + 40;
+        const escala = (ancho - margenIzq - 10) / (fin - inicio);
+        const x = (fecha) => margenIzq + (fecha - inicio) * escala;
+
+        const svg = crear('svg', {width: ancho, height: alto, 'font-size': 11, 'font-family': 'sans-serif'});
+        const area = crear('svg', {x: margenIzq, width: ancho - margenIzq - 10, height: alto, overflow: 'hidden'}, svg);
+
+        // Líneas de referencia de los meses
+        const cursor = new Date(inicio);
+        let mes = Date.UTC(cursor.getUTCFullYear(), cursor.getUTCMonth(), 1);
+        while (mes <= fin) {
+            const fecha = new Date(mes);
+            if (mes < inicio) {
+                mes = Date.UTC(fecha.getUTCFullYear(), fecha.getUTCMonth() + 1, 1);
+                continue;
+            }
+            crear('line', {x1: x(mes), x2: x(mes), y1: 0, y2: alto - 30, stroke: 'grey', 'stroke-dasharray': '4 3', 'stroke-width': 0.5}, svg);
+            const etiqueta = crear('text', {x: x(mes), y: alto - 15, 'text-anchor': 'middle'}, svg);
+            etiqueta.textContent = `01-${MESES[fecha.getUTCMonth()]}`;
+            mes = Date.UTC(fecha.getUTCFullYear(), fecha.getUTCMonth() + 1, 1);
+        }
+
+        procesos.forEach((proceso, fila) => {
+            const y = fila * altoFila + 4;
+            const etiqueta = crear('text', {x: margenIzq - 6, y: y + altoFila / 2 + 4, 'text-anchor': 'end'}, svg);
+            etiqueta.textContent = proceso.label;
+            proceso.segmentos.forEach((segmento) => {
+                const ini = parseFecha(segmento.inicio);
+                const rect = crear('rect', {
+                    x: x(ini) - margenIzq,
+                    y: y,
+                    width: Math.max(segmento.duracion * DIA * escala, 1),
+                    height: altoFila - 6,
+                    fill: segmento.color,
+                }, area);
+                const titulo = crear('title', {}, rect);
+                titulo.textContent = `${segmento.estado}: ${segmento.inicio} (${segmento.duracion} días)`;
+            });
+        });
+
+        // Línea de "Fecha Actual"
+        if (hoy >= inicio && hoy <= fin) {
+            crear('line', {x1: x(hoy), x2: x(hoy), y1: 0, y2: alto - 30, stroke: 'red', 'stroke-width': 2}, svg);
+        }
+
+        contenedor.appendChild(svg);
+        contenedor.appendChild(leyenda());
+    }
+
+    function leyenda() {
+        const lista = document.createElement('div');
+        lista.className = 'd-flex flex-wrap justify-content-center mt-2 small';
+        const items = [{nombre: 'Fecha Actual', color: 'red'}].concat(datos.leyenda);
+        items.forEach((item) => {
+            const span = document.createElement('span');
+            span.className = 'me-3';
+            const muestra = document.createElement('span');
+            muestra.style.cssText = `display:inline-block;width:12px;height:12px;margin-right:4px;background:${item.color}`;
+            span.appendChild(muestra);
+            span.appendChild(document.createTextNode(item.nombre));
+            lista.appendChild(span);
+        });
+        return lista;
+    }
+
+    fetch(contenedor.dataset.url, {credentials: 'same-origin'})
+        .then((respuesta) => respuesta.json())
+        .then((json) => {
+            datos = json;
+            dibujar();
+        });
+
+    [filtro, desde, hasta].forEach((control) => control.addEventListener('input', dibujar));
+    window.addEventListener('resize', dibujar);
+})();